@@ -0,0 +1,353 @@
+"""
+Columnar snapshots of the booking data for reports.
+
+Reports that read the live database compete with bookings and decode every row through Python on
+every run. This job exports flights, orders, tickets, crew assignments, routes, airplanes and crew into
+NumPy .npy files (one file per column) that reports open with memory mapping, without a query or a copy.
+Text columns are stored as integer codes into shared dictionaries (flight ids, airports, classes, ...),
+so joins between tables are integer lookups.
+
+The export is incremental. Flights that landed more than HOT_DAYS ago, with their orders, tickets and
+crew, no longer change: they go to the 'frozen' part, which each export only extends with the flights
+that crossed that line since the last one (by flight date; orders already there are skipped by Order_ID).
+Orders archived since the last export get their Archived flag set. Everything newer is the 'hot' part
+and is exported again every time. Routes, airplanes and crew are small and always exported whole.
+
+Each export is written into a new generation folder and published by replacing manifest.json, so
+readers always see a complete snapshot; the generation before it is kept until the next export.
+The manifest records the data version it was taken at.
+
+Usage:
+    python analytics_snapshot.py --dir /path/to/analytics        # export (e.g. as a scheduled task)
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utilise import DBService, Manager, run_periodically
+
+
+class AnalyticsSnapshot:
+    """ Export and reading of the columnar snapshot in one folder. """
+    HOT_DAYS = 2
+
+    # Flights whose first landing is in [start, end) (end NULL = no upper bound; NULL arrival counts as newest)
+    SEGMENT = """
+        SELECT Flight_ID FROM Flights GROUP BY Flight_ID
+        HAVING COALESCE(MIN(Arrival_Time), '9999') >= ? AND (? IS NULL OR COALESCE(MIN(Arrival_Time), '9999') < ?)
+    """
+
+    # Table -> (columns as (name, kind, dictionary), query with the segment's flights in {segment})
+    # Kinds: 'code' (dictionary code), 'int', 'float', 'time' (datetime64[m])
+    FACTS = {
+        "flights": ([("Flight_ID", "code", "flight"), ("Class_Type", "code", "class"),
+                     ("Airplane_ID", "code", "airplane"), ("Origin", "code", "airport"),
+                     ("Destination", "code", "airport"), ("Departure_Time", "time", None),
+                     ("Arrival_Time", "time", None), ("Economy_Price", "float", None),
+                     ("Business_Price", "float", None), ("Status", "code", "status")], """
+            SELECT Flight_ID, Class_TypeFK, Airplane_IDFK, Origin_AirportFK, Destination_AirportFK,
+                   Departure_Time, Arrival_Time, Economy_price, Business_price, Status
+            FROM Flights WHERE Flight_ID IN ({segment})
+        """),
+        "orders": ([("Order_ID", "int", None), ("Flight_ID", "code", "flight"), ("Customer", "code", "customer"),
+                    ("Execute_Time", "time", None), ("Total_Price", "float", None), ("Status", "code", "status"),
+                    ("Archived", "int", None)], """
+            SELECT Order_ID, Flight_IDFK, Customer_email, Execute_DateTime, Total_Price, Status, 0
+            FROM Orders WHERE Flight_IDFK IN ({segment})
+            UNION ALL
+            SELECT Order_ID, Flight_IDFK, Customer_email, Execute_DateTime, Total_Price, Status, 1
+            FROM Orders_Archive WHERE Flight_IDFK IN ({segment})
+            ORDER BY 1
+        """),
+        "tickets": ([("Order_ID", "int", None), ("Flight_ID", "code", "flight"), ("Class_Type", "code", "class"),
+                     ("Price", "float", None)], """
+            SELECT Order_IDFK, Flight_IDFK, Class_Type, Price FROM Tickets WHERE Flight_IDFK IN ({segment})
+            UNION ALL
+            SELECT Order_IDFK, Flight_IDFK, Class_Type, Price FROM Tickets_Archive WHERE Flight_IDFK IN ({segment})
+        """),
+        "crew_assignments": ([("Employee_ID", "code", "employee"), ("Flight_ID", "code", "flight")], """
+            SELECT Employee_IDFK, Flight_IDFK FROM Flight_assigned WHERE Flight_IDFK IN ({segment})
+        """),
+    }
+    DIMENSIONS = {
+        "routes": ([("Origin", "code", "airport"), ("Destination", "code", "airport"), ("Duration", "int", None)], """
+            SELECT Origin_Airport, Destination_Airport, Duration FROM Routes
+        """),
+        "airplanes": ([("Airplane_ID", "code", "airplane"), ("Class_Type", "code", "class"),
+                       ("Manufacturer", "code", "manufacturer"), ("Size", "code", "size"),
+                       ("Purchase_Date", "time", None), ("Rows", "int", None), ("Columns", "int", None)], """
+            SELECT Airplane_ID, Class_Type, Manufacturer, Size, Purchase_Date, Number_of_rows, Number_of_columns
+            FROM Airplanes
+        """),
+        "crew": ([("Employee_ID", "code", "employee"), ("First_Name", "code", "name"), ("Last_Name", "code", "name"),
+                  ("Role", "code", "role"), ("Short_Minutes", "int", None), ("Long_Minutes", "int", None),
+                  ("Flights", "int", None)], """
+            SELECT fc.Employee_ID, fc.First_Name, fc.Last_Name, fc.Role,
+                   COALESCE(h.Short_Minutes, 0), COALESCE(h.Long_Minutes, 0), COALESCE(h.Flights, 0)
+            FROM FlightCrew fc LEFT JOIN Crew_Hours h ON h.Employee_IDFK = fc.Employee_ID
+        """),
+    }
+    SEGMENTS = ("frozen", "hot")
+
+    _export_lock = threading.Lock()
+
+    def __init__(self, directory):
+        self.directory = directory
+        try:
+            with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = None
+        self.dictionaries = {}
+        if self.manifest:
+            with open(os.path.join(self._generation_dir(), "dictionaries.json"), encoding="utf-8") as f:
+                self.dictionaries = json.load(f)
+
+    @staticmethod
+    def open(directory):
+        """ The published snapshot in 'directory', or None if nothing was exported there yet. """
+        snapshot = AnalyticsSnapshot(directory)
+        return snapshot if snapshot.manifest else None
+
+    def _generation_dir(self, generation=None):
+        generation = self.manifest["generation"] if generation is None else generation
+        return os.path.join(self.directory, f"gen-{generation:06d}")
+
+    # ---------- reading ----------
+    def columns(self, table, segment=None):
+        """ The columns of a table as read-only memory-mapped arrays (facts: of one segment). """
+        folder = os.path.join(self._generation_dir(), segment) if segment else self._generation_dir()
+        names = (self.FACTS.get(table) or self.DIMENSIONS[table])[0]
+        return {name: np.load(os.path.join(folder, f"{table}.{name}.npy"), mmap_mode="r") for name, _, _ in names}
+
+    def decode(self, dictionary, codes):
+        """ Dictionary codes -> strings (an object array). """
+        return np.asarray(self.dictionaries.get(dictionary, []), dtype=object)[np.asarray(codes)]
+
+    def code(self, dictionary, value):
+        """ The code of one string, or -1 if it never occurs. """
+        try:
+            return self.dictionaries.get(dictionary, []).index(value)
+        except ValueError:
+            return -1
+
+    def revenue_frame(self):
+        """
+        The rows of visualization.QUERY_REVENUE (revenue per airplane size, manufacturer, cabin class,
+        order day and archive flag), computed from the snapshot. Each order's total is shared among its
+        tickets by the price paid for the seat. An order, its tickets and its flight are always in the
+        same segment, so each segment is computed on its own memory-mapped columns.
+        """
+        n_class = len(self.dictionaries.get("class", [])) + 1
+        planes = self.columns("airplanes")
+        plane_keys = planes["Airplane_ID"].astype(np.int64) * n_class + planes["Class_Type"]
+        plane_order = np.argsort(plane_keys)
+
+        frames = []
+        for segment in self.SEGMENTS:
+            orders, tickets, flights = (self.columns(t, segment) for t in ("orders", "tickets", "flights"))
+            if not len(tickets["Order_ID"]) or not len(orders["Order_ID"]):
+                continue
+
+            # Ticket -> order (orders are sorted by Order_ID)
+            o = np.searchsorted(orders["Order_ID"], tickets["Order_ID"]).clip(0, len(orders["Order_ID"]) - 1)
+            found = orders["Order_ID"][o] == tickets["Order_ID"]
+            price = np.asarray(tickets["Price"], dtype=float)
+            paid = np.bincount(o[found], weights=np.nan_to_num(price[found]), minlength=len(orders["Order_ID"]))
+            count = np.bincount(o[found], minlength=len(orders["Order_ID"]))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                weight = np.where(paid[o] > 0, price / paid[o], 1.0 / count[o])
+            share = np.asarray(orders["Total_Price"])[o] * np.nan_to_num(weight, nan=1.0 / np.maximum(count[o], 1))
+
+            # Ticket -> flight row of its class -> airplane row of that class
+            flight_keys = flights["Flight_ID"].astype(np.int64) * n_class + flights["Class_Type"]
+            flight_order = np.argsort(flight_keys)
+            ticket_keys = tickets["Flight_ID"].astype(np.int64) * n_class + tickets["Class_Type"]
+            f = flight_order[np.searchsorted(flight_keys, ticket_keys, sorter=flight_order).clip(0, len(flight_keys) - 1)]
+            found &= flight_keys[f] == ticket_keys
+            airplane_keys = flights["Airplane_ID"][f].astype(np.int64) * n_class + tickets["Class_Type"]
+            p = plane_order[np.searchsorted(plane_keys, airplane_keys, sorter=plane_order).clip(0, len(plane_keys) - 1)]
+            found &= plane_keys[p] == airplane_keys
+
+            frames.append(pd.DataFrame({
+                "Size": planes["Size"][p[found]],
+                "Manufacturer": planes["Manufacturer"][p[found]],
+                "Class": tickets["Class_Type"][found],
+                "Day": np.asarray(orders["Execute_Time"])[o[found]].astype("datetime64[D]"),
+                "Archived": np.asarray(orders["Archived"])[o[found]],
+                "Revenue": share[found],
+            }))
+
+        columns = ["Airplane_Size", "Airplane_Manufacturer", "Cabin_Class", "Day", "Archived", "Total_Revenue"]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        grouped = pd.concat(frames).groupby(["Size", "Manufacturer", "Class", "Day", "Archived"],
+                                             as_index=False)["Revenue"].sum()
+        return pd.DataFrame({
+            "Airplane_Size": self.decode("size", grouped["Size"]),
+            "Airplane_Manufacturer": self.decode("manufacturer", grouped["Manufacturer"]),
+            "Cabin_Class": self.decode("class", grouped["Class"]),
+            "Day": np.datetime_as_string(grouped["Day"].to_numpy().astype("datetime64[D]")),
+            "Archived": grouped["Archived"].to_numpy(),
+            "Total_Revenue": grouped["Revenue"].round(2).to_numpy(),
+        }).sort_values("Total_Revenue", ascending=False, ignore_index=True)
+
+    def crew_frame(self):
+        """ The rows of visualization.QUERY_CREW, from the snapshot. """
+        crew = self.columns("crew")
+        return pd.DataFrame({
+            "Employee_ID": self.decode("employee", crew["Employee_ID"]),
+            "First_Name": self.decode("name", crew["First_Name"]),
+            "Last_Name": self.decode("name", crew["Last_Name"]),
+            "Role": self.decode("role", crew["Role"]),
+            "Short_Flight_Hours": np.round(crew["Short_Minutes"] / 60.0, 1),
+            "Long_Flight_Hours": np.round(crew["Long_Minutes"] / 60.0, 1),
+        })
+
+    # ---------- export ----------
+    @staticmethod
+    def _to_columns(cursor, columns, dictionaries):
+        """
+        The rows of an executed query -> {column: array}. New strings are added to the dictionaries.
+        Rows are fetched DBService.CHUNK_ROWS at a time, so only the compact arrays grow with the data.
+        """
+        indexes = {d: {w: i for i, w in enumerate(dictionaries.setdefault(d, []))}
+                   for _, kind, d in columns if kind == "code"}
+        parts = {name: [] for name, _, _ in columns}
+        for rows in DBService.fetch_chunks(cursor):
+            for (name, kind, dictionary), column in zip(columns, zip(*rows)):
+                if kind == "code":
+                    words, index = dictionaries[dictionary], indexes[dictionary]
+                    codes = []
+                    for v in column:
+                        v = "" if v is None else str(v)
+                        if v not in index:
+                            index[v] = len(words)
+                            words.append(v)
+                        codes.append(index[v])
+                    parts[name].append(np.array(codes, dtype=np.int32))
+                elif kind == "int":
+                    parts[name].append(np.array([v or 0 for v in column], dtype=np.int64))
+                elif kind == "float":
+                    parts[name].append(np.array([np.nan if v is None else v for v in column], dtype=np.float64))
+                else:
+                    parts[name].append(np.array([None if v is None else str(v) for v in column],
+                                                dtype="datetime64[m]"))
+        dtypes = {"code": np.int32, "int": np.int64, "float": np.float64, "time": "datetime64[m]"}
+        return {name: np.concatenate(parts[name]) if parts[name] else np.array([], dtype=dtypes[kind])
+                for name, kind, _ in columns}
+
+    @staticmethod
+    def _save(folder, table, columns):
+        os.makedirs(folder, exist_ok=True)
+        for name, array in columns.items():
+            np.save(os.path.join(folder, f"{table}.{name}.npy"), array)
+
+    def export(self, now=None):
+        """ Writes and publishes a new snapshot generation. Returns the new manifest. """
+        with AnalyticsSnapshot._export_lock:
+            return self._export(now or datetime.now())
+
+    def _export(self, now):
+        old = self.manifest
+        old_watermark = old["watermark"] if old else ""
+        watermark = max(old_watermark, (now - timedelta(days=self.HOT_DAYS)).strftime('%Y-%m-%d %H:%M'))
+        dictionaries = {k: list(v) for k, v in self.dictionaries.items()}
+
+        # One read transaction, so all tables agree with the recorded data version
+        with DBService.db_cur() as cursor:
+            cursor.execute("BEGIN")
+            try:
+                version = Manager.get_data_version(cursor)
+                fetched = {}
+                for segment, bounds in (("frozen", (old_watermark, watermark, watermark)),
+                                        ("hot", (watermark, None, None))):
+                    for table, (columns, query) in self.FACTS.items():
+                        query = query.format(segment=self.SEGMENT)
+                        params = bounds * query.count("HAVING")
+                        cursor.execute(query, params)
+                        fetched[segment, table] = self._to_columns(cursor, columns, dictionaries)
+                for table, (columns, query) in self.DIMENSIONS.items():
+                    cursor.execute(query)
+                    fetched[None, table] = self._to_columns(cursor, columns, dictionaries)
+                archived_ids = np.array([r[0] for r in cursor.execute(
+                    "SELECT Order_ID FROM Orders_Archive WHERE Archived_At >= ?",
+                    (old["exported_at"] if old else "",)).fetchall()], dtype=np.int64)
+            finally:
+                cursor.execute("COMMIT")
+
+        generation = (old["generation"] + 1) if old else 1
+        folder = os.path.join(self.directory, f"gen-{generation:06d}")
+        shutil.rmtree(folder, ignore_errors=True)
+
+        # Frozen part: the previous one, plus what crossed the watermark since
+        frozen = {table: self.columns(table, "frozen") if old else None for table in self.FACTS}
+        new = {table: fetched["frozen", table] for table in self.FACTS}
+        if old:
+            known_orders = np.asarray(frozen["orders"]["Order_ID"])
+            known_flights = np.asarray(frozen["flights"]["Flight_ID"])
+            keep = {"orders": ~np.isin(new["orders"]["Order_ID"], known_orders),
+                    "tickets": ~np.isin(new["tickets"]["Order_ID"], known_orders),
+                    "flights": ~np.isin(new["flights"]["Flight_ID"], known_flights),
+                    "crew_assignments": ~np.isin(new["crew_assignments"]["Flight_ID"], known_flights)}
+            new = {table: {name: np.concatenate([frozen[table][name], array[keep[table]]])
+                           for name, array in columns.items()} for table, columns in new.items()}
+        by_id = np.argsort(new["orders"]["Order_ID"], kind="stable")
+        new["orders"] = {name: array[by_id] for name, array in new["orders"].items()}
+        new["orders"]["Archived"][np.isin(new["orders"]["Order_ID"], archived_ids)] = 1
+
+        for table in self.FACTS:
+            self._save(os.path.join(folder, "frozen"), table, new[table])
+            self._save(os.path.join(folder, "hot"), table, fetched["hot", table])
+        for table in self.DIMENSIONS:
+            self._save(folder, table, fetched[None, table])
+        with open(os.path.join(folder, "dictionaries.json"), "w", encoding="utf-8") as f:
+            json.dump(dictionaries, f, ensure_ascii=False)
+
+        manifest = {
+            "generation": generation,
+            "data_version": version,
+            "watermark": watermark,
+            "exported_at": now.strftime('%Y-%m-%d %H:%M:%S'),
+            "rows": {f"{segment}.{table}": int(len(next(iter(cols.values()))))
+                     for segment, cols in (("frozen", new), ("hot", {t: fetched["hot", t] for t in self.FACTS}))
+                     for table, cols in cols.items()},
+        }
+        tmp = os.path.join(self.directory, "manifest.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.directory, "manifest.json"))
+
+        # The previous generation stays for readers that opened it before the switch
+        for name in os.listdir(self.directory):
+            if name.startswith("gen-") and int(name[4:]) < generation - 1:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self.manifest, self.dictionaries = manifest, dictionaries
+        return manifest
+
+    @staticmethod
+    def start_in_background(directory, interval_minutes):
+        """ Exports every 'interval_minutes' in a daemon thread of the web app. """
+        os.makedirs(directory, exist_ok=True)
+        return run_periodically("analytics-snapshot", lambda: AnalyticsSnapshot(directory).export(), interval_minutes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the booking data into columnar snapshot files")
+    parser.add_argument("--dir", required=True, help="snapshot folder")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+    os.makedirs(args.dir, exist_ok=True)
+    started = time.perf_counter()
+    result = AnalyticsSnapshot(args.dir).export()
+    print(f"Snapshot {result['generation']} (data version {result['data_version']}) written in "
+          f"{time.perf_counter() - started:.2f}s: " + ", ".join(f"{k} {v}" for k, v in result["rows"].items()))
@@ -0,0 +1,92 @@
+"""
+Moves old orders out of the hot Orders and Tickets tables.
+
+Orders of flights that landed more than N days ago (completed, canceled or still marked
+Active) are copied with their tickets into Orders_Archive and Tickets_Archive and then
+deleted from the hot tables. The work is done in small batches, each in its own short
+transaction, so bookings are never blocked for long.
+
+History views and reports read archived data back through Order.orders_table(include_archive=True).
+
+Usage:
+    python archive.py                      # archive orders of flights that landed over 180 days ago
+    python archive.py --days 90 --batch-size 200
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from utilise import DBService, run_periodically
+
+
+class ArchiveService:
+    """ Batched move of old orders and tickets into the archive tables. """
+    ARCHIVE_AFTER_DAYS = 180
+    BATCH_SIZE = 500
+    PAUSE_BETWEEN_BATCHES = 0.05  # Seconds. Lets waiting bookings take the write lock between batches.
+
+    @staticmethod
+    def archive_batch(days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE, now=None):
+        """
+        Archives up to 'batch_size' orders in one transaction.
+        Returns the number of orders moved (0 means there is nothing left to archive).
+        """
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M')
+
+        with DBService.transaction() as cursor:
+            order_ids = [r['Order_ID'] for r in cursor.execute(
+                """
+                SELECT Order_ID FROM Orders
+                WHERE Flight_IDFK IN (SELECT Flight_ID FROM Flights WHERE Arrival_Time < ?)
+                ORDER BY Order_ID
+                LIMIT ?
+                """, (cutoff, batch_size)).fetchall()]
+            if not order_ids:
+                return 0
+
+            placeholders = ", ".join("?" * len(order_ids))
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO Orders_Archive
+                (Order_ID, Flight_IDFK, Customer_type, Customer_email, Execute_DateTime, Total_Price, Status, Archived_At)
+                SELECT Order_ID, Flight_IDFK, Customer_type, Customer_email, Execute_DateTime, Total_Price, Status, ?
+                FROM Orders WHERE Order_ID IN ({placeholders})
+            """, [now.replace(microsecond=0)] + order_ids)
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO Tickets_Archive
+                (Order_IDFK, Flight_IDFK, Row_Num, Col_Num, Class_Type, Price)
+                SELECT Order_IDFK, Flight_IDFK, Row_Num, Col_Num, Class_Type, Price
+                FROM Tickets WHERE Order_IDFK IN ({placeholders})
+            """, order_ids)
+            cursor.execute(f"DELETE FROM Tickets WHERE Order_IDFK IN ({placeholders})", order_ids)
+            cursor.execute(f"DELETE FROM Orders WHERE Order_ID IN ({placeholders})", order_ids)
+
+        return len(order_ids)
+
+    @staticmethod
+    def run(days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE):
+        """ Archives batch after batch until nothing is left. Returns the total number of orders moved. """
+        total = 0
+        while True:
+            moved = ArchiveService.archive_batch(days, batch_size)
+            total += moved
+            if moved < batch_size:
+                return total
+            time.sleep(ArchiveService.PAUSE_BETWEEN_BATCHES)
+
+    @staticmethod
+    def start_in_background(interval_minutes, days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE):
+        """ Runs the archiver every 'interval_minutes' in a daemon thread of the web app. """
+        return run_periodically("order-archiver", lambda: ArchiveService.run(days, batch_size), interval_minutes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move orders of long-landed flights to the archive tables")
+    parser.add_argument("--days", type=int, default=ArchiveService.ARCHIVE_AFTER_DAYS,
+                        help="archive orders of flights that landed more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=ArchiveService.BATCH_SIZE)
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+    print(f"Archived {ArchiveService.run(args.days, args.batch_size)} orders.")
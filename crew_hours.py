@@ -0,0 +1,80 @@
+"""
+Keeps the crew flight-hours ledger honest.
+
+Database triggers (see flytau.sql) add a Crew_Hours_Ledger row when a flight is completed or a crew member
+is assigned to a completed flight, remove it when that is undone, and keep the per-employee totals in
+Crew_Hours in step. Reports read the totals, one row per crew member, instead of summing all history.
+
+This job recomputes what the ledger should contain from Flights, Flight_assigned and Routes, fixes any
+difference (e.g. after manual edits or a changed route duration) and rebuilds totals that drifted.
+
+Usage:
+    python crew_hours.py            # reconcile once (e.g. as a nightly scheduled task)
+"""
+import argparse
+
+from utilise import DBService, run_periodically
+
+
+class CrewHoursLedger:
+    """ Reconciliation of Crew_Hours_Ledger and Crew_Hours with the flight data. """
+
+    EXPECTED = """
+        SELECT DISTINCT fa.Employee_IDFK, f.Flight_ID, r.Duration, r.Duration > 360
+        FROM Flight_assigned fa
+        JOIN Flights f ON f.Flight_ID = fa.Flight_IDFK AND f.Status = 'Completed'
+        JOIN Routes r ON r.Origin_Airport = f.Origin_AirportFK AND r.Destination_Airport = f.Destination_AirportFK
+    """
+
+    @staticmethod
+    def reconcile():
+        """ Fixes the ledger and the totals in one transaction. Returns (removed, added, totals_fixed). """
+        short = "COALESCE(SUM(CASE WHEN l.Long_Haul THEN 0 ELSE l.Minutes END), 0)"
+        long = "COALESCE(SUM(CASE WHEN l.Long_Haul THEN l.Minutes ELSE 0 END), 0)"
+        count = "COUNT(*)"
+        per_employee = "FROM Crew_Hours_Ledger l WHERE l.Employee_IDFK = Crew_Hours.Employee_IDFK"
+
+        with DBService.transaction() as cursor:
+            # Ledger rows go through the triggers, so the totals follow
+            removed = cursor.execute(f"""
+                DELETE FROM Crew_Hours_Ledger
+                WHERE (Employee_IDFK, Flight_IDFK, Minutes, Long_Haul) NOT IN ({CrewHoursLedger.EXPECTED})
+            """).rowcount
+            added = cursor.execute(f"""
+                INSERT INTO Crew_Hours_Ledger
+                SELECT * FROM ({CrewHoursLedger.EXPECTED}) e
+                WHERE NOT EXISTS (SELECT 1 FROM Crew_Hours_Ledger l
+                                  WHERE l.Employee_IDFK = e.Employee_IDFK AND l.Flight_IDFK = e.Flight_ID)
+            """).rowcount
+
+            # Totals that no longer match their ledger rows
+            cursor.execute("""
+                INSERT OR IGNORE INTO Crew_Hours (Employee_IDFK)
+                SELECT DISTINCT Employee_IDFK FROM Crew_Hours_Ledger
+            """)
+            fixed = cursor.execute(f"""
+                UPDATE Crew_Hours
+                SET Short_Minutes = (SELECT {short} {per_employee}),
+                    Long_Minutes = (SELECT {long} {per_employee}),
+                    Flights = (SELECT {count} {per_employee})
+                WHERE Short_Minutes != (SELECT {short} {per_employee})
+                   OR Long_Minutes != (SELECT {long} {per_employee})
+                   OR Flights != (SELECT {count} {per_employee})
+            """).rowcount
+
+        return removed, added, fixed
+
+    @staticmethod
+    def start_in_background(interval_minutes):
+        """ Reconciles every 'interval_minutes' in a daemon thread of the web app. """
+        return run_periodically("crew-hours-reconciler", CrewHoursLedger.reconcile, interval_minutes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile the crew flight-hours ledger with the flights")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+    removed, added, fixed = CrewHoursLedger.reconcile()
+    print(f"Ledger: {removed} rows removed, {added} added. Totals fixed for {fixed} crew members.")
@@ -0,0 +1,295 @@
+"""
+Suggests (or fills in) the crew of new flights.
+
+Flights are planned in departure order, one wave at a time (flights leaving within WAVE_MINUTES
+of each other). For every wave and role, open seats are matched to available crew members with
+a minimum-cost assignment (Hungarian algorithm). A crew member costs more when:
+- they already flew many hours lately (spreads the work evenly),
+- they are long-haul qualified and the flight is short (keeps them for long flights),
+- they have never flown and can start anywhere (keeps them as a reserve),
+- the flight leaves them at an airport with no departures in the next STRANDING_HOURS.
+Availability rules are the usual ones (see CrewAvailabilityIndex): location, no overlap,
+qualification for flights over 6 hours, and the role counts of Flight.required_crew.
+A flight that can't get its full crew is left empty and reported.
+
+Usage:
+    python crew_planner.py --from 2026-07-01 --to 2026-07-08           # show a plan for flights without crew
+    python crew_planner.py --from 2026-07-01 --to 2026-07-08 --apply   # and save it
+"""
+import argparse
+import bisect
+import time
+from datetime import datetime, timedelta
+
+from utilise import DBService, Flight, crew_index
+
+
+class CrewPlanner:
+    """ Plans crew for a list of flights on a private copy of the crew index. """
+    WAVE_MINUTES = 60
+    BALANCE_WINDOW_DAYS = 30
+    STRANDING_HOURS = 72
+
+    # Costs, in "hours flown" units
+    QUALIFIED_ON_SHORT_COST = 6
+    RESERVE_COST = 4
+    STRANDING_COST = 10
+    UNFILLED_COST = 10 ** 6
+    BLOCKED_COST = 10 ** 9
+
+    def __init__(self):
+        self.index = crew_index.snapshot()
+        self.base_version = self.index.version()
+
+    # ---------- loading flights ----------
+    @staticmethod
+    def flight(origin, destination, departure, arrival, airplane_size, flight_id=None):
+        """ Describes a flight to plan (an existing one, or one that is not saved yet). """
+        departure = datetime.fromisoformat(str(departure).replace(' ', 'T')[:16])
+        arrival = datetime.fromisoformat(str(arrival).replace(' ', 'T')[:16])
+        duration = int((arrival - departure).total_seconds() // 60)
+        return {"flight_id": flight_id, "origin": origin, "destination": destination,
+                "departure": departure, "arrival": arrival, "airplane_size": airplane_size,
+                "long_haul": Flight.determine_flight_type(duration) == 'long'}
+
+    @staticmethod
+    def flights_without_crew(start, end):
+        """ Active flights departing between start and end that have no crew assigned yet. """
+        rows = DBService.run(
+            """
+            SELECT f.Flight_ID, MIN(f.Origin_AirportFK) AS Origin, MIN(f.Destination_AirportFK) AS Destination,
+                   MIN(f.Departure_Time) AS Departure_Time, MIN(f.Arrival_Time) AS Arrival_Time,
+                   MIN(a.Size) AS Size
+            FROM Flights f
+            JOIN Airplanes a ON a.Airplane_ID = f.Airplane_IDFK
+            WHERE f.Status IN ('Active', 'Fully Booked') AND f.Departure_Time >= ? AND f.Departure_Time < ?
+              AND NOT EXISTS (SELECT 1 FROM Flight_assigned fa WHERE fa.Flight_IDFK = f.Flight_ID)
+            GROUP BY f.Flight_ID
+            ORDER BY Departure_Time
+            """,
+            (str(start)[:16], str(end)[:16]), fetchall=True
+        )
+        return [CrewPlanner.flight(r['Origin'], r['Destination'], r['Departure_Time'], r['Arrival_Time'],
+                                   r['Size'], r['Flight_ID']) for r in rows]
+
+    # ---------- planning ----------
+    def plan(self, flights):
+        """
+        Returns one result per flight, in the given order:
+        {"flight": ..., "pilots": [ids], "attendants": [ids], "error": None or a reason}.
+        """
+        order = sorted(range(len(flights)), key=lambda i: flights[i]['departure'])
+        results = [{"flight": f, "pilots": [], "attendants": [], "error": None} for f in flights]
+        if not flights:
+            return results
+
+        start = flights[order[0]]['departure']
+        self._minutes = self._minutes_flown(start - timedelta(days=CrewPlanner.BALANCE_WINDOW_DAYS))
+        self._departures = self._departures_by_airport(start, flights)
+
+        i = 0
+        while i < len(order):
+            wave = [order[i]]
+            while (i + len(wave) < len(order) and flights[order[i + len(wave)]]['departure']
+                   <= flights[order[i]]['departure'] + timedelta(minutes=CrewPlanner.WAVE_MINUTES)):
+                wave.append(order[i + len(wave)])
+            self._plan_wave([results[k] for k in wave])
+            i += len(wave)
+        return results
+
+    def _plan_wave(self, results):
+        for role, key, position in (('Pilot', 'pilots', 0), ('Attendant', 'attendants', 1)):
+            open_results = [r for r in results if not r['error']]
+            slots = [(r, Flight.required_crew(r['flight']['airplane_size'])[position]) for r in open_results]
+            chosen = self._match(role, slots)
+            for r, _ in slots:
+                r[key] = chosen.get(id(r), [])
+
+        for r in results:
+            f = r['flight']
+            pilots_needed, attendants_needed = Flight.required_crew(f['airplane_size'])
+            if r['error'] is None and (len(r['pilots']) < pilots_needed or len(r['attendants']) < attendants_needed):
+                r['error'] = (f"Not enough available crew at {f['origin']}: found {len(r['pilots'])}/{pilots_needed} "
+                              f"pilots and {len(r['attendants'])}/{attendants_needed} attendants.")
+            if r['error']:
+                r['pilots'], r['attendants'] = [], []
+                continue
+            crew_ids = r['pilots'] + r['attendants']
+            self.index.add_flight(f['flight_id'] or f"planned-{id(r)}", f['departure'], f['arrival'],
+                                  f['origin'], f['destination'], crew_ids)
+            minutes = (f['arrival'] - f['departure']).total_seconds() / 60
+            for eid in crew_ids:
+                self._minutes[eid] = self._minutes.get(eid, 0) + minutes
+
+    def _match(self, role, slots):
+        """ Min-cost assignment of the wave's seats of one role. Returns {id(result): [employee ids]}. """
+        rows = []  # One row per seat: (result, candidate costs)
+        for r, seats in slots:
+            f = r['flight']
+            available = self.index.available(f['origin'], role, f['long_haul'], f['departure'], f['arrival'],
+                                             f['destination'])
+            costs = {c['employee_id']: self._cost(c['employee_id'], f) for c in available}
+            # A seat never needs more than (all seats in the wave) of its cheapest candidates
+            limit = sum(n for _, n in slots)
+            costs = dict(sorted(costs.items(), key=lambda item: (item[1], item[0]))[:limit])
+            rows.extend((r, costs) for _ in range(seats))
+        if not rows:
+            return {}
+
+        columns = sorted({eid for _, costs in rows for eid in costs})
+        matrix = [[costs.get(eid, CrewPlanner.BLOCKED_COST) for eid in columns] +
+                  [CrewPlanner.UNFILLED_COST] * len(rows) for _, costs in rows]
+
+        chosen = {}
+        for (r, costs), col in zip(rows, CrewPlanner.assign(matrix)):
+            if col < len(columns) and columns[col] in costs:
+                chosen.setdefault(id(r), []).append(columns[col])
+        return chosen
+
+    def _cost(self, eid, f):
+        member = self.index.crew[eid]
+        cost = self._minutes.get(eid, 0) / 60
+        if member['qualified'] and not f['long_haul']:
+            cost += CrewPlanner.QUALIFIED_ON_SHORT_COST
+        legs = self.index.timelines[eid]
+        if not legs:
+            cost += CrewPlanner.RESERVE_COST
+        has_next_leg = bool(legs) and legs[-1][0] > f['departure']
+        if not has_next_leg and self._stranded(f['destination'], f['arrival']):
+            cost += CrewPlanner.STRANDING_COST
+        return cost
+
+    def _stranded(self, airport, arrival):
+        """ True if nothing departs from 'airport' in the STRANDING_HOURS after 'arrival'. """
+        times = self._departures.get(airport, [])
+        pos = bisect.bisect_left(times, arrival)
+        return pos == len(times) or times[pos] > arrival + timedelta(hours=CrewPlanner.STRANDING_HOURS)
+
+    def _minutes_flown(self, since):
+        minutes = {}
+        for eid, legs in self.index.timelines.items():
+            minutes[eid] = sum((arr - dep).total_seconds() / 60 for dep, arr, *_ in legs if dep >= since)
+        return minutes
+
+    @staticmethod
+    def _departures_by_airport(start, flights):
+        departures = {}
+        rows = DBService.run(
+            "SELECT DISTINCT Origin_AirportFK, Departure_Time FROM Flights "
+            "WHERE Status IN ('Active', 'Fully Booked') AND Departure_Time >= ?",
+            (start.strftime('%Y-%m-%d %H:%M'),), fetchall=True
+        )
+        for r in rows:
+            departures.setdefault(r['Origin_AirportFK'], []).append(
+                datetime.fromisoformat(str(r['Departure_Time']).replace(' ', 'T')[:16]))
+        for f in flights:
+            departures.setdefault(f['origin'], []).append(f['departure'])
+        for times in departures.values():
+            times.sort()
+        return departures
+
+    # ---------- assignment algorithm ----------
+    @staticmethod
+    def assign(cost):
+        """
+        Hungarian algorithm: matches every row to a different column at the lowest total cost.
+        'cost' is a list of rows with at least as many columns as rows. Returns the column of each row.
+        """
+        n, m = len(cost), len(cost[0])
+        u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+        match, way = [0] * (m + 1), [0] * (m + 1)  # match[column] = row (1-based, 0 = free)
+        for i in range(1, n + 1):
+            match[0] = i
+            j0 = 0
+            min_v = [float('inf')] * (m + 1)
+            used = [False] * (m + 1)
+            while True:
+                used[j0] = True
+                i0, delta, j1 = match[j0], float('inf'), 0
+                row = cost[i0 - 1]
+                for j in range(1, m + 1):
+                    if not used[j]:
+                        cur = row[j - 1] - u[i0] - v[j]
+                        if cur < min_v[j]:
+                            min_v[j], way[j] = cur, j0
+                        if min_v[j] < delta:
+                            delta, j1 = min_v[j], j
+                for j in range(m + 1):
+                    if used[j]:
+                        u[match[j]] += delta
+                        v[j] -= delta
+                    else:
+                        min_v[j] -= delta
+                j0 = j1
+                if match[j0] == 0:
+                    break
+            while j0:
+                j1 = way[j0]
+                match[j0] = match[j1]
+                j0 = j1
+
+        result = [0] * n
+        for j in range(1, m + 1):
+            if match[j]:
+                result[match[j] - 1] = j - 1
+        return result
+
+    # ---------- saving ----------
+    def apply(self, results):
+        """
+        Saves the planned crew of existing flights in one transaction.
+        Returns False (and saves nothing) if the schedule changed since the plan was made.
+        """
+        planned = [r for r in results if not r['error'] and r['flight']['flight_id']]
+        with DBService.transaction() as cursor:
+            version_before = Flight.get_schedule_version(cursor)
+            if version_before != self.base_version:
+                return False
+            cursor.executemany(
+                "INSERT INTO Flight_assigned (Employee_IDFK, Flight_IDFK) VALUES (?, ?)",
+                [(eid, r['flight']['flight_id']) for r in planned for eid in r['pilots'] + r['attendants']]
+            )
+            version_after = Flight.get_schedule_version(cursor)
+
+        def add_all():
+            for r in planned:
+                f = r['flight']
+                crew_index.add_flight(f['flight_id'], f['departure'], f['arrival'], f['origin'], f['destination'],
+                                      r['pilots'] + r['attendants'])
+
+        crew_index.apply(version_before, version_after, add_all)
+        return True
+
+    @staticmethod
+    def suggest(origin, destination, departure, arrival, airplane_size):
+        """
+        Suggested (pilot_ids, attendant_ids, error) for one new flight. If it can't be fully crewed the lists
+        are empty and 'error' tells why; otherwise 'error' is None.
+        """
+        result = CrewPlanner().plan([CrewPlanner.flight(origin, destination, departure, arrival, airplane_size)])[0]
+        return result['pilots'], result['attendants'], result['error']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan the crew of flights that have none")
+    parser.add_argument("--from", dest="start", required=True, help="first departure date, e.g. 2026-07-01")
+    parser.add_argument("--to", dest="end", required=True, help="last departure date (exclusive)")
+    parser.add_argument("--apply", action="store_true", help="save the planned crew")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+
+    started = time.perf_counter()
+    planner = CrewPlanner()
+    flights = CrewPlanner.flights_without_crew(args.start, args.end)
+    results = planner.plan(flights)
+    for r in results:
+        f = r['flight']
+        line = f"{f['flight_id']}  {f['origin']}->{f['destination']}  {f['departure']:%Y-%m-%d %H:%M}  "
+        print(line + (r['error'] or f"pilots {', '.join(r['pilots'])} | attendants {', '.join(r['attendants'])}"))
+    filled = sum(1 for r in results if not r['error'])
+    print(f"Planned {filled}/{len(results)} flights in {time.perf_counter() - started:.2f}s.")
+
+    if args.apply:
+        print("Saved." if planner.apply(results) else "The schedule changed meanwhile - nothing saved, run again.")
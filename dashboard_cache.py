@@ -0,0 +1,76 @@
+"""
+Cached snapshots of the manager dashboard (with the fleet figures of fleet_analytics.py).
+
+Each (start date, end date, include archive) filter keeps the last dashboard built for it, together with
+the data version it was built at (see Manager.get_report_version) and the day (peak months look back one
+year from today). A request costs one small query while nothing changed:
+- same version and day: the snapshot is returned as it is,
+- otherwise the old snapshot is still returned at once, and a new one is built in a background thread
+  (one per filter at a time), so the next refresh shows it (stale-while-revalidate),
+- a filter seen for the first time is built in the request.
+Snapshots are kept per worker process, at most MAX_ENTRIES filters, least recently used dropped first.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from fleet_analytics import FleetAnalytics
+from utilise import Manager, logger
+
+
+class DashboardCache:
+    """ Per-process cache of Manager.build_manager_dashboard results. """
+    MAX_ENTRIES = 64
+
+    _entries = OrderedDict()  # (start, end, include_archive) -> (version, day, assets)
+    _refreshing = set()  # Keys being rebuilt in the background
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(start_date=None, end_date=None, include_archive=False):
+        """ Returns the dashboard assets for the filter; assets["built_at"] tells when they were computed. """
+        key = (start_date or None, end_date or None, bool(include_archive))
+        version, today = Manager.get_report_version(), date.today()
+
+        with DashboardCache._lock:
+            entry = DashboardCache._entries.get(key)
+            if entry:
+                DashboardCache._entries.move_to_end(key)
+                if (entry[0], entry[1]) != (version, today) and key not in DashboardCache._refreshing:
+                    DashboardCache._refreshing.add(key)
+                    threading.Thread(target=DashboardCache._refresh, args=(key,),
+                                     name="dashboard-refresh", daemon=True).start()
+        if entry:
+            return entry[2]
+        return DashboardCache._build(key)
+
+    @staticmethod
+    def _build(key):
+        # The version is read first: a write during the build makes the snapshot stale, not wrong for good
+        version, today = Manager.get_report_version(), date.today()
+        assets = Manager.build_manager_dashboard(*key)
+        # Like the rest of the dashboard, the filter applies only with both dates (otherwise: the default period)
+        assets["fleet"] = FleetAnalytics.summary(key[0], key[1]) if key[0] and key[1] else FleetAnalytics.summary()
+        assets["built_at"] = datetime.now()
+        with DashboardCache._lock:
+            DashboardCache._entries[key] = (version, today, assets)
+            DashboardCache._entries.move_to_end(key)
+            while len(DashboardCache._entries) > DashboardCache.MAX_ENTRIES:
+                DashboardCache._entries.popitem(last=False)
+        return assets
+
+    @staticmethod
+    def _refresh(key):
+        try:
+            DashboardCache._build(key)
+        except Exception:
+            # The old snapshot stays; the next request tries again
+            logger.exception("Dashboard refresh failed for %s", key)
+        finally:
+            with DashboardCache._lock:
+                DashboardCache._refreshing.discard(key)
+
+    @staticmethod
+    def clear():
+        with DashboardCache._lock:
+            DashboardCache._entries.clear()
@@ -0,0 +1,70 @@
+"""
+Daily rollups behind the manager dashboard.
+
+Database triggers (see flytau.sql) keep three small tables up to date on every order and ticket write,
+for live and archived orders alike (told apart by the Archived column):
+    Daily_Order_Stats    orders, customer cancellations and revenue per day
+    Customer_Revenue     revenue of active and completed orders per customer
+    Daily_Route_Tickets  tickets of active and completed orders per route and day
+Orders and tickets are counted on the day the order was made. The dashboard answers any date range
+from these rows (see Manager.build_manager_dashboard) instead of scanning all orders.
+
+This script rebuilds the rollups from the orders, e.g. after manual edits to the data.
+
+Usage:
+    python dashboard_rollups.py
+"""
+import argparse
+
+from utilise import DBService
+
+
+class DashboardRollups:
+    """ Full rebuild of the dashboard rollup tables. """
+    SOURCES = [("Orders", "Tickets", 0), ("Orders_Archive", "Tickets_Archive", 1)]
+
+    @staticmethod
+    def rebuild(cursor=None):
+        """ Recomputes all rollups in one transaction. Returns (days, customers, route days). """
+        if cursor is None:
+            with DBService.transaction() as cursor:
+                return DashboardRollups.rebuild(cursor)
+
+        for table in ("Daily_Order_Stats", "Customer_Revenue", "Daily_Route_Tickets"):
+            cursor.execute(f"DELETE FROM {table}")
+        for orders, tickets, archived in DashboardRollups.SOURCES:
+            cursor.execute(f"""
+                INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+                SELECT date(Execute_DateTime), {archived}, COUNT(*),
+                       SUM(Status = 'Customer Cancellation'), SUM(COALESCE(Total_Price, 0))
+                FROM {orders}
+                GROUP BY date(Execute_DateTime)
+            """)
+            cursor.execute(f"""
+                INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+                SELECT Customer_email, {archived}, SUM(COALESCE(Total_Price, 0))
+                FROM {orders}
+                WHERE Status IN ('Completed', 'Active')
+                GROUP BY Customer_email
+            """)
+            cursor.execute(f"""
+                INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+                SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, {archived}, COUNT(*)
+                FROM {tickets} t
+                JOIN {orders} o ON o.Order_ID = t.Order_IDFK AND o.Status IN ('Completed', 'Active')
+                JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+                GROUP BY date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK
+            """)
+
+        return tuple(cursor.execute(f"SELECT COUNT(*) AS n FROM {table}").fetchone()['n']
+                     for table in ("Daily_Order_Stats", "Customer_Revenue", "Daily_Route_Tickets"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the manager dashboard rollups from the orders")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+    days, customers, route_days = DashboardRollups.rebuild()
+    print(f"Rollups rebuilt: {days} day rows, {customers} customers, {route_days} route-day rows.")
@@ -0,0 +1,267 @@
+"""
+Fleet utilization and cabin load factors.
+
+For the flights that depart in a period (canceled flights left out):
+- load factor: seats sold (tickets of active and completed orders, archived ones included) against
+  the seats of the cabin, per flight and class,
+- revenue per available seat: the ticket revenue of the cabins divided by their seats,
+- block hours of every airplane per day (the route durations of its legs), and the ground time
+  between its legs.
+One query returns a row per flight and class with its seats sold; window functions mark the first
+cabin of each flight and find the previous landing of the same airplane (LAG). The seats of every
+cabin are computed once from the Airplanes layouts (rows x columns) and matched with NumPy, and all
+totals are NumPy bincounts over the rows, read DBService.CHUNK_ROWS at a time. A year of flights
+takes well under a second.
+
+Usage:
+    python fleet_analytics.py                                  # the past year
+    python fleet_analytics.py --start 2026-01-01 --end 2026-06-30 --cabins cabins.csv
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utilise import DBService
+
+# Seats of every cabin, from the airplane layouts
+QUERY_CAPACITY = """
+SELECT Airplane_ID, Class_Type, Manufacturer, Size, Number_of_rows * Number_of_columns AS Seats
+FROM Airplanes
+"""
+
+# One row per flight and class departing in [?, ?)
+QUERY_CABINS = """
+WITH period_flights AS (
+    SELECT * FROM Flights
+    WHERE Status != 'Canceled' AND Departure_Time >= ? AND Departure_Time < ?
+),
+sold AS (
+    SELECT t.Flight_IDFK, t.Class_Type, COUNT(*) AS Seats_Sold, SUM(COALESCE(t.Price, 0)) AS Revenue
+    FROM Tickets t JOIN Orders o ON o.Order_ID = t.Order_IDFK AND o.Status IN ('Active', 'Completed')
+    WHERE t.Flight_IDFK IN (SELECT Flight_ID FROM period_flights)
+    GROUP BY t.Flight_IDFK, t.Class_Type
+    UNION ALL
+    SELECT t.Flight_IDFK, t.Class_Type, COUNT(*), SUM(COALESCE(t.Price, 0))
+    FROM Tickets_Archive t JOIN Orders_Archive o ON o.Order_ID = t.Order_IDFK AND o.Status IN ('Active', 'Completed')
+    WHERE t.Flight_IDFK IN (SELECT Flight_ID FROM period_flights)
+    GROUP BY t.Flight_IDFK, t.Class_Type
+),
+cabin_sales AS MATERIALIZED (
+    SELECT Flight_IDFK, Class_Type, SUM(Seats_Sold) AS Seats_Sold, SUM(Revenue) AS Revenue
+    FROM sold
+    GROUP BY Flight_IDFK, Class_Type
+),
+-- One row per flight, so the previous leg is the airplane's previous flight whatever cabins it had
+legs AS (
+    SELECT Flight_ID,
+           LAG(MIN(Arrival_Time)) OVER (PARTITION BY Airplane_IDFK ORDER BY MIN(Departure_Time)) AS Previous_Arrival
+    FROM period_flights
+    GROUP BY Flight_ID, Airplane_IDFK
+)
+SELECT
+    f.Flight_ID,
+    f.Class_TypeFK AS Class_Type,
+    f.Airplane_IDFK AS Airplane_ID,
+    f.Departure_Time,
+    r.Duration,
+    ROW_NUMBER() OVER (PARTITION BY f.Flight_ID ORDER BY f.Class_TypeFK) = 1 AS First_Cabin,
+    l.Previous_Arrival,
+    COALESCE(s.Seats_Sold, 0) AS Seats_Sold,
+    COALESCE(s.Revenue, 0) AS Revenue
+FROM period_flights f
+JOIN legs l ON l.Flight_ID = f.Flight_ID
+JOIN Routes r ON r.Origin_Airport = f.Origin_AirportFK AND r.Destination_Airport = f.Destination_AirportFK
+LEFT JOIN cabin_sales s ON s.Flight_IDFK = f.Flight_ID AND s.Class_Type = f.Class_TypeFK
+"""
+
+
+class FleetAnalytics:
+    """ Utilization, load factors and revenue per seat of the fleet. """
+    DEFAULT_DAYS = 365
+
+    @staticmethod
+    def period(start_date=None, end_date=None):
+        """
+        The period as (first day, last day); by default the DEFAULT_DAYS days up to today.
+        Raises ValueError for a day that is not YYYY-MM-DD.
+        """
+        end = date.fromisoformat(str(end_date)[:10]) if end_date else date.today()
+        start = (date.fromisoformat(str(start_date)[:10]) if start_date
+                 else end - timedelta(days=FleetAnalytics.DEFAULT_DAYS - 1))
+        return start, end
+
+    @staticmethod
+    def _chunks(cursor, start, end):
+        params = (start.isoformat(), (end + timedelta(days=1)).isoformat())
+        return pd.read_sql(QUERY_CABINS, cursor.connection, params=params, chunksize=DBService.CHUNK_ROWS)
+
+    @staticmethod
+    def _minutes(times):
+        """ Stored times -> datetime64 minutes (NaT for none). """
+        return pd.to_datetime(times, format='ISO8601').to_numpy().astype('datetime64[m]')
+
+    @staticmethod
+    def _seats(capacity, chunk):
+        """ Seats of each row's cabin, matched on (airplane, class); 0 for a cabin missing from Airplanes. """
+        cabin = pd.MultiIndex.from_frame(capacity[['Airplane_ID', 'Class_Type']]).get_indexer(
+            pd.MultiIndex.from_frame(chunk[['Airplane_ID', 'Class_Type']]))
+        return np.where(cabin >= 0, capacity['Seats'].to_numpy(dtype=float)[cabin], 0.0)
+
+    @staticmethod
+    def cabins(start_date=None, end_date=None):
+        """ One row per flight and class: seats, seats sold, load factor, revenue and revenue per seat. """
+        start, end = FleetAnalytics.period(start_date, end_date)
+        with DBService.report_cur() as cursor:
+            capacity = pd.read_sql(QUERY_CAPACITY, cursor.connection)
+            frames = []
+            for chunk in FleetAnalytics._chunks(cursor, start, end):
+                seats = FleetAnalytics._seats(capacity, chunk)
+                frames.append(chunk.drop(columns=['First_Cabin', 'Previous_Arrival']).assign(
+                    Seats=seats,
+                    Load_Factor=np.divide(chunk['Seats_Sold'], seats, out=np.zeros(len(chunk)), where=seats > 0),
+                    Revenue_Per_Seat=np.divide(chunk['Revenue'], seats, out=np.zeros(len(chunk)), where=seats > 0)))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    @staticmethod
+    def _empty(start, end):
+        """ The figures of a period without days. """
+        return {
+            "period": {"start": start, "end": end, "days": 0},
+            "totals": {"flights": 0, "seats": 0, "sold": 0, "load_factor": 0, "revenue": 0, "revenue_per_seat": 0,
+                       "daily_block_hours": 0},
+            "classes": [],
+            "airplanes": [],
+            "daily_block_hours": pd.DataFrame(),
+        }
+
+    @staticmethod
+    def summary(start_date=None, end_date=None):
+        """
+        The fleet figures of the reports page: totals, one entry per cabin class and per airplane, and
+        'daily_block_hours' (a DataFrame of block hours, airplanes x days).
+        None if a day is not a date; empty figures if the period ends before it starts.
+        """
+        try:
+            start, end = FleetAnalytics.period(start_date, end_date)
+        except ValueError:
+            return None
+        n_days = (end - start).days + 1
+        if n_days <= 0:
+            return FleetAnalytics._empty(start, end)
+        first_day = np.datetime64(start.isoformat(), 'D')
+
+        with DBService.report_cur() as cursor:
+            capacity = pd.read_sql(QUERY_CAPACITY, cursor.connection)
+            planes = np.unique(capacity['Airplane_ID'].to_numpy(dtype=str))
+            classes = np.unique(capacity['Class_Type'].to_numpy(dtype=str))
+            n = len(planes)
+
+            # Totals per airplane (index = position in 'planes') and per class, summed chunk by chunk
+            plane_sums = {k: np.zeros(n) for k in ("seats", "sold", "revenue", "legs", "ground", "turns")}
+            class_sums = {k: np.zeros(len(classes)) for k in ("seats", "sold", "revenue")}
+            block = np.zeros(n * n_days)  # Minutes, airplane-major
+
+            for chunk in FleetAnalytics._chunks(cursor, start, end):
+                plane_ids = chunk['Airplane_ID'].to_numpy(dtype=str)
+                p = np.searchsorted(planes, plane_ids).clip(0, max(n - 1, 0))
+                known = (planes[p] == plane_ids) if n else np.zeros(len(chunk), dtype=bool)
+                c = np.searchsorted(classes, chunk['Class_Type'].to_numpy(dtype=str)).clip(0, max(len(classes) - 1, 0))
+                seats = FleetAnalytics._seats(capacity, chunk)
+                sold = chunk['Seats_Sold'].to_numpy(dtype=float)
+                revenue = chunk['Revenue'].to_numpy(dtype=float)
+
+                for key, values in (("seats", seats), ("sold", sold), ("revenue", revenue)):
+                    plane_sums[key] += np.bincount(p[known], weights=values[known], minlength=n)
+                    class_sums[key] += np.bincount(c[known], weights=values[known], minlength=len(classes))
+
+                # Legs: one row per flight (its first cabin)
+                leg = known & chunk['First_Cabin'].to_numpy(dtype=bool)
+                departure = FleetAnalytics._minutes(chunk['Departure_Time'])
+                day = (departure.astype('datetime64[D]') - first_day).astype(int)
+                leg &= (day >= 0) & (day < n_days)
+                plane_sums["legs"] += np.bincount(p[leg], minlength=n)
+                block += np.bincount(p[leg] * n_days + day[leg],
+                                     weights=chunk['Duration'].to_numpy(dtype=float)[leg], minlength=n * n_days)
+
+                # Ground time since the previous landing of the same airplane
+                ground = (departure - FleetAnalytics._minutes(chunk['Previous_Arrival'])).astype(float)
+                turn = leg & ~np.isnan(ground) & (ground >= 0)
+                plane_sums["ground"] += np.bincount(p[turn], weights=ground[turn], minlength=n)
+                plane_sums["turns"] += np.bincount(p[turn], minlength=n)
+
+        block_hours = block.reshape(n, n_days) / 60.0
+        layout = capacity.drop_duplicates('Airplane_ID').set_index('Airplane_ID')
+
+        def ratio(a, b):
+            return np.divide(a, b, out=np.zeros_like(a, dtype=float), where=b > 0)
+
+        plane_load, plane_rasm = ratio(plane_sums["sold"], plane_sums["seats"]), ratio(plane_sums["revenue"],
+                                                                                        plane_sums["seats"])
+        class_load, class_rasm = ratio(class_sums["sold"], class_sums["seats"]), ratio(class_sums["revenue"],
+                                                                                        class_sums["seats"])
+        ground_hours = ratio(plane_sums["ground"], plane_sums["turns"]) / 60.0
+        seats, sold, revenue = (float(plane_sums[k].sum()) for k in ("seats", "sold", "revenue"))
+
+        return {
+            "period": {"start": start, "end": end, "days": n_days},
+            "totals": {
+                "flights": int(plane_sums["legs"].sum()),
+                "seats": int(seats),
+                "sold": int(sold),
+                "load_factor": round(100 * sold / seats, 1) if seats else 0,
+                "revenue": round(revenue, 2),
+                "revenue_per_seat": round(revenue / seats, 2) if seats else 0,
+                "daily_block_hours": round(float(block_hours.sum()) / (n * n_days), 2) if n else 0,
+            },
+            "classes": [
+                {"class": str(classes[i]), "seats": int(class_sums["seats"][i]), "sold": int(class_sums["sold"][i]),
+                 "load_factor": round(float(100 * class_load[i]), 1), "revenue_per_seat": round(float(class_rasm[i]), 2)}
+                for i in range(len(classes))
+            ],
+            "airplanes": [
+                {"airplane": str(planes[i]), "manufacturer": layout.at[planes[i], 'Manufacturer'],
+                 "size": layout.at[planes[i], 'Size'], "flights": int(plane_sums["legs"][i]),
+                 "block_hours": round(float(block_hours[i].sum()), 1),
+                 "daily_block_hours": round(float(block_hours[i].mean()), 2),
+                 "peak_day_hours": round(float(block_hours[i].max()), 1),
+                 "ground_hours": round(float(ground_hours[i]), 1), "load_factor": round(float(100 * plane_load[i]), 1),
+                 "revenue_per_seat": round(float(plane_rasm[i]), 2)}
+                for i in np.argsort(-block_hours.sum(axis=1), kind="stable")
+            ],
+            "daily_block_hours": pd.DataFrame(block_hours, index=planes,
+                                              columns=pd.date_range(start, periods=n_days, freq='D')),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fleet utilization, load factors and revenue per seat")
+    parser.add_argument("--start", help="first departure day (default: a year before --end)")
+    parser.add_argument("--end", help="last departure day (default: today)")
+    parser.add_argument("--cabins", help="also write the per-flight, per-class rows to this CSV file")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+
+    started = time.perf_counter()
+    result = FleetAnalytics.summary(args.start, args.end)
+    if result is None:
+        parser.error("--start and --end are days (YYYY-MM-DD)")
+    totals, period = result["totals"], result["period"]
+    print(f"{period['start']} - {period['end']}: {totals['flights']} flights, load factor {totals['load_factor']}%, "
+          f"revenue per available seat {totals['revenue_per_seat']:,.2f}, "
+          f"{totals['daily_block_hours']} block hours per airplane per day "
+          f"({time.perf_counter() - started:.2f}s)")
+    for row in result["classes"]:
+        print(f"  {row['class']:<10} {row['sold']:>8}/{row['seats']:<8} {row['load_factor']:>5}%  "
+              f"{row['revenue_per_seat']:>9,.2f} per seat")
+    for row in result["airplanes"]:
+        print(f"  {row['airplane']:<10} {row['flights']:>5} legs  {row['daily_block_hours']:>5} h/day  "
+              f"peak {row['peak_day_hours']:>4} h  ground {row['ground_hours']:>5} h  "
+              f"load {row['load_factor']:>5}%  {row['revenue_per_seat']:>9,.2f} per seat")
+    if args.cabins:
+        FleetAnalytics.cabins(args.start, args.end).to_csv(args.cabins, index=False)
+        print(args.cabins)
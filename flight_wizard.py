@@ -0,0 +1,123 @@
+"""
+Server-side state of the add-flight wizard.
+
+The manager's choices (origin, destination, departure, airplane) are kept in their session, so the
+pages don't send them back and forth in hidden fields. What is computed from them (route duration,
+flight type, arrival time, airplane size, the airplane and crew candidates and the suggested crew)
+is cached in memory per manager. Route data is recomputed only when the choices change, and
+candidate lists also when the schedule version changes (see Flight.get_schedule_version).
+If a worker has no cache entry yet (e.g. another process served the previous step), it is
+rebuilt from the choices in the session.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from crew_planner import CrewPlanner
+from utilise import DBService, Flight
+
+
+class FlightWizard:
+    """ One manager's add-flight wizard. Create it with FlightWizard.load(session). """
+    STEPS = ["origin", "destination", "departure_time", "airplane_id"]  # Order of the choices
+    SESSION_KEY = "flight_wizard"
+
+    _cache = {}  # manager id -> {name: (key, value)}
+    _lock = threading.Lock()
+
+    def __init__(self, manager_id, choices):
+        self.manager_id = manager_id
+        self.choices = choices
+        self._version = None
+
+    @staticmethod
+    def load(session):
+        return FlightWizard(session.get('Manager_ID'), dict(session.get(FlightWizard.SESSION_KEY, {})))
+
+    def choose(self, session, **choices):
+        """ Saves new choices; choices of later steps are forgotten, since they depended on the earlier ones. """
+        first = min(FlightWizard.STEPS.index(name) for name in choices)
+        self.choices = {name: value for name, value in self.choices.items()
+                        if FlightWizard.STEPS.index(name) < first}
+        self.choices.update(choices)
+        session[FlightWizard.SESSION_KEY] = self.choices
+
+    def reset(self, session):
+        session.pop(FlightWizard.SESSION_KEY, None)
+        self.choices = {}
+        with FlightWizard._lock:
+            FlightWizard._cache.pop(self.manager_id, None)
+
+    def has(self, *names):
+        return all(self.choices.get(name) for name in names)
+
+    @property
+    def origin(self):
+        return self.choices.get("origin")
+
+    @property
+    def destination(self):
+        return self.choices.get("destination")
+
+    @property
+    def departure_time(self):
+        return self.choices.get("departure_time")
+
+    @property
+    def airplane_id(self):
+        return self.choices.get("airplane_id")
+
+    # ---------- cached values ----------
+    def _cached(self, name, key, compute):
+        with FlightWizard._lock:
+            entry = FlightWizard._cache.setdefault(self.manager_id, {}).get(name)
+        if entry and entry[0] == key:
+            return entry[1]
+        value = compute()
+        with FlightWizard._lock:
+            FlightWizard._cache.setdefault(self.manager_id, {})[name] = (key, value)
+        return value
+
+    def schedule_version(self):
+        """ Read once per request. """
+        if self._version is None:
+            self._version = Flight.get_schedule_version()
+        return self._version
+
+    def route(self):
+        """ (duration in minutes, flight type, arrival time 'YYYY-MM-DD HH:MM') of the chosen route and departure. """
+        def compute():
+            duration = Flight.get_route_duration(self.origin, self.destination)
+            departure = datetime.fromisoformat(self.departure_time.replace(' ', 'T'))
+            arrival = (departure + timedelta(minutes=duration)).strftime('%Y-%m-%d %H:%M')
+            return duration, Flight.determine_flight_type(duration), arrival
+
+        return self._cached("route", (self.origin, self.destination, self.departure_time), compute)
+
+    def airplanes(self):
+        """ Airplanes available for the chosen route and departure. """
+        _, flight_type, _ = self.route()
+        key = (self.origin, flight_type, self.departure_time, self.schedule_version())
+        return self._cached("airplanes", key, lambda: [dict(r) for r in Flight.get_available_airplanes(
+            self.origin, DBService, flight_type, self.departure_time)])
+
+    def airplane_size(self):
+        return self._cached("airplane_size", self.airplane_id, lambda: DBService.run(
+            "SELECT Size FROM Airplanes WHERE Airplane_ID = ?", (self.airplane_id,), fetchone=True)['Size'])
+
+    def crew(self):
+        """
+        (pilots, attendants, suggested pilot ids, suggested attendant ids, why nothing was suggested or None)
+        for the chosen flight.
+        """
+        _, flight_type, arrival = self.route()
+        size = self.airplane_size()
+
+        def compute():
+            pilots, attendants = Flight.get_available_crew(DBService, self.origin, flight_type, self.departure_time,
+                                                           arrival, self.destination)
+            suggested_pilots, suggested_attendants, suggestion_error = CrewPlanner.suggest(
+                self.origin, self.destination, self.departure_time, arrival, size)
+            return pilots, attendants, suggested_pilots, suggested_attendants, suggestion_error
+
+        key = (self.origin, self.destination, self.departure_time, size, self.schedule_version())
+        return self._cached("crew", key, compute)
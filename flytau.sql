@@ -73,11 +73,60 @@ CREATE TABLE Tickets (
     Flight_IDFK VARCHAR(10),
     Row_Num INTEGER,
     Col_Num VARCHAR(1),
+    Class_Type VARCHAR(20),
+    Price FLOAT,
     PRIMARY KEY (Order_IDFK, Flight_IDFK, Row_Num, Col_Num),
     FOREIGN KEY (Order_IDFK) REFERENCES Orders(Order_ID),
     FOREIGN KEY (Flight_IDFK) REFERENCES Flights(Flight_ID)
 );
 
+CREATE INDEX idx_tickets_flight_class ON Tickets (Flight_IDFK, Class_Type);
+CREATE INDEX idx_flights_status_arrival ON Flights (Status, Arrival_Time);
+CREATE INDEX idx_orders_flight ON Orders (Flight_IDFK);
+CREATE INDEX idx_orders_customer ON Orders (Customer_email);
+
+-- Cold storage: orders (and their tickets) of flights that landed long ago, moved here by archive.py
+CREATE TABLE Orders_Archive (
+    Order_ID INTEGER PRIMARY KEY,
+    Flight_IDFK VARCHAR(10),
+    Customer_type VARCHAR(20),
+    Customer_email VARCHAR(100),
+    Execute_DateTime DATETIME,
+    Total_Price FLOAT,
+    Status VARCHAR(50),
+    Archived_At DATETIME
+);
+
+CREATE TABLE Tickets_Archive (
+    Order_IDFK INTEGER,
+    Flight_IDFK VARCHAR(10),
+    Row_Num INTEGER,
+    Col_Num VARCHAR(1),
+    Class_Type VARCHAR(20),
+    Price FLOAT,
+    PRIMARY KEY (Order_IDFK, Flight_IDFK, Row_Num, Col_Num)
+);
+
+CREATE INDEX idx_orders_archive_customer ON Orders_Archive (Customer_email);
+CREATE INDEX idx_tickets_archive_flight_class ON Tickets_Archive (Flight_IDFK, Class_Type);
+
+-- Work left after a flight is canceled: one row per affected customer (refund and notification).
+-- Written in the cancellation transaction and drained in batches by outbox.py
+CREATE TABLE Refund_Outbox (
+    Outbox_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Flight_IDFK VARCHAR(10),
+    Customer_email VARCHAR(100),
+    Customer_type VARCHAR(20),
+    Order_IDs TEXT,
+    Refund_Amount FLOAT,
+    Created_At DATETIME,
+    Claimed_Until DATETIME,
+    Processed_At DATETIME,
+    Attempts INTEGER NOT NULL DEFAULT 0,
+    Last_Error TEXT
+);
+CREATE INDEX idx_refund_outbox_pending ON Refund_Outbox (Outbox_ID) WHERE Processed_At IS NULL;
+
 CREATE TABLE FlightCrew (
     Employee_ID VARCHAR(50) PRIMARY KEY,
     First_Name VARCHAR(50),
@@ -139,6 +188,650 @@ BEGIN
     END;
 END;
 
+-- Bumped on every schedule change; in-memory indexes (crew availability) compare it to know they are current
+CREATE TABLE Schedule_Version (
+    Id INTEGER PRIMARY KEY CHECK (Id = 1),
+    Version INTEGER NOT NULL
+);
+INSERT INTO Schedule_Version VALUES (1, 0);
+
+CREATE TRIGGER trg_schedule_version_flight_insert AFTER INSERT ON Flights
+BEGIN
+    UPDATE Schedule_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_schedule_version_flight_update AFTER UPDATE OF Status, Departure_Time, Arrival_Time ON Flights
+BEGIN
+    UPDATE Schedule_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_schedule_version_assigned_insert AFTER INSERT ON Flight_assigned
+BEGIN
+    UPDATE Schedule_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_schedule_version_assigned_delete AFTER DELETE ON Flight_assigned
+BEGIN
+    UPDATE Schedule_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_schedule_version_crew_insert AFTER INSERT ON FlightCrew
+BEGIN
+    UPDATE Schedule_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+-- Where every airplane is: its scheduled legs, and the airport/time of its last landing. Kept by triggers
+CREATE TABLE Aircraft_Legs (
+    Airplane_IDFK VARCHAR(20),
+    Flight_IDFK VARCHAR(10),
+    Origin_Airport VARCHAR(50),
+    Destination_Airport VARCHAR(50),
+    Departure_Time DATETIME,
+    Arrival_Time DATETIME,
+    PRIMARY KEY (Airplane_IDFK, Flight_IDFK)
+);
+CREATE INDEX idx_aircraft_legs_departure ON Aircraft_Legs (Airplane_IDFK, Departure_Time);
+
+CREATE TABLE Aircraft_State (
+    Airplane_ID VARCHAR(20) PRIMARY KEY,
+    Location VARCHAR(50),
+    Last_Arrival DATETIME,
+    Last_Flight_ID VARCHAR(10)
+);
+CREATE INDEX idx_aircraft_state_location ON Aircraft_State (Location, Last_Arrival);
+
+CREATE TRIGGER trg_aircraft_state_airplane_insert AFTER INSERT ON Airplanes
+BEGIN
+    INSERT OR IGNORE INTO Aircraft_State (Airplane_ID) VALUES (NEW.Airplane_ID);
+END;
+
+CREATE TRIGGER trg_aircraft_legs_flight_insert AFTER INSERT ON Flights
+WHEN NEW.Status != 'Canceled'
+BEGIN
+    INSERT OR IGNORE INTO Aircraft_Legs
+    VALUES (NEW.Airplane_IDFK, NEW.Flight_ID, NEW.Origin_AirportFK, NEW.Destination_AirportFK,
+            NEW.Departure_Time, NEW.Arrival_Time);
+    UPDATE Aircraft_State
+    SET Location = NEW.Destination_AirportFK, Last_Arrival = NEW.Arrival_Time, Last_Flight_ID = NEW.Flight_ID
+    WHERE Airplane_ID = NEW.Airplane_IDFK AND (Last_Arrival IS NULL OR Last_Arrival < NEW.Arrival_Time);
+END;
+
+CREATE TRIGGER trg_aircraft_legs_flight_cancel AFTER UPDATE OF Status ON Flights
+WHEN NEW.Status = 'Canceled' AND OLD.Status != 'Canceled'
+BEGIN
+    DELETE FROM Aircraft_Legs WHERE Flight_IDFK = NEW.Flight_ID;
+    UPDATE Aircraft_State
+    SET (Location, Last_Arrival, Last_Flight_ID) = (
+        SELECT Destination_Airport, Arrival_Time, Flight_IDFK FROM Aircraft_Legs
+        WHERE Airplane_IDFK = Aircraft_State.Airplane_ID
+        ORDER BY Arrival_Time DESC LIMIT 1
+    )
+    WHERE Airplane_ID = NEW.Airplane_IDFK AND Last_Flight_ID = NEW.Flight_ID;
+END;
+
+-- Busy time of every airplane and crew member, as an R*Tree over minutes since 1970 (Id -> owner below).
+-- Finds everything that overlaps a time range without scanning the whole schedule. Kept by triggers
+CREATE VIRTUAL TABLE Schedule_Intervals USING rtree_i32(Id, Start_Minute, End_Minute);
+
+CREATE TABLE Schedule_Interval_Owners (
+    Id INTEGER PRIMARY KEY,
+    Resource_Type VARCHAR(20),
+    Resource_ID VARCHAR(50),
+    Flight_ID VARCHAR(10),
+    Start_Minute INTEGER,
+    End_Minute INTEGER,
+    UNIQUE (Resource_Type, Resource_ID, Flight_ID)
+);
+CREATE INDEX idx_interval_owners_flight ON Schedule_Interval_Owners (Flight_ID);
+
+CREATE TRIGGER trg_intervals_leg_insert AFTER INSERT ON Aircraft_Legs
+BEGIN
+    INSERT OR IGNORE INTO Schedule_Interval_Owners (Resource_Type, Resource_ID, Flight_ID, Start_Minute, End_Minute)
+    VALUES ('Airplane', NEW.Airplane_IDFK, NEW.Flight_IDFK,
+            CAST(strftime('%s', NEW.Departure_Time) AS INTEGER) / 60, CAST(strftime('%s', NEW.Arrival_Time) AS INTEGER) / 60);
+    INSERT INTO Schedule_Intervals
+    SELECT o.Id, o.Start_Minute, o.End_Minute FROM Schedule_Interval_Owners o
+    WHERE o.Flight_ID = NEW.Flight_IDFK AND NOT EXISTS (SELECT 1 FROM Schedule_Intervals r WHERE r.Id = o.Id);
+END;
+
+CREATE TRIGGER trg_intervals_leg_delete AFTER DELETE ON Aircraft_Legs
+BEGIN
+    DELETE FROM Schedule_Intervals WHERE Id IN (SELECT Id FROM Schedule_Interval_Owners WHERE Flight_ID = OLD.Flight_IDFK);
+    DELETE FROM Schedule_Interval_Owners WHERE Flight_ID = OLD.Flight_IDFK;
+END;
+
+CREATE TRIGGER trg_intervals_crew_insert AFTER INSERT ON Flight_assigned
+BEGIN
+    INSERT OR IGNORE INTO Schedule_Interval_Owners (Resource_Type, Resource_ID, Flight_ID, Start_Minute, End_Minute)
+    SELECT 'Crew', NEW.Employee_IDFK, NEW.Flight_IDFK,
+           CAST(strftime('%s', Departure_Time) AS INTEGER) / 60, CAST(strftime('%s', Arrival_Time) AS INTEGER) / 60
+    FROM Aircraft_Legs WHERE Flight_IDFK = NEW.Flight_IDFK;
+    INSERT INTO Schedule_Intervals
+    SELECT o.Id, o.Start_Minute, o.End_Minute FROM Schedule_Interval_Owners o
+    WHERE o.Flight_ID = NEW.Flight_IDFK AND NOT EXISTS (SELECT 1 FROM Schedule_Intervals r WHERE r.Id = o.Id);
+END;
+
+CREATE TRIGGER trg_intervals_crew_delete AFTER DELETE ON Flight_assigned
+BEGIN
+    DELETE FROM Schedule_Intervals WHERE Id IN (
+        SELECT Id FROM Schedule_Interval_Owners
+        WHERE Resource_Type = 'Crew' AND Resource_ID = OLD.Employee_IDFK AND Flight_ID = OLD.Flight_IDFK);
+    DELETE FROM Schedule_Interval_Owners
+    WHERE Resource_Type = 'Crew' AND Resource_ID = OLD.Employee_IDFK AND Flight_ID = OLD.Flight_IDFK;
+END;
+
+-- Flight hours of every crew member (completed flights only). The ledger has one row per crew member and
+-- completed flight; the totals follow it through triggers. crew_hours.py reconciles both with the flights
+CREATE TABLE Crew_Hours_Ledger (
+    Employee_IDFK VARCHAR(50),
+    Flight_IDFK VARCHAR(10),
+    Minutes INTEGER,
+    Long_Haul INTEGER,
+    PRIMARY KEY (Employee_IDFK, Flight_IDFK)
+);
+CREATE INDEX idx_crew_hours_ledger_flight ON Crew_Hours_Ledger (Flight_IDFK);
+
+CREATE TABLE Crew_Hours (
+    Employee_IDFK VARCHAR(50) PRIMARY KEY,
+    Short_Minutes INTEGER NOT NULL DEFAULT 0,
+    Long_Minutes INTEGER NOT NULL DEFAULT 0,
+    Flights INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER trg_crew_hours_add AFTER INSERT ON Crew_Hours_Ledger
+BEGIN
+    INSERT INTO Crew_Hours (Employee_IDFK, Short_Minutes, Long_Minutes, Flights)
+    VALUES (NEW.Employee_IDFK, CASE WHEN NEW.Long_Haul THEN 0 ELSE NEW.Minutes END,
+            CASE WHEN NEW.Long_Haul THEN NEW.Minutes ELSE 0 END, 1)
+    ON CONFLICT(Employee_IDFK) DO UPDATE SET Short_Minutes = Short_Minutes + excluded.Short_Minutes,
+                                             Long_Minutes = Long_Minutes + excluded.Long_Minutes,
+                                             Flights = Flights + 1;
+END;
+
+CREATE TRIGGER trg_crew_hours_remove AFTER DELETE ON Crew_Hours_Ledger
+BEGIN
+    UPDATE Crew_Hours
+    SET Short_Minutes = Short_Minutes - CASE WHEN OLD.Long_Haul THEN 0 ELSE OLD.Minutes END,
+        Long_Minutes = Long_Minutes - CASE WHEN OLD.Long_Haul THEN OLD.Minutes ELSE 0 END,
+        Flights = Flights - 1
+    WHERE Employee_IDFK = OLD.Employee_IDFK;
+END;
+
+CREATE TRIGGER trg_crew_hours_flight_completed AFTER UPDATE OF Status ON Flights
+WHEN NEW.Status = 'Completed' AND OLD.Status != 'Completed'
+BEGIN
+    INSERT OR IGNORE INTO Crew_Hours_Ledger
+    SELECT fa.Employee_IDFK, NEW.Flight_ID, r.Duration, r.Duration > 360
+    FROM Flight_assigned fa
+    JOIN Routes r ON r.Origin_Airport = NEW.Origin_AirportFK AND r.Destination_Airport = NEW.Destination_AirportFK
+    WHERE fa.Flight_IDFK = NEW.Flight_ID;
+END;
+
+CREATE TRIGGER trg_crew_hours_flight_reopened AFTER UPDATE OF Status ON Flights
+WHEN OLD.Status = 'Completed' AND NEW.Status != 'Completed'
+BEGIN
+    DELETE FROM Crew_Hours_Ledger WHERE Flight_IDFK = NEW.Flight_ID;
+END;
+
+CREATE TRIGGER trg_crew_hours_crew_assigned AFTER INSERT ON Flight_assigned
+BEGIN
+    INSERT OR IGNORE INTO Crew_Hours_Ledger
+    SELECT NEW.Employee_IDFK, f.Flight_ID, r.Duration, r.Duration > 360
+    FROM Flights f
+    JOIN Routes r ON r.Origin_Airport = f.Origin_AirportFK AND r.Destination_Airport = f.Destination_AirportFK
+    WHERE f.Flight_ID = NEW.Flight_IDFK AND f.Status = 'Completed'
+    LIMIT 1;
+END;
+
+CREATE TRIGGER trg_crew_hours_crew_unassigned AFTER DELETE ON Flight_assigned
+BEGIN
+    DELETE FROM Crew_Hours_Ledger WHERE Employee_IDFK = OLD.Employee_IDFK AND Flight_IDFK = OLD.Flight_IDFK;
+END;
+
+-- Daily rollups for the manager dashboard, kept up to date by triggers on the orders and tickets tables
+-- (live and archived, told apart by Archived), so the dashboard reads O(days) rows instead of every order.
+-- Orders and tickets are counted on the day the order was made. dashboard_rollups.py rebuilds them
+CREATE TABLE Daily_Order_Stats (
+    Day DATE,
+    Archived INTEGER,
+    Orders INTEGER NOT NULL DEFAULT 0,
+    Cancellations INTEGER NOT NULL DEFAULT 0,
+    Revenue FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Day, Archived)
+);
+
+CREATE TABLE Customer_Revenue (
+    Customer_email VARCHAR(100),
+    Archived INTEGER,
+    Revenue FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Customer_email, Archived)
+);
+
+CREATE TABLE Daily_Route_Tickets (
+    Day DATE,
+    Origin VARCHAR(50),
+    Destination VARCHAR(50),
+    Archived INTEGER,
+    Tickets INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (Day, Origin, Destination, Archived)
+);
+
+CREATE TRIGGER trg_rollups_order_insert AFTER INSERT ON Orders
+BEGIN
+    INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+    VALUES (date(NEW.Execute_DateTime), 0, 1, (NEW.Status = 'Customer Cancellation'), COALESCE(NEW.Total_Price, 0))
+    ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                            Cancellations = Cancellations + excluded.Cancellations,
+                                            Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+    SELECT NEW.Customer_email, 0, COALESCE(NEW.Total_Price, 0) WHERE NEW.Status IN ('Completed', 'Active')
+    ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(NEW.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 0, COUNT(*)
+    FROM Tickets t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+    WHERE t.Order_IDFK = NEW.Order_ID AND NEW.Status IN ('Completed', 'Active')
+    GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_order_update AFTER UPDATE OF Execute_DateTime, Total_Price, Status, Customer_email ON Orders
+BEGIN
+    INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+    VALUES (date(OLD.Execute_DateTime), 0, -1, -(OLD.Status = 'Customer Cancellation'), -COALESCE(OLD.Total_Price, 0))
+    ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                            Cancellations = Cancellations + excluded.Cancellations,
+                                            Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+    SELECT OLD.Customer_email, 0, -COALESCE(OLD.Total_Price, 0) WHERE OLD.Status IN ('Completed', 'Active')
+    ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(OLD.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 0, -COUNT(*)
+    FROM Tickets t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+    WHERE t.Order_IDFK = OLD.Order_ID AND OLD.Status IN ('Completed', 'Active')
+    GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+    INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+    VALUES (date(NEW.Execute_DateTime), 0, 1, (NEW.Status = 'Customer Cancellation'), COALESCE(NEW.Total_Price, 0))
+    ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                            Cancellations = Cancellations + excluded.Cancellations,
+                                            Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+    SELECT NEW.Customer_email, 0, COALESCE(NEW.Total_Price, 0) WHERE NEW.Status IN ('Completed', 'Active')
+    ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(NEW.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 0, COUNT(*)
+    FROM Tickets t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+    WHERE t.Order_IDFK = NEW.Order_ID AND NEW.Status IN ('Completed', 'Active')
+    GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_order_delete AFTER DELETE ON Orders
+BEGIN
+    INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+    VALUES (date(OLD.Execute_DateTime), 0, -1, -(OLD.Status = 'Customer Cancellation'), -COALESCE(OLD.Total_Price, 0))
+    ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                            Cancellations = Cancellations + excluded.Cancellations,
+                                            Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+    SELECT OLD.Customer_email, 0, -COALESCE(OLD.Total_Price, 0) WHERE OLD.Status IN ('Completed', 'Active')
+    ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(OLD.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 0, -COUNT(*)
+    FROM Tickets t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+    WHERE t.Order_IDFK = OLD.Order_ID AND OLD.Status IN ('Completed', 'Active')
+    GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_ticket_insert AFTER INSERT ON Tickets
+BEGIN
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 0, 1
+    FROM Orders o JOIN Flights f ON f.Flight_ID = NEW.Flight_IDFK AND f.Class_TypeFK = NEW.Class_Type
+    WHERE o.Order_ID = NEW.Order_IDFK AND o.Status IN ('Completed', 'Active')
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_ticket_update AFTER UPDATE OF Order_IDFK, Flight_IDFK, Class_Type ON Tickets
+BEGIN
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 0, -1
+    FROM Orders o JOIN Flights f ON f.Flight_ID = OLD.Flight_IDFK AND f.Class_TypeFK = OLD.Class_Type
+    WHERE o.Order_ID = OLD.Order_IDFK AND o.Status IN ('Completed', 'Active')
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 0, 1
+    FROM Orders o JOIN Flights f ON f.Flight_ID = NEW.Flight_IDFK AND f.Class_TypeFK = NEW.Class_Type
+    WHERE o.Order_ID = NEW.Order_IDFK AND o.Status IN ('Completed', 'Active')
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_ticket_delete AFTER DELETE ON Tickets
+BEGIN
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 0, -1
+    FROM Orders o JOIN Flights f ON f.Flight_ID = OLD.Flight_IDFK AND f.Class_TypeFK = OLD.Class_Type
+    WHERE o.Order_ID = OLD.Order_IDFK AND o.Status IN ('Completed', 'Active')
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_archive_order_insert AFTER INSERT ON Orders_Archive
+BEGIN
+    INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+    VALUES (date(NEW.Execute_DateTime), 1, 1, (NEW.Status = 'Customer Cancellation'), COALESCE(NEW.Total_Price, 0))
+    ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                            Cancellations = Cancellations + excluded.Cancellations,
+                                            Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+    SELECT NEW.Customer_email, 1, COALESCE(NEW.Total_Price, 0) WHERE NEW.Status IN ('Completed', 'Active')
+    ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(NEW.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 1, COUNT(*)
+    FROM Tickets_Archive t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+    WHERE t.Order_IDFK = NEW.Order_ID AND NEW.Status IN ('Completed', 'Active')
+    GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_archive_order_update AFTER UPDATE OF Execute_DateTime, Total_Price, Status, Customer_email ON Orders_Archive
+BEGIN
+    INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+    VALUES (date(OLD.Execute_DateTime), 1, -1, -(OLD.Status = 'Customer Cancellation'), -COALESCE(OLD.Total_Price, 0))
+    ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                            Cancellations = Cancellations + excluded.Cancellations,
+                                            Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+    SELECT OLD.Customer_email, 1, -COALESCE(OLD.Total_Price, 0) WHERE OLD.Status IN ('Completed', 'Active')
+    ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(OLD.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 1, -COUNT(*)
+    FROM Tickets_Archive t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+    WHERE t.Order_IDFK = OLD.Order_ID AND OLD.Status IN ('Completed', 'Active')
+    GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+    INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+    VALUES (date(NEW.Execute_DateTime), 1, 1, (NEW.Status = 'Customer Cancellation'), COALESCE(NEW.Total_Price, 0))
+    ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                            Cancellations = Cancellations + excluded.Cancellations,
+                                            Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+    SELECT NEW.Customer_email, 1, COALESCE(NEW.Total_Price, 0) WHERE NEW.Status IN ('Completed', 'Active')
+    ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(NEW.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 1, COUNT(*)
+    FROM Tickets_Archive t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+    WHERE t.Order_IDFK = NEW.Order_ID AND NEW.Status IN ('Completed', 'Active')
+    GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_archive_order_delete AFTER DELETE ON Orders_Archive
+BEGIN
+    INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+    VALUES (date(OLD.Execute_DateTime), 1, -1, -(OLD.Status = 'Customer Cancellation'), -COALESCE(OLD.Total_Price, 0))
+    ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                            Cancellations = Cancellations + excluded.Cancellations,
+                                            Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+    SELECT OLD.Customer_email, 1, -COALESCE(OLD.Total_Price, 0) WHERE OLD.Status IN ('Completed', 'Active')
+    ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(OLD.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 1, -COUNT(*)
+    FROM Tickets_Archive t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+    WHERE t.Order_IDFK = OLD.Order_ID AND OLD.Status IN ('Completed', 'Active')
+    GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_archive_ticket_insert AFTER INSERT ON Tickets_Archive
+BEGIN
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 1, 1
+    FROM Orders_Archive o JOIN Flights f ON f.Flight_ID = NEW.Flight_IDFK AND f.Class_TypeFK = NEW.Class_Type
+    WHERE o.Order_ID = NEW.Order_IDFK AND o.Status IN ('Completed', 'Active')
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_archive_ticket_update AFTER UPDATE OF Order_IDFK, Flight_IDFK, Class_Type ON Tickets_Archive
+BEGIN
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 1, -1
+    FROM Orders_Archive o JOIN Flights f ON f.Flight_ID = OLD.Flight_IDFK AND f.Class_TypeFK = OLD.Class_Type
+    WHERE o.Order_ID = OLD.Order_IDFK AND o.Status IN ('Completed', 'Active')
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 1, 1
+    FROM Orders_Archive o JOIN Flights f ON f.Flight_ID = NEW.Flight_IDFK AND f.Class_TypeFK = NEW.Class_Type
+    WHERE o.Order_ID = NEW.Order_IDFK AND o.Status IN ('Completed', 'Active')
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+CREATE TRIGGER trg_rollups_archive_ticket_delete AFTER DELETE ON Tickets_Archive
+BEGIN
+    INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+    SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, 1, -1
+    FROM Orders_Archive o JOIN Flights f ON f.Flight_ID = OLD.Flight_IDFK AND f.Class_TypeFK = OLD.Class_Type
+    WHERE o.Order_ID = OLD.Order_IDFK AND o.Status IN ('Completed', 'Active')
+    ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;
+END;
+
+-- Bumped on every order, ticket, flight and crew write; cached report snapshots compare it to know they are current
+CREATE TABLE Data_Version (
+    Id INTEGER PRIMARY KEY CHECK (Id = 1),
+    Version INTEGER NOT NULL
+);
+INSERT INTO Data_Version VALUES (1, 0);
+
+CREATE TRIGGER trg_data_version_order_insert AFTER INSERT ON Orders
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_order_update AFTER UPDATE ON Orders
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_order_delete AFTER DELETE ON Orders
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_ticket_insert AFTER INSERT ON Tickets
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_ticket_update AFTER UPDATE ON Tickets
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_ticket_delete AFTER DELETE ON Tickets
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_flight_insert AFTER INSERT ON Flights
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_flight_update AFTER UPDATE ON Flights
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_assigned_insert AFTER INSERT ON Flight_assigned
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_assigned_delete AFTER DELETE ON Flight_assigned
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_crew_insert AFTER INSERT ON FlightCrew
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+CREATE TRIGGER trg_data_version_crew_update AFTER UPDATE ON FlightCrew
+BEGIN
+    UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1;
+END;
+
+-- Top-N leaderboards of the dashboard (customers by revenue, routes by tickets, employees by minutes flown),
+-- per month ('YYYY-MM') and for all time (''); Scope 1 counts archived orders too. Kept by triggers on the
+-- order writes, the route rollup and the crew-hours ledger, so the top N is read off idx_leaderboards_rank.
+-- leaderboards.py rebuilds them
+CREATE TABLE Leaderboards (
+    Board VARCHAR(20),
+    Period VARCHAR(7),
+    Scope INTEGER,
+    Item VARCHAR(120),
+    Score FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Board, Period, Scope, Item)
+);
+CREATE INDEX idx_leaderboards_rank ON Leaderboards (Board, Period, Scope, Score);
+
+CREATE TRIGGER trg_leaderboards_order_insert AFTER INSERT ON Orders
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'customers', p.Period, s.Scope, NEW.Customer_email, COALESCE(NEW.Total_Price, 0)
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', NEW.Execute_DateTime)) p, (SELECT 0 AS Scope UNION ALL SELECT 1) s
+    WHERE NEW.Status IN ('Completed', 'Active')
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+END;
+
+CREATE TRIGGER trg_leaderboards_order_update AFTER UPDATE OF Execute_DateTime, Total_Price, Status, Customer_email ON Orders
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'customers', p.Period, s.Scope, OLD.Customer_email, -COALESCE(OLD.Total_Price, 0)
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', OLD.Execute_DateTime)) p, (SELECT 0 AS Scope UNION ALL SELECT 1) s
+    WHERE OLD.Status IN ('Completed', 'Active')
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'customers', p.Period, s.Scope, NEW.Customer_email, COALESCE(NEW.Total_Price, 0)
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', NEW.Execute_DateTime)) p, (SELECT 0 AS Scope UNION ALL SELECT 1) s
+    WHERE NEW.Status IN ('Completed', 'Active')
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    DELETE FROM Leaderboards
+    WHERE Board = 'customers' AND Period IN ('', strftime('%Y-%m', OLD.Execute_DateTime), strftime('%Y-%m', NEW.Execute_DateTime)) AND Scope IN (0, 1) AND Item IN (OLD.Customer_email, NEW.Customer_email)
+      AND Score BETWEEN -0.005 AND 0.005;
+END;
+
+CREATE TRIGGER trg_leaderboards_order_delete AFTER DELETE ON Orders
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'customers', p.Period, s.Scope, OLD.Customer_email, -COALESCE(OLD.Total_Price, 0)
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', OLD.Execute_DateTime)) p, (SELECT 0 AS Scope UNION ALL SELECT 1) s
+    WHERE OLD.Status IN ('Completed', 'Active')
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    DELETE FROM Leaderboards
+    WHERE Board = 'customers' AND Period IN ('', strftime('%Y-%m', OLD.Execute_DateTime)) AND Scope IN (0, 1) AND Item IN (OLD.Customer_email)
+      AND Score BETWEEN -0.005 AND 0.005;
+END;
+
+CREATE TRIGGER trg_leaderboards_archive_order_insert AFTER INSERT ON Orders_Archive
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'customers', p.Period, 1, NEW.Customer_email, COALESCE(NEW.Total_Price, 0)
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', NEW.Execute_DateTime)) p
+    WHERE NEW.Status IN ('Completed', 'Active')
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+END;
+
+CREATE TRIGGER trg_leaderboards_archive_order_update AFTER UPDATE OF Execute_DateTime, Total_Price, Status, Customer_email ON Orders_Archive
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'customers', p.Period, 1, OLD.Customer_email, -COALESCE(OLD.Total_Price, 0)
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', OLD.Execute_DateTime)) p
+    WHERE OLD.Status IN ('Completed', 'Active')
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'customers', p.Period, 1, NEW.Customer_email, COALESCE(NEW.Total_Price, 0)
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', NEW.Execute_DateTime)) p
+    WHERE NEW.Status IN ('Completed', 'Active')
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    DELETE FROM Leaderboards
+    WHERE Board = 'customers' AND Period IN ('', strftime('%Y-%m', OLD.Execute_DateTime), strftime('%Y-%m', NEW.Execute_DateTime)) AND Scope IN (0, 1) AND Item IN (OLD.Customer_email, NEW.Customer_email)
+      AND Score BETWEEN -0.005 AND 0.005;
+END;
+
+CREATE TRIGGER trg_leaderboards_archive_order_delete AFTER DELETE ON Orders_Archive
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'customers', p.Period, 1, OLD.Customer_email, -COALESCE(OLD.Total_Price, 0)
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', OLD.Execute_DateTime)) p
+    WHERE OLD.Status IN ('Completed', 'Active')
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    DELETE FROM Leaderboards
+    WHERE Board = 'customers' AND Period IN ('', strftime('%Y-%m', OLD.Execute_DateTime)) AND Scope IN (0, 1) AND Item IN (OLD.Customer_email)
+      AND Score BETWEEN -0.005 AND 0.005;
+END;
+
+CREATE TRIGGER trg_leaderboards_route_insert AFTER INSERT ON Daily_Route_Tickets
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'routes', p.Period, s.Scope, NEW.Origin || ' → ' || NEW.Destination, NEW.Tickets
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', NEW.Day)) p, (SELECT 0 AS Scope UNION ALL SELECT 1) s
+    WHERE s.Scope >= NEW.Archived
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+END;
+
+CREATE TRIGGER trg_leaderboards_route_update AFTER UPDATE ON Daily_Route_Tickets
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'routes', p.Period, s.Scope, OLD.Origin || ' → ' || OLD.Destination, -OLD.Tickets
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', OLD.Day)) p, (SELECT 0 AS Scope UNION ALL SELECT 1) s
+    WHERE s.Scope >= OLD.Archived
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'routes', p.Period, s.Scope, NEW.Origin || ' → ' || NEW.Destination, NEW.Tickets
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', NEW.Day)) p, (SELECT 0 AS Scope UNION ALL SELECT 1) s
+    WHERE s.Scope >= NEW.Archived
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    DELETE FROM Leaderboards
+    WHERE Board = 'routes' AND Period IN ('', strftime('%Y-%m', OLD.Day), strftime('%Y-%m', NEW.Day)) AND Scope IN (0, 1) AND Item IN (OLD.Origin || ' → ' || OLD.Destination, NEW.Origin || ' → ' || NEW.Destination)
+      AND Score BETWEEN -0.005 AND 0.005;
+END;
+
+CREATE TRIGGER trg_leaderboards_route_delete AFTER DELETE ON Daily_Route_Tickets
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'routes', p.Period, s.Scope, OLD.Origin || ' → ' || OLD.Destination, -OLD.Tickets
+    FROM (SELECT '' AS Period UNION ALL SELECT strftime('%Y-%m', OLD.Day)) p, (SELECT 0 AS Scope UNION ALL SELECT 1) s
+    WHERE s.Scope >= OLD.Archived
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    DELETE FROM Leaderboards
+    WHERE Board = 'routes' AND Period IN ('', strftime('%Y-%m', OLD.Day)) AND Scope IN (0, 1) AND Item IN (OLD.Origin || ' → ' || OLD.Destination)
+      AND Score BETWEEN -0.005 AND 0.005;
+END;
+
+CREATE TRIGGER trg_leaderboards_crew_add AFTER INSERT ON Crew_Hours_Ledger
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'employees', p.Period, 0, NEW.Employee_IDFK, NEW.Minutes
+    FROM (SELECT '' AS Period UNION ALL SELECT (SELECT strftime('%Y-%m', MIN(Departure_Time)) FROM Flights WHERE Flight_ID = NEW.Flight_IDFK)) p
+    WHERE true  -- Needed before ON CONFLICT in INSERT ... SELECT
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+END;
+
+CREATE TRIGGER trg_leaderboards_crew_remove AFTER DELETE ON Crew_Hours_Ledger
+BEGIN
+    INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+    SELECT 'employees', p.Period, 0, OLD.Employee_IDFK, -OLD.Minutes
+    FROM (SELECT '' AS Period UNION ALL SELECT (SELECT strftime('%Y-%m', MIN(Departure_Time)) FROM Flights WHERE Flight_ID = OLD.Flight_IDFK)) p
+    WHERE true  -- Needed before ON CONFLICT in INSERT ... SELECT
+    ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;
+    DELETE FROM Leaderboards
+    WHERE Board = 'employees' AND Period IN ('', (SELECT strftime('%Y-%m', MIN(Departure_Time)) FROM Flights WHERE Flight_ID = OLD.Flight_IDFK)) AND Scope IN (0, 1) AND Item IN (OLD.Employee_IDFK)
+      AND Score BETWEEN -0.005 AND 0.005;
+END;
+
 INSERT INTO Airplanes VALUES
 ('B747-11', 'Boeing', 'large', '2015-10-10', 'Business', 10, 6),
 ('B747-11', 'Boeing', 'large', '2015-10-10', 'Economy', 30, 6),
@@ -347,7 +1040,7 @@ INSERT INTO Orders VALUES
 (20, 'UA303', 'Registered', 'olivia.hill@email.com', '2024-03-03 12:00:00', 280.0, 'Completed'),
 (21, 'LY606', 'Guest', 'guest5@email.com', '2024-03-04 13:00:00', 60.0 , 'Customer Cancellation');
 
-INSERT INTO Tickets VALUES
+INSERT INTO Tickets (Order_IDFK, Flight_IDFK, Row_Num, Col_Num) VALUES
 (4, 'LY606', 1, 'B'),
 (5, 'AA505', 1, 'C'),
 (19, 'LY110', 5, 'C'),
@@ -375,6 +1068,19 @@ INSERT INTO Tickets VALUES
 (18, 'LY111', 7, 'B'),
 (15, 'AF113', 1, 'D');
 
+-- Cabin class and unit price of the seed tickets (Business rows come first on every airplane)
+UPDATE Tickets SET Class_Type = CASE
+    WHEN Row_Num <= COALESCE((SELECT a.Number_of_rows
+                              FROM Flights f
+                              JOIN Airplanes a ON a.Airplane_ID = f.Airplane_IDFK AND a.Class_Type = 'Business'
+                              WHERE f.Flight_ID = Tickets.Flight_IDFK
+                              LIMIT 1), 0)
+    THEN 'Business' ELSE 'Economy' END;
+
+UPDATE Tickets SET Price = (SELECT COALESCE(f.Economy_price, f.Business_price)
+                            FROM Flights f
+                            WHERE f.Flight_ID = Tickets.Flight_IDFK AND f.Class_TypeFK = Tickets.Class_Type);
+
 
 INSERT INTO Flight_assigned VALUES
 ('111111111', 'LY808'), ('111111111', 'UA303'),
@@ -426,24 +1132,18 @@ FROM (
 SELECT
     a.Size AS Airplane_Size,
     a.Manufacturer AS Airplane_Manufacturer,
-    a.Class_Type AS Cabin_Class,
-    ROUND(SUM(o.Total_Price), 2) AS Total_Revenue
-FROM Orders o
-JOIN Flights f ON o.Flight_IDFK = f.Flight_ID
-JOIN Airplanes a ON f.Airplane_IDFK = a.Airplane_ID AND f.Class_TypeFK = a.Class_Type
-WHERE EXISTS (
-    SELECT 1 FROM Tickets t
-    WHERE t.Order_IDFK = o.Order_ID
-    AND t.Flight_IDFK = f.Flight_ID
-    AND (
-        (a.Class_Type = 'Business' AND t.Row_Num <= a.Number_of_rows)
-        OR
-        (a.Class_Type = 'Economy' AND t.Row_Num >
-            COALESCE((SELECT a2.Number_of_rows FROM Airplanes a2
-                      WHERE a2.Airplane_ID = a.Airplane_ID AND a2.Class_Type = 'Business'), 0))
-    )
-)
-GROUP BY a.Size, a.Manufacturer, a.Class_Type
+    t.Class_Type AS Cabin_Class,
+    ROUND(SUM(t.Revenue_Share), 2) AS Total_Revenue
+FROM (
+    SELECT t.Flight_IDFK, t.Class_Type,
+           o.Total_Price * COALESCE(t.Price / NULLIF(SUM(t.Price) OVER w, 0), 1.0 / COUNT(*) OVER w) AS Revenue_Share
+    FROM Tickets t
+    JOIN Orders o ON t.Order_IDFK = o.Order_ID
+    WINDOW w AS (PARTITION BY t.Order_IDFK)
+) t
+JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+JOIN Airplanes a ON a.Airplane_ID = f.Airplane_IDFK AND a.Class_Type = t.Class_Type
+GROUP BY a.Size, a.Manufacturer, t.Class_Type
 ORDER BY Total_Revenue DESC;
 
 SELECT
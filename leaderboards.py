@@ -0,0 +1,89 @@
+"""
+Top-N leaderboards of the manager dashboard.
+
+The Leaderboards table keeps one score per board, period, scope and item, and database triggers
+(see flytau.sql) update it on every event that changes a score:
+    customers   revenue of active and completed orders      order writes (live and archived)
+    routes      tickets of active and completed orders      Daily_Route_Tickets (the dashboard rollup)
+    employees   minutes flown on completed flights          Crew_Hours_Ledger
+Each score is kept for all time (Period '') and for its month ('YYYY-MM': the month the order was made,
+or the month the flight departed). Scope 0 counts live orders only, scope 1 archived orders as well
+(employees only have scope 0). An item whose score goes back to 0 is deleted. An event costs a few
+index updates, and the top N of any board and period is read straight off the (Board, Period, Scope,
+Score) index (see Manager.get_leaderboard).
+
+This script rebuilds the leaderboards from their sources, or prints one.
+
+Usage:
+    python leaderboards.py --rebuild
+    python leaderboards.py customers --top 10 --period 2026-10 --include-archive
+"""
+import argparse
+
+from utilise import DBService, Manager
+
+
+class Leaderboards:
+    """ Full rebuild of the Leaderboards table. """
+    BOARDS = ("customers", "routes", "employees")
+
+    # (board, source rows, archived flag of a row, item, score, order or flight month)
+    SOURCES = [
+        ("customers", "Orders WHERE Status IN ('Completed', 'Active')", "0", "Customer_email",
+         "COALESCE(Total_Price, 0)", "strftime('%Y-%m', Execute_DateTime)"),
+        ("customers", "Orders_Archive WHERE Status IN ('Completed', 'Active')", "1", "Customer_email",
+         "COALESCE(Total_Price, 0)", "strftime('%Y-%m', Execute_DateTime)"),
+        ("routes", "Daily_Route_Tickets WHERE 1=1", "Archived", "Origin || ' → ' || Destination",
+         "Tickets", "strftime('%Y-%m', Day)"),
+        ("employees", """Crew_Hours_Ledger l
+            LEFT JOIN (SELECT Flight_ID, MIN(Departure_Time) AS Departure_Time FROM Flights GROUP BY Flight_ID) f
+                   ON f.Flight_ID = l.Flight_IDFK
+            WHERE 1=1""", "0", "l.Employee_IDFK", "l.Minutes", "strftime('%Y-%m', f.Departure_Time)"),
+    ]
+
+    @staticmethod
+    def rebuild(cursor=None):
+        """ Recomputes all leaderboards in one transaction. Returns {board: rows}. """
+        if cursor is None:
+            with DBService.transaction() as cursor:
+                return Leaderboards.rebuild(cursor)
+
+        cursor.execute("DELETE FROM Leaderboards")
+        for board, source, archived, item, score, month in Leaderboards.SOURCES:
+            for scope in ((0,) if board == "employees" else (0, 1)):
+                for period in ("''", month):
+                    cursor.execute(f"""
+                        INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+                        SELECT '{board}', {period}, {scope}, {item}, SUM({score})
+                        FROM {source} AND {archived} <= {scope}
+                        GROUP BY 2, 4
+                        ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score
+                    """)
+        # Like the triggers, a board keeps no item with a score of 0
+        cursor.execute("DELETE FROM Leaderboards WHERE Score BETWEEN -0.005 AND 0.005")
+
+        return {r['Board']: r['n'] for r in cursor.execute(
+            "SELECT Board, COUNT(*) AS n FROM Leaderboards GROUP BY Board").fetchall()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or print the dashboard leaderboards")
+    parser.add_argument("board", nargs="?", choices=Leaderboards.BOARDS, help="board to print")
+    parser.add_argument("--top", type=int, default=10, help="number of places to print")
+    parser.add_argument("--period", default="", help="month (YYYY-MM); default: all time")
+    parser.add_argument("--include-archive", action="store_true", help="count archived orders as well")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the leaderboards from their sources")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+    if not (args.rebuild or args.board):
+        parser.error("give a board to print or --rebuild")
+
+    if args.rebuild:
+        counts = Leaderboards.rebuild()
+        print("Leaderboards rebuilt: " + ", ".join(f"{counts.get(b, 0)} {b} rows" for b in Leaderboards.BOARDS) + ".")
+    if args.board:
+        for place, row in enumerate(Manager.get_leaderboard(args.board, args.top, args.period,
+                                                            args.include_archive), start=1):
+            print(f"{place:>3}. {row['Item']}  {row['Score']:,.2f}")
@@ -0,0 +1,470 @@
+"""
+Load-test harness for the booking rush scenario.
+
+Many clients try to book seats on the same flight at the same time. Every client runs
+a scripted journey against the Flask app in main.py:
+    login -> search -> flight details -> select seats -> order summary -> confirm order
+and a part of them cancel their order right after.
+
+The harness never touches the real database. It builds a scratch copy (from flytau.sql,
+or from an existing .db file with --db), creates a future "rush" flight on a large airplane,
+and points DBService at the copy.
+
+Usage:
+    python load_test.py --clients 300 --concurrency 50
+    python load_test.py --mode wsgi --server-processes 4 --output after.json --compare before.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+
+from utilise import DBService, Flight
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flytau.sql")
+RUSH_ORIGIN, RUSH_DESTINATION, RUSH_AIRPLANE = "TLV", "JFK", "B747-11"
+LOADTEST_PASSWORD = "loadtest"
+
+# Available seats are rendered as checkboxes without the 'disabled' attribute
+SEAT_PATTERN = re.compile(r'name="selected_seats"\s+value="([A-Za-z]+-\d+-[A-Z])"\s*>')
+ORDER_PATTERN = re.compile(r"Order Number:</strong>\s*(\d+)")
+
+
+# ==================================================
+# SCRATCH DATABASE
+# ==================================================
+def prepare_database(work_dir, source_db=None):
+    """ Creates the scratch database the run will write to and returns its path. """
+    db_path = os.path.join(work_dir, "flytau_loadtest.db")
+    if source_db:
+        src = sqlite3.connect(source_db)
+        dst = sqlite3.connect(db_path)
+        src.backup(dst)
+        src.close()
+        dst.close()
+    else:
+        con = sqlite3.connect(db_path)
+        with open(SCHEMA_FILE, encoding="utf-8") as f:
+            con.executescript(f.read())
+        con.close()
+    DBService.DB_PATH = db_path
+    return db_path
+
+
+def create_rush_flight(days_ahead):
+    """ Adds a future flight on a large airplane that every client will try to book. """
+    duration = Flight.get_route_duration(RUSH_ORIGIN, RUSH_DESTINATION)
+    departure = (datetime.now() + timedelta(days=days_ahead)).replace(second=0, microsecond=0)
+    arrival = departure + timedelta(minutes=duration)
+    flight_id, error_message = Flight.create_flight(RUSH_ORIGIN, RUSH_DESTINATION, departure, arrival, RUSH_AIRPLANE,
+                                                    [], [], DBService, 500.0, 1500.0)
+    if error_message:
+        raise SystemExit(error_message)
+    return flight_id
+
+
+def create_users(count):
+    """ Registers one synthetic customer per client and returns their emails. """
+    emails = [f"loadtest_{i}@flytau.test" for i in range(count)]
+    with DBService.db_cur() as cursor:
+        cursor.execute("BEGIN")
+        cursor.executemany(
+            """
+            INSERT OR IGNORE INTO RegisteredUser
+            (Email, Customer_type, User_Passport, Password, First_Name, Last_Name, Birth_Date, Registered_Date)
+            VALUES (?, 'Registered', ?, ?, 'Load', ?, '1990-01-01', date('now'))
+            """,
+            [(email, f"LT{i:08d}", LOADTEST_PASSWORD, f"Tester{i}") for i, email in enumerate(emails)]
+        )
+        cursor.execute("COMMIT")
+    return emails
+
+
+def seat_capacity(airplane_id):
+    row = DBService.run("SELECT SUM(Number_of_rows * Number_of_columns) AS seats FROM Airplanes WHERE Airplane_ID = ?",
+                        (airplane_id,), fetchone=True)
+    return row["seats"] or 0
+
+
+def check_integrity(flight_id, airplane_id):
+    """ Counts seats that were sold to more than one active order, and seats sold beyond capacity. """
+    double_booked = DBService.run(
+        """
+        SELECT t.Row_Num, t.Col_Num, COUNT(*) AS times_sold
+        FROM Tickets t
+        JOIN Orders o ON t.Order_IDFK = o.Order_ID
+        WHERE t.Flight_IDFK = ? AND o.Status = 'Active'
+        GROUP BY t.Row_Num, t.Col_Num
+        HAVING COUNT(*) > 1
+        """, (flight_id,), fetchall=True)
+    active = DBService.run(
+        """
+        SELECT COUNT(*) AS tickets FROM Tickets t
+        JOIN Orders o ON t.Order_IDFK = o.Order_ID
+        WHERE t.Flight_IDFK = ? AND o.Status = 'Active'
+        """, (flight_id,), fetchone=True)
+    orders = DBService.run("SELECT Status, COUNT(*) AS cnt FROM Orders WHERE Flight_IDFK = ? GROUP BY Status",
+                           (flight_id,), fetchall=True)
+    capacity = seat_capacity(airplane_id)
+    return {
+        "double_booked_seats": len(double_booked),
+        "extra_tickets_on_double_booked_seats": sum(r["times_sold"] - 1 for r in double_booked),
+        "active_tickets": active["tickets"],
+        "capacity": capacity,
+        "oversold": max(0, active["tickets"] - capacity),
+        "orders_by_status": {r["Status"]: r["cnt"] for r in orders},
+    }
+
+
+# ==================================================
+# CLIENTS
+# ==================================================
+class TestClientSession:
+    """ One browser-like client that talks to the app in-process through Flask's test client. """
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path, params=None):
+        res = self.client.get(path, query_string=params or {})
+        return res.status_code, res.get_data(as_text=True)
+
+    def post(self, path, form):
+        res = self.client.post(path, data=form)
+        return res.status_code, res.get_data(as_text=True)
+
+
+class HttpSession:
+    """ One browser-like client that talks to a real WSGI server over HTTP, with its own cookie jar. """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def _open(self, req):
+        try:
+            with self.opener.open(req, timeout=60) as res:
+                return res.status, res.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8", errors="replace")
+
+    def get(self, path, params=None):
+        query = f"?{urllib.parse.urlencode(params, doseq=True)}" if params else ""
+        return self._open(urllib.request.Request(self.base_url + path + query))
+
+    def post(self, path, form):
+        body = urllib.parse.urlencode(form, doseq=True).encode()
+        return self._open(urllib.request.Request(self.base_url + path, data=body, method="POST"))
+
+
+class StepFailed(Exception):
+    """ Raised when a journey step returns an unexpected response. """
+
+
+# ==================================================
+# JOURNEY
+# ==================================================
+class Journey:
+    """
+    Runs the scripted booking journey for one client and records the latency of every step.
+    """
+
+    def __init__(self, client, email, flight_id, args, rng):
+        self.client = client
+        self.email = email
+        self.flight_id = flight_id
+        self.args = args
+        self.rng = rng
+        self.timings = []
+        self.outcome = None
+
+    def step(self, name, func, *a):
+        start = time.perf_counter()
+        try:
+            status, body = func(*a)
+        finally:
+            self.timings.append((name, time.perf_counter() - start))
+        if status >= 400:
+            raise StepFailed(f"{name}: HTTP {status}")
+        return body
+
+    def pick_seats(self, page):
+        seats = SEAT_PATTERN.findall(page)
+        seats = [s for s in seats if s.startswith(self.args.seat_class + "-")]
+        if len(seats) < self.args.seats_per_order:
+            return None
+        if self.args.seat_pick == "first":
+            # Every client fights over the same seats: the worst case for double booking
+            return seats[:self.args.seats_per_order]
+        return self.rng.sample(seats, self.args.seats_per_order)
+
+    def run(self):
+        fid = self.flight_id
+        self.step("login", self.client.post, "/login", {"user_email": self.email, "password": LOADTEST_PASSWORD})
+        self.step("search", self.client.get, "/", {"origin": RUSH_ORIGIN, "destination": RUSH_DESTINATION})
+        self.step("details", self.client.get, f"/flight/{fid}")
+        page = self.step("select_seats", self.client.get, f"/select_seats/{fid}")
+
+        seats = self.pick_seats(page)
+        if not seats:
+            self.outcome = "sold_out"
+            return
+        form = {"selected_seats": seats}
+        self.step("order_summary", self.client.post, f"/order_summary/{fid}", form)
+        confirmation = self.step("confirm_order", self.client.post, f"/confirm_order/{fid}", form)
+
+        match = ORDER_PATTERN.search(confirmation)
+        if not match:
+            raise StepFailed("confirm_order: no order number in response")
+        self.outcome = "booked"
+
+        if self.rng.random() < self.args.cancel_ratio:
+            self.step("cancel_order", self.client.post, f"/cancel_order/{match.group(1)}", {})
+            self.step("my_account", self.client.get, "/my_account")
+            self.outcome = "booked_and_canceled"
+
+
+def classify_error(exc):
+    """ Groups exceptions into short labels (e.g. 'OperationalError: database is locked'). """
+    message = str(exc).splitlines()[0] if str(exc) else ""
+    if isinstance(exc, StepFailed):
+        return message
+    return f"{type(exc).__name__}: {message}"[:120]
+
+
+# ==================================================
+# RUNNER
+# ==================================================
+def percentiles(samples):
+    """ Returns latency percentiles in milliseconds (nearest-rank). """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p):
+        idx = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered))) - 1))
+        return round(ordered[idx] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50": pct(50), "p90": pct(90), "p95": pct(95), "p99": pct(99),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def start_wsgi_server(app, processes):
+    """ Starts a local werkzeug server on a free port and returns (server, base_url). """
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No access log line per request
+    if processes > 1:
+        server = make_server("127.0.0.1", 0, app, threaded=False, processes=processes)
+    else:
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def configure_app(session_db, propagate):
+    """ Imports the app and points its session store at the scratch directory. """
+    from main import app
+    from session_store import SQLiteSessionInterface
+    app.config.update(
+        SESSION_DB_PATH=session_db,
+        SESSION_COOKIE_SECURE=False,  # The harness talks plain HTTP
+        PROPAGATE_EXCEPTIONS=propagate,
+        BACKGROUND_JOBS=False,  # The sweeper and outbox would write to the database under test
+    )
+    app.session_interface = SQLiteSessionInterface(session_db)
+    return app
+
+
+def run_load_test(args):
+    work_dir = tempfile.mkdtemp(prefix="flytau_loadtest_")
+    try:
+        prepare_database(work_dir, args.db)
+        flight_id = create_rush_flight(args.days_ahead)
+        emails = create_users(args.clients)
+        # With the test client we want the real exception type (e.g. 'database is locked'), not a 500 page
+        app = configure_app(os.path.join(work_dir, "sessions.db"), propagate=(args.mode == "testclient"))
+
+        server = None
+        if args.mode == "wsgi":
+            server, base_url = start_wsgi_server(app, args.server_processes)
+            make_client = lambda: HttpSession(base_url)
+        else:
+            make_client = lambda: TestClientSession(app)
+
+        step_samples = defaultdict(list)
+        journey_samples = []
+        outcomes = Counter()
+        errors = Counter()
+        lock = threading.Lock()
+
+        def worker(i):
+            rng = random.Random(args.seed + i)
+            journey = Journey(make_client(), emails[i], flight_id, args, rng)
+            start = time.perf_counter()
+            try:
+                journey.run()
+                outcome, error = journey.outcome, None
+            except Exception as e:
+                outcome, error = "failed", classify_error(e)
+                if args.verbose:
+                    traceback.print_exc()
+            elapsed = time.perf_counter() - start
+            with lock:
+                for name, secs in journey.timings:
+                    step_samples[name].append(secs)
+                journey_samples.append(elapsed)
+                outcomes[outcome] += 1
+                if error:
+                    errors[error] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(worker, range(args.clients)))
+        wall = time.perf_counter() - started
+
+        if server:
+            server.shutdown()
+
+        total_requests = sum(len(v) for v in step_samples.values())
+        return {
+            "meta": {
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "git_commit": git_commit(),
+                "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose")},
+                "flight_id": flight_id,
+            },
+            "totals": {
+                "journeys": args.clients,
+                "wall_seconds": round(wall, 3),
+                "journeys_per_second": round(args.clients / wall, 2) if wall else 0,
+                "requests": total_requests,
+                "requests_per_second": round(total_requests / wall, 2) if wall else 0,
+                "outcomes": dict(outcomes),
+                "lock_errors": sum(c for e, c in errors.items() if "locked" in e or "busy" in e),
+            },
+            "latency_ms": {
+                "journey": percentiles(journey_samples),
+                "steps": {name: percentiles(samples) for name, samples in sorted(step_samples.items())},
+            },
+            "errors": dict(errors.most_common()),
+            "integrity": check_integrity(flight_id, RUSH_AIRPLANE),
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        else:
+            print(f"Scratch files kept in {work_dir}")
+
+
+# ==================================================
+# REPORTING
+# ==================================================
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(report):
+    t, integrity = report["totals"], report["integrity"]
+    print(f"\n=== FlyTAU booking rush ({report['meta']['git_commit'] or 'unknown commit'}) ===")
+    print(f"Journeys: {t['journeys']} in {t['wall_seconds']}s  ->  {t['journeys_per_second']} journeys/s, "
+          f"{t['requests_per_second']} req/s")
+    print(f"Outcomes: {t['outcomes']}   lock errors: {t['lock_errors']}")
+    print(f"Seats: {integrity['active_tickets']}/{integrity['capacity']} sold, "
+          f"{integrity['double_booked_seats']} double booked, {integrity['oversold']} oversold")
+    print(f"\n{'step':<16}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+    rows = [("journey", report["latency_ms"]["journey"])] + list(report["latency_ms"]["steps"].items())
+    for name, p in rows:
+        if p:
+            print(f"{name:<16}{p['count']:>7}{p['mean']:>10}{p['p50']:>10}{p['p95']:>10}{p['p99']:>10}{p['max']:>10}")
+    if report["errors"]:
+        print("\nErrors:")
+        for err, count in report["errors"].items():
+            print(f"  {count:>5}  {err}")
+
+
+def print_comparison(report, baseline):
+    """ Prints the change of the headline numbers against an earlier report. """
+    def delta(label, new, old, lower_is_better):
+        if new is None or old is None:
+            return
+        change = ((new - old) / old * 100) if old else 0.0
+        better = (change < 0) == lower_is_better or change == 0
+        print(f"  {label:<28}{old:>12}{new:>12}{change:>+10.1f}%  {'better' if better else 'worse'}")
+
+    print(f"\n=== Compared with {baseline['meta'].get('git_commit') or 'baseline'} ===")
+    print(f"  {'metric':<28}{'before':>12}{'after':>12}{'change':>11}")
+    delta("journeys/s", report["totals"]["journeys_per_second"], baseline["totals"]["journeys_per_second"], False)
+    delta("lock errors", report["totals"]["lock_errors"], baseline["totals"]["lock_errors"], True)
+    delta("double booked seats", report["integrity"]["double_booked_seats"],
+          baseline["integrity"]["double_booked_seats"], True)
+    for p in ("p50", "p95", "p99"):
+        delta(f"journey {p} (ms)", report["latency_ms"]["journey"].get(p),
+              baseline["latency_ms"]["journey"].get(p), True)
+    for step in ("select_seats", "confirm_order", "cancel_order"):
+        new, old = report["latency_ms"]["steps"].get(step), baseline["latency_ms"]["steps"].get(step)
+        if new and old:
+            delta(f"{step} p95 (ms)", new["p95"], old["p95"], True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Booking rush load test for FlyTAU")
+    parser.add_argument("--clients", type=int, default=200, help="number of simulated customers (journeys)")
+    parser.add_argument("--concurrency", type=int, default=50, help="journeys running at the same time")
+    parser.add_argument("--mode", choices=["testclient", "wsgi"], default="testclient",
+                        help="drive the app in-process or through a local WSGI server")
+    parser.add_argument("--server-processes", type=int, default=1,
+                        help="wsgi mode: number of forked server processes (1 = threaded server)")
+    parser.add_argument("--seats-per-order", type=int, default=2)
+    parser.add_argument("--seat-class", choices=["Economy", "Business"], default="Economy")
+    parser.add_argument("--seat-pick", choices=["random", "first"], default="random",
+                        help="'first' makes every client race for the same seats")
+    parser.add_argument("--cancel-ratio", type=float, default=0.1, help="share of bookings canceled right away")
+    parser.add_argument("--days-ahead", type=int, default=30, help="departure of the rush flight from today")
+    parser.add_argument("--db", help="copy this database instead of building one from flytau.sql")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database and session store")
+    parser.add_argument("--verbose", action="store_true", help="print tracebacks of failed journeys")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_load_test(args)
+    print_report(report)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
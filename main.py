@@ -1,18 +1,97 @@
-from flask import Flask, render_template, redirect, request, session
-from flask_session import Session
-from utilise import Customer, RegisteredUser, Manager, Flight, Order, SessionService, DBService, Airplane, Route, Guest
+from flask import Flask, render_template, redirect, request, session, abort, Response
+from flask.logging import default_handler
+from utilise import Customer, RegisteredUser, Manager, Flight, Order, SessionService, DBService, Airplane, Route, Guest, logger
+from archive import ArchiveService
+from sweeper import StatusSweeper
+from session_store import SQLiteSessionInterface
+from schedule_import import ScheduleImporter
+from crew_hours import CrewHoursLedger
+from flight_wizard import FlightWizard
+from outbox import OutboxWorker
+from dashboard_cache import DashboardCache
+from analytics_snapshot import AnalyticsSnapshot
+from reporting_replica import ReportingReplica
+import visualization
+import logging
+import threading
 from datetime import datetime, timedelta, date
 
 app = Flask(__name__)
 app.config.update(
-    SESSION_TYPE="filesystem",
-    SESSION_FILE_DIR="/home/amitaloni890/FlyTAU/flask_session_data",
+    SESSION_DB_PATH="/home/amitaloni890/FlyTAU/sessions.db",
     SESSION_PERMANENT=True,
     PERMANENT_SESSION_LIFETIME=timedelta(minutes=30),
-    SESSION_REFRESH_EACH_REQUEST=True,
-    SESSION_COOKIE_SECURE=True
+    SESSION_REFRESH_SECONDS=60,  # An unchanged session is written at most once a minute, to extend its expiry
+    SESSION_GC_SECONDS=300,  # How often each worker deletes expired sessions
+    SESSION_COOKIE_SECURE=True,
+    BACKGROUND_JOBS=True,  # Start the jobs below in each worker process's first request. False = run none (tools, tests)
+    ARCHIVE_AFTER_DAYS=180,
+    ARCHIVE_INTERVAL_MINUTES=None,  # Minutes between background archive runs. None = run archive.py as a scheduled task
+    SWEEP_INTERVAL_MINUTES=5,  # Minutes between background status sweeps. None = run sweeper.py as a scheduled task
+    CREW_HOURS_RECONCILE_MINUTES=None,  # Minutes between crew-hours ledger checks. None = run crew_hours.py as a scheduled task
+    OUTBOX_INTERVAL_MINUTES=1,  # Minutes between refund outbox runs. None = run outbox.py as a scheduled task
+    ANALYTICS_SNAPSHOT_DIR=None,  # Folder of the columnar snapshot the report charts read. None = charts query the database
+    ANALYTICS_SNAPSHOT_MINUTES=None,  # Minutes between snapshot exports. None = run analytics_snapshot.py as a scheduled task
+    REPORT_REPLICA_PATH=None,  # Read-only copy of the database for the reports. None = reports read the database itself
+    REPORT_REPLICA_MINUTES=5  # Minutes between replica refreshes. None = run reporting_replica.py as a scheduled task
 )
-Session(app)
+app.session_interface = SQLiteSessionInterface(app.config["SESSION_DB_PATH"])
+
+# Background jobs and refund notices log next to the app's own messages
+logger.addHandler(default_handler)
+logger.setLevel(logging.INFO)
+
+if app.config["REPORT_REPLICA_PATH"]:
+    DBService.REPORT_DB_PATH = app.config["REPORT_REPLICA_PATH"]
+
+if app.config["ANALYTICS_SNAPSHOT_DIR"]:
+    visualization.SNAPSHOT_DIR = app.config["ANALYTICS_SNAPSHOT_DIR"]
+
+
+_background_jobs_lock = threading.Lock()
+_background_jobs_started = False
+
+
+@app.before_request
+def start_background_jobs_once():
+    """
+        Starts the background jobs in the first request a worker process serves (with BACKGROUND_JOBS),
+        so the WSGI server runs them without a separate entry point and importing main starts nothing.
+        Each worker runs its own copy; the sweeper, outbox and archiver work in short transactions, so the
+        copies don't get in each other's way.
+    """
+    global _background_jobs_started
+    if _background_jobs_started or not app.config["BACKGROUND_JOBS"]:
+        return
+    with _background_jobs_lock:
+        if not _background_jobs_started:
+            _background_jobs_started = True
+            start_background_jobs()
+
+
+def start_background_jobs():
+    """
+        Starts the background jobs whose interval is set in the config, as daemon threads of this process.
+        A job whose interval is None runs only as a scheduled task (sweeper.py, outbox.py, archive.py, ...).
+    """
+    if app.config["SWEEP_INTERVAL_MINUTES"]:
+        StatusSweeper.start_in_background(app.config["SWEEP_INTERVAL_MINUTES"])
+
+    if app.config["CREW_HOURS_RECONCILE_MINUTES"]:
+        CrewHoursLedger.start_in_background(app.config["CREW_HOURS_RECONCILE_MINUTES"])
+
+    if app.config["OUTBOX_INTERVAL_MINUTES"]:
+        OutboxWorker.start_in_background(app.config["OUTBOX_INTERVAL_MINUTES"])
+
+    if app.config["REPORT_REPLICA_PATH"] and app.config["REPORT_REPLICA_MINUTES"]:
+        ReportingReplica.start_in_background(app.config["REPORT_REPLICA_MINUTES"])
+
+    if app.config["ANALYTICS_SNAPSHOT_DIR"] and app.config["ANALYTICS_SNAPSHOT_MINUTES"]:
+        AnalyticsSnapshot.start_in_background(app.config["ANALYTICS_SNAPSHOT_DIR"], app.config["ANALYTICS_SNAPSHOT_MINUTES"])
+
+    if app.config["ARCHIVE_INTERVAL_MINUTES"]:
+        ArchiveService.start_in_background(app.config["ARCHIVE_INTERVAL_MINUTES"], app.config["ARCHIVE_AFTER_DAYS"])
+
 
 # ==================================================
 # HOMEPAGE & NAVIGATION
@@ -344,28 +423,31 @@ def my_account():
     now = datetime.now()
     cancel_time_limit = now + timedelta(hours=36)
     selected_status = request.args.get('status', '')
+    # Old orders live in the archive tables and are only loaded when the user asks for them
+    include_archive = request.args.get('include_archive') == '1'
 
     if session.get('is_guest_view'):
-        raw_orders = Order.get_guest_orders(session.get('guest_order_id'), session.get('guest_email'))
+        raw_orders = Order.get_guest_orders(session.get('guest_order_id'), session.get('guest_email'),
+                                            include_archive=True)
         is_guest = True
+        include_archive = True
     else:
         if 'User_email' not in session:
             return redirect('/login')
-        raw_orders = Order.get_user_orders(session['User_email'])
+        raw_orders = Order.get_user_orders(session['User_email'], include_archive)
         is_guest = False
 
     active_orders = []
     past_orders = []
     seen_order_ids = set()
+    unique_orders = []
 
     for o in raw_orders:
-        if o['order_id'] in seen_order_ids:
-            continue
-        seen_order_ids.add(o['order_id'])
-
-        seats_data = Order.get_seats_by_order(o['order_id'])
-        o['seats'] = seats_data
+        if o['order_id'] not in seen_order_ids:
+            seen_order_ids.add(o['order_id'])
+            unique_orders.append(o)
 
+    for o in Order.attach_seats(unique_orders, include_archive):
         dep_time = o['departure_time']
 
         if dep_time and isinstance(dep_time, datetime) and dep_time > now and o['status'] == 'Active':
@@ -382,6 +464,8 @@ def my_account():
         is_guest=is_guest,
         cancel_time_limit=cancel_time_limit,
         selected_status=selected_status,
+        include_archive=include_archive,
+        archive_after_days=app.config["ARCHIVE_AFTER_DAYS"],
         username=username
     )
 
@@ -390,56 +474,25 @@ def cancel_order(order_id):
     """
     Processes order cancellation request according to the 36-hour policy.
     Applies a 5% cancellation fee if applicable.
+    Only the canceled order is loaded; the full history stays on the My Account page.
     """
-    email = None
-    if not session.get('guest', False):
+    if 'User_email' in session:
         email = session['User_email']
+    elif session.get('guest', False) and session.get('guest_email'):
+        email = session['guest_email']
+    else:
+        return redirect('/login')
 
-    orders = Order.get_user_orders(email) if email else Order.get_guest_orders(order_id, session.get('guest_email', 'guest@example.com'))
-    order = next((o for o in orders if o['order_id'] == order_id), None)
-
-    canceled = False
-    new_price = None
-    now = datetime.now()
-
-    if order:
-        dep_time = order['departure_time']
-        if dep_time and isinstance(dep_time, datetime):
-            limit = now + timedelta(hours=36)
-
-            if dep_time > limit:
-                new_price = round(float(order.get('total_price', 0)) * 0.05, 2)
-                Order.update_order(order_id, status='Customer Cancellation', total_price=new_price)
-                canceled = True
-
-                DBService.run(
-                    "UPDATE Flights SET Status = 'Active' WHERE Flight_ID = ? AND Status = 'Fully Booked'",
-                    (order['flight_id'],)
-                )
-            orders = Order.get_user_orders(email) if email else Order.get_guest_orders(order_id, session.get('guest_email', 'guest@example.com'))
-
-    active_orders = []
-    past_orders = []
-    current_time_str = now.strftime('%Y-%m-%d %H:%M')
-
-    for o in orders:
-        o['seats'] = Order.get_seats_by_order(o['order_id'])
-        if o['status'] == 'Active' and o['departure_time'] >  current_time_str:
-            o['display_status'] = 'Active'
-            active_orders.append(o)
-        else:
-            past_orders.append(o)
+    order, new_price, error_message = Order.cancel_by_customer(order_id, email)
+    if not order:
+        return redirect('/my_account')
 
     return render_template(
-        'my_account.html',
-        role=SessionService.get_user_role(session),
-        username=SessionService.get_username(session),
-        is_guest=session.get('guest', False),
-        canceled=canceled,
+        'cancel_order.html',
+        order=order,
         new_price=new_price,
-        active_orders=active_orders,
-        past_orders=past_orders,
-        cancel_time_limit=datetime.now() + timedelta(hours=36)
+        error_msg=error_message,
+        username=SessionService.get_username(session)
     )
 
 @app.route('/manage_booking', methods=['GET', 'POST'])
@@ -449,7 +502,7 @@ def manage_booking():
         order_id = request.form['order_id']
         email = request.form['email'].lower()
 
-        order = Order.get_guest_orders(order_id, email)
+        order = Order.get_guest_orders(order_id, email, include_archive=True)
         if not order:
             return render_template('manage_booking.html', error="Order not found. Please check your details.")
 
@@ -520,82 +573,78 @@ def add_flight():
     airports = Flight.get_all_airports()
     today = datetime.now().strftime("%Y-%m-%dT%H:%M")
     step = request.form.get("step")
+    # Earlier choices and computed candidates are kept server-side (see flight_wizard.py)
+    wizard = FlightWizard.load(session)
 
     if request.method == "GET":
+        wizard.reset(session)
         return render_template("add_flight.html", step=1, airports=airports, today=today)
 
+    required = {"2": ["origin"], "3": ["origin", "destination", "departure_time"],
+                "4": FlightWizard.STEPS}.get(step, [])
+    if not wizard.has(*required):
+        return render_template("add_flight.html", step=1, airports=airports, today=today,
+                               error_msg="The flight details were lost. Please start again.")
+
     # STEP 1: Select Origin -> Fetch available Destinations
     if step == "1":
-        origin = request.form.get("origin_airport")
-        destinations = Flight.get_destinations_for_origin(origin)
-        return render_template("add_flight.html", step=2, origin=origin, destinations=destinations, today=today)
+        wizard.choose(session, origin=request.form.get("origin_airport"))
+        destinations = Flight.get_destinations_for_origin(wizard.origin)
+        return render_template("add_flight.html", step=2, origin=wizard.origin, destinations=destinations,
+                               today=today)
 
     # STEP 2: Select Route & Time -> Fetch available Airplanes
     if step == "2":
-        origin = request.form.get("origin_airport")
-        destination = request.form.get("destination_airport")
-        departure_time_str = request.form.get("departure_time")
+        wizard.choose(session, destination=request.form.get("destination_airport"),
+                      departure_time=request.form.get("departure_time"))
+        duration, flight_type, arrival_time = wizard.route()
 
-        duration = Flight.get_route_duration(origin, destination)
-        flight_type = Flight.determine_flight_type(duration)
-        airplanes = Flight.get_available_airplanes(origin, DBService, flight_type, departure_time_str)
-
-        return render_template("add_flight.html", step=3, origin=origin, destination=destination,
-                               departure_time=departure_time_str, airplanes=airplanes, flight_type=flight_type)
+        return render_template("add_flight.html", step=3, origin=wizard.origin, destination=wizard.destination,
+                               departure_time=wizard.departure_time, airplanes=wizard.airplanes(),
+                               flight_type=flight_type)
 
     # STEP 3: Select Airplane -> Fetch available Crew (Pilots & Attendants)
     if step == "3":
-        origin = request.form.get("origin_airport")
-        destination = request.form.get("destination_airport")
-        departure_time_str = request.form.get("departure_time")
-        airplane_id = request.form.get("airplane_id")
-
-        # Get airplane details and calculate flight metadata
-        plane_info = DBService.run("SELECT Size FROM Airplanes WHERE Airplane_ID = ?", (airplane_id,), fetchone=True)
-        duration = Flight.get_route_duration(origin, destination)
-        flight_type = Flight.determine_flight_type(duration)
-        arrival_time = datetime.fromisoformat(departure_time_str) + timedelta(minutes=duration)
-
-        pilots, attendants = Flight.get_available_crew(DBService, origin, flight_type, departure_time_str)
-
-        return render_template("add_flight.html", step=4, origin=origin, destination=destination,
-                               departure_time=departure_time_str, airplane_id=airplane_id,
-                               airplane_size=plane_info['Size'], pilots=pilots, attendants=attendants,
-                               arrival_time=arrival_time.strftime('%Y-%m-%d %H:%M'),
+        wizard.choose(session, airplane_id=request.form.get("airplane_id"))
+        duration, flight_type, arrival_time = wizard.route()
+        # The suggested crew is pre-selected; the manager can still change it
+        pilots, attendants, suggested_pilots, suggested_attendants, suggestion_error = wizard.crew()
+
+        return render_template("add_flight.html", step=4, origin=wizard.origin, destination=wizard.destination,
+                               departure_time=wizard.departure_time, airplane_id=wizard.airplane_id,
+                               airplane_size=wizard.airplane_size(), pilots=pilots, attendants=attendants,
+                               selected_pilots=suggested_pilots, selected_attendants=suggested_attendants,
+                               crew_suggested=True, suggestion_error=suggestion_error, arrival_time=arrival_time,
                                duration=duration, flight_type=flight_type)
 
     # STEP 4: Select Crew & Prices -> Validation & Creation
     if step == "4":
-        origin = request.form.get("origin_airport")
-        destination = request.form.get("destination_airport")
-        departure_time = request.form.get("departure_time")
-        airplane_id = request.form.get("airplane_id")
         pilot_ids = request.form.getlist("pilot_ids")
         attendant_ids = request.form.getlist("attendant_ids")
-
-        # Get plane size for safety validation
-        plane_info = DBService.run("SELECT Size FROM Airplanes WHERE Airplane_ID = ?", (airplane_id,), fetchone=True)
+        duration, flight_type, arrival_time = wizard.route()
 
         is_valid, error_message = Flight.validate_crew_requirements(
-            plane_info['Size'], len(pilot_ids), len(attendant_ids)
+            wizard.airplane_size(), len(pilot_ids), len(attendant_ids)
         )
 
         if error_message:
-            duration = Flight.get_route_duration(origin, destination)
-            flight_type = Flight.determine_flight_type(duration)
-            pilots, attendants = Flight.get_available_crew(DBService, origin, flight_type, departure_time)
+            # Same candidates as in step 3, unless the schedule changed meanwhile
+            pilots, attendants, _, _, _ = wizard.crew()
 
             return render_template("add_flight.html", step=4, error_msg=error_message,
-                                   origin=origin, destination=destination, departure_time=departure_time,
-                                   airplane_id=airplane_id, airplane_size=plane_info['Size'],
-                                   pilots=pilots, attendants=attendants, today=today)
-
-        duration = Flight.get_route_duration(origin, destination)
-        dep_dt = datetime.fromisoformat(departure_time.replace(' ', 'T'))
-        arrival_time = (dep_dt + timedelta(minutes=duration)).strftime('%Y-%m-%d %H:%M')
-
-        Flight.create_flight(origin, destination, departure_time, arrival_time, airplane_id, pilot_ids, attendant_ids, DBService, request.form.get("price_regular"),
-        request.form.get("price_business"))
+                                   origin=wizard.origin, destination=wizard.destination,
+                                   departure_time=wizard.departure_time, airplane_id=wizard.airplane_id,
+                                   airplane_size=wizard.airplane_size(), pilots=pilots, attendants=attendants,
+                                   selected_pilots=pilot_ids, selected_attendants=attendant_ids, today=today)
+
+        flight_id, error_message = Flight.create_flight(wizard.origin, wizard.destination, wizard.departure_time,
+                                                        arrival_time, wizard.airplane_id, pilot_ids, attendant_ids,
+                                                        DBService, request.form.get("price_regular"),
+                                                        request.form.get("price_business"))
+        wizard.reset(session)
+        if error_message:
+            return render_template("add_flight.html", step=1, airports=airports, today=today,
+                                   error_msg=error_message)
 
         return render_template("add_flight.html", step=1, airports=airports, today=today,
                                success_msg="Flight created successfully!")
@@ -605,14 +654,7 @@ def cancel_flight(flight_id):
     """ Admin route to cancel an entire flight and its associated orders. """
     if SessionService.get_user_role(session) != 'admin':
         return redirect('/login_manager')
-    DBService.run(
-        "UPDATE Orders SET Total_Price = 0, Status = 'System Cancellation' WHERE Flight_IDFK = ?",
-        (flight_id,)
-    )
-    DBService.run(
-        "UPDATE Flights SET Status = 'Canceled' WHERE Flight_ID = ?",
-        (flight_id,)
-    )
+    canceled_orders, error_message = Flight.cancel_flight(flight_id)
     class_type = request.args.get('class_type', 'Economy')
     flight = Flight.get_by_id(flight_id, class_type)
     return render_template(
@@ -620,9 +662,30 @@ def cancel_flight(flight_id):
         flight=flight,
         role=SessionService.get_user_role(session),
         username=SessionService.get_username(session),
-        canceled=True
+        canceled=not error_message,
+        canceled_orders=canceled_orders,
+        error_msg=error_message
     )
 
+@app.route('/import_schedule', methods=['GET', 'POST'])
+def import_schedule():
+    """ Creates a whole season of flights from a timetable, checked and saved in one go. """
+    if SessionService.get_user_role(session) != 'admin':
+        return redirect('/login_manager')
+
+    if request.method == 'GET':
+        return render_template('import_schedule.html', assign_crew=True, dry_run=True)
+
+    timetable = request.form.get('timetable', '')
+    start, end = request.form.get('start'), request.form.get('end')
+    assign_crew = bool(request.form.get('assign_crew'))
+    dry_run = bool(request.form.get('dry_run'))
+    report = ScheduleImporter.import_schedule(timetable, start, end, assign_crew, dry_run)
+
+    return render_template('import_schedule.html', report=report, timetable=timetable, start=start, end=end,
+                           assign_crew=assign_crew, dry_run=dry_run)
+
+
 @app.route("/add_airplane", methods=["GET", "POST"])
 def add_airplane():
     """
@@ -682,7 +745,29 @@ def reports():
         return redirect('/login_manager')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    include_archive = request.args.get('include_archive') == '1'
+
+    assets = DashboardCache.get(start_date, end_date, include_archive)
+
+    return render_template("reports.html", assets=assets, archive_after_days=app.config["ARCHIVE_AFTER_DAYS"],
+                           replica_as_of=ReportingReplica.refreshed_at())
+
+
+@app.route("/reports/charts/<name>.<fmt>")
+def report_chart(name, fmt):
+    """Serves a report chart (see visualization.CHARTS) as PNG or SVG, drawn again only when the data changed."""
+    if SessionService.get_user_role(session) != 'admin':
+        return redirect('/login_manager')
+    if name not in visualization.CHARTS or fmt not in visualization.FORMATS:
+        abort(404)
+
+    data, version = visualization.get_chart(name, fmt)
+    etag = f'"{name}-{fmt}-{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={"ETag": etag})
+    return Response(data, mimetype=visualization.FORMATS[fmt],
+                    headers={"ETag": etag, "Cache-Control": "private, no-cache"})
 
-    assets = Manager.build_manager_dashboard(start_date, end_date)
 
-    return render_template("reports.html", assets=assets)
\ No newline at end of file
+if __name__ == "__main__":
+    app.run()
\ No newline at end of file
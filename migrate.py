@@ -0,0 +1,596 @@
+"""
+Brings an existing FlyTAU database up to the schema in flytau.sql.
+A fresh database built from flytau.sql is already up to date; this script is for databases
+that were created before a schema change. Every step checks what is already there,
+so the script can be run any number of times.
+
+Usage:
+    python migrate.py                 # upgrades the database in DBService.DB_PATH
+    python migrate.py /path/to/flytau.db
+"""
+import sys
+
+from dashboard_rollups import DashboardRollups
+from leaderboards import Leaderboards
+from utilise import DBService
+
+
+def has_column(cursor, table, column):
+    return any(r['name'] == column for r in cursor.execute(f"PRAGMA table_info({table})").fetchall())
+
+
+def add_column(cursor, table, column, definition):
+    if not has_column(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def ticket_class_and_price(cursor):
+    """ Tickets remember their cabin class and unit price instead of inferring it from row ranges. """
+    add_column(cursor, "Tickets", "Class_Type", "VARCHAR(20)")
+    add_column(cursor, "Tickets", "Price", "FLOAT")
+    cursor.execute("""
+        UPDATE Tickets SET Class_Type = CASE
+            WHEN Row_Num <= COALESCE((SELECT a.Number_of_rows
+                                      FROM Flights f
+                                      JOIN Airplanes a ON a.Airplane_ID = f.Airplane_IDFK AND a.Class_Type = 'Business'
+                                      WHERE f.Flight_ID = Tickets.Flight_IDFK
+                                      LIMIT 1), 0)
+            THEN 'Business' ELSE 'Economy' END
+        WHERE Class_Type IS NULL
+    """)
+    cursor.execute("""
+        UPDATE Tickets SET Price = (SELECT COALESCE(f.Economy_price, f.Business_price)
+                                    FROM Flights f
+                                    WHERE f.Flight_ID = Tickets.Flight_IDFK AND f.Class_TypeFK = Tickets.Class_Type)
+        WHERE Price IS NULL
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tickets_flight_class ON Tickets (Flight_IDFK, Class_Type)")
+
+
+def order_archive(cursor):
+    """ Archive tables for old orders and tickets, and the indexes the hot Orders table is read by. """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_flight ON Orders (Flight_IDFK)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_customer ON Orders (Customer_email)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Orders_Archive (
+            Order_ID INTEGER PRIMARY KEY,
+            Flight_IDFK VARCHAR(10),
+            Customer_type VARCHAR(20),
+            Customer_email VARCHAR(100),
+            Execute_DateTime DATETIME,
+            Total_Price FLOAT,
+            Status VARCHAR(50),
+            Archived_At DATETIME
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Tickets_Archive (
+            Order_IDFK INTEGER,
+            Flight_IDFK VARCHAR(10),
+            Row_Num INTEGER,
+            Col_Num VARCHAR(1),
+            Class_Type VARCHAR(20),
+            Price FLOAT,
+            PRIMARY KEY (Order_IDFK, Flight_IDFK, Row_Num, Col_Num)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_archive_customer ON Orders_Archive (Customer_email)")
+
+
+def flight_status_index(cursor):
+    """ Lets the status sweeper find landed flights that are still marked Active. """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_status_arrival ON Flights (Status, Arrival_Time)")
+
+
+def schedule_version(cursor):
+    """ A counter bumped by triggers on every schedule change, read by the in-memory crew index. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Schedule_Version (
+            Id INTEGER PRIMARY KEY CHECK (Id = 1),
+            Version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO Schedule_Version VALUES (1, 0)")
+    bump = "BEGIN UPDATE Schedule_Version SET Version = Version + 1 WHERE Id = 1; END"
+    triggers = {
+        "trg_schedule_version_flight_insert": "AFTER INSERT ON Flights",
+        "trg_schedule_version_flight_update": "AFTER UPDATE OF Status, Departure_Time, Arrival_Time ON Flights",
+        "trg_schedule_version_assigned_insert": "AFTER INSERT ON Flight_assigned",
+        "trg_schedule_version_assigned_delete": "AFTER DELETE ON Flight_assigned",
+        "trg_schedule_version_crew_insert": "AFTER INSERT ON FlightCrew",
+    }
+    for name, event in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} {bump}")
+
+
+def aircraft_state(cursor):
+    """ Maintained airplane positions (last landing) and legs, so fleet lookups don't scan all flights. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Aircraft_Legs (
+            Airplane_IDFK VARCHAR(20),
+            Flight_IDFK VARCHAR(10),
+            Origin_Airport VARCHAR(50),
+            Destination_Airport VARCHAR(50),
+            Departure_Time DATETIME,
+            Arrival_Time DATETIME,
+            PRIMARY KEY (Airplane_IDFK, Flight_IDFK)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_aircraft_legs_departure ON Aircraft_Legs (Airplane_IDFK, Departure_Time)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Aircraft_State (
+            Airplane_ID VARCHAR(20) PRIMARY KEY,
+            Location VARCHAR(50),
+            Last_Arrival DATETIME,
+            Last_Flight_ID VARCHAR(10)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_aircraft_state_location ON Aircraft_State (Location, Last_Arrival)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_aircraft_state_airplane_insert AFTER INSERT ON Airplanes
+        BEGIN
+            INSERT OR IGNORE INTO Aircraft_State (Airplane_ID) VALUES (NEW.Airplane_ID);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_aircraft_legs_flight_insert AFTER INSERT ON Flights
+        WHEN NEW.Status != 'Canceled'
+        BEGIN
+            INSERT OR IGNORE INTO Aircraft_Legs
+            VALUES (NEW.Airplane_IDFK, NEW.Flight_ID, NEW.Origin_AirportFK, NEW.Destination_AirportFK,
+                    NEW.Departure_Time, NEW.Arrival_Time);
+            UPDATE Aircraft_State
+            SET Location = NEW.Destination_AirportFK, Last_Arrival = NEW.Arrival_Time, Last_Flight_ID = NEW.Flight_ID
+            WHERE Airplane_ID = NEW.Airplane_IDFK AND (Last_Arrival IS NULL OR Last_Arrival < NEW.Arrival_Time);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_aircraft_legs_flight_cancel AFTER UPDATE OF Status ON Flights
+        WHEN NEW.Status = 'Canceled' AND OLD.Status != 'Canceled'
+        BEGIN
+            DELETE FROM Aircraft_Legs WHERE Flight_IDFK = NEW.Flight_ID;
+            UPDATE Aircraft_State
+            SET (Location, Last_Arrival, Last_Flight_ID) = (
+                SELECT Destination_Airport, Arrival_Time, Flight_IDFK FROM Aircraft_Legs
+                WHERE Airplane_IDFK = Aircraft_State.Airplane_ID
+                ORDER BY Arrival_Time DESC LIMIT 1
+            )
+            WHERE Airplane_ID = NEW.Airplane_IDFK AND Last_Flight_ID = NEW.Flight_ID;
+        END
+    """)
+
+    # Backfill from the existing schedule
+    cursor.execute("""
+        INSERT OR IGNORE INTO Aircraft_Legs
+        SELECT Airplane_IDFK, Flight_ID, MIN(Origin_AirportFK), MIN(Destination_AirportFK),
+               MIN(Departure_Time), MIN(Arrival_Time)
+        FROM Flights WHERE Status != 'Canceled'
+        GROUP BY Airplane_IDFK, Flight_ID
+    """)
+    cursor.execute("INSERT OR IGNORE INTO Aircraft_State (Airplane_ID) SELECT DISTINCT Airplane_ID FROM Airplanes")
+    cursor.execute("""
+        UPDATE Aircraft_State
+        SET (Location, Last_Arrival, Last_Flight_ID) = (
+            SELECT Destination_Airport, Arrival_Time, Flight_IDFK FROM Aircraft_Legs
+            WHERE Airplane_IDFK = Aircraft_State.Airplane_ID
+            ORDER BY Arrival_Time DESC LIMIT 1
+        )
+    """)
+
+
+def schedule_intervals(cursor):
+    """ R*Tree of airplane and crew busy times, for overlap checks that don't scan the whole schedule. """
+    cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS Schedule_Intervals USING rtree_i32(Id, Start_Minute, End_Minute)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Schedule_Interval_Owners (
+            Id INTEGER PRIMARY KEY,
+            Resource_Type VARCHAR(20),
+            Resource_ID VARCHAR(50),
+            Flight_ID VARCHAR(10),
+            Start_Minute INTEGER,
+            End_Minute INTEGER,
+            UNIQUE (Resource_Type, Resource_ID, Flight_ID)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_interval_owners_flight ON Schedule_Interval_Owners (Flight_ID)")
+    minutes = "CAST(strftime('%s', {}) AS INTEGER) / 60"
+    add_to_tree = """
+        INSERT INTO Schedule_Intervals
+        SELECT o.Id, o.Start_Minute, o.End_Minute FROM Schedule_Interval_Owners o
+        WHERE o.Flight_ID = NEW.Flight_IDFK AND NOT EXISTS (SELECT 1 FROM Schedule_Intervals r WHERE r.Id = o.Id);
+    """
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_intervals_leg_insert AFTER INSERT ON Aircraft_Legs
+        BEGIN
+            INSERT OR IGNORE INTO Schedule_Interval_Owners (Resource_Type, Resource_ID, Flight_ID, Start_Minute, End_Minute)
+            VALUES ('Airplane', NEW.Airplane_IDFK, NEW.Flight_IDFK,
+                    {minutes.format('NEW.Departure_Time')}, {minutes.format('NEW.Arrival_Time')});
+            {add_to_tree}
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_intervals_leg_delete AFTER DELETE ON Aircraft_Legs
+        BEGIN
+            DELETE FROM Schedule_Intervals WHERE Id IN (SELECT Id FROM Schedule_Interval_Owners WHERE Flight_ID = OLD.Flight_IDFK);
+            DELETE FROM Schedule_Interval_Owners WHERE Flight_ID = OLD.Flight_IDFK;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_intervals_crew_insert AFTER INSERT ON Flight_assigned
+        BEGIN
+            INSERT OR IGNORE INTO Schedule_Interval_Owners (Resource_Type, Resource_ID, Flight_ID, Start_Minute, End_Minute)
+            SELECT 'Crew', NEW.Employee_IDFK, NEW.Flight_IDFK,
+                   {minutes.format('Departure_Time')}, {minutes.format('Arrival_Time')}
+            FROM Aircraft_Legs WHERE Flight_IDFK = NEW.Flight_IDFK;
+            {add_to_tree}
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_intervals_crew_delete AFTER DELETE ON Flight_assigned
+        BEGIN
+            DELETE FROM Schedule_Intervals WHERE Id IN (
+                SELECT Id FROM Schedule_Interval_Owners
+                WHERE Resource_Type = 'Crew' AND Resource_ID = OLD.Employee_IDFK AND Flight_ID = OLD.Flight_IDFK);
+            DELETE FROM Schedule_Interval_Owners
+            WHERE Resource_Type = 'Crew' AND Resource_ID = OLD.Employee_IDFK AND Flight_ID = OLD.Flight_IDFK;
+        END
+    """)
+
+    # Backfill from the existing schedule
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO Schedule_Interval_Owners (Resource_Type, Resource_ID, Flight_ID, Start_Minute, End_Minute)
+        SELECT 'Airplane', Airplane_IDFK, Flight_IDFK, {minutes.format('Departure_Time')}, {minutes.format('Arrival_Time')}
+        FROM Aircraft_Legs
+        UNION ALL
+        SELECT 'Crew', fa.Employee_IDFK, fa.Flight_IDFK, {minutes.format('l.Departure_Time')}, {minutes.format('l.Arrival_Time')}
+        FROM Flight_assigned fa JOIN Aircraft_Legs l ON l.Flight_IDFK = fa.Flight_IDFK
+    """)
+    cursor.execute("""
+        INSERT INTO Schedule_Intervals
+        SELECT o.Id, o.Start_Minute, o.End_Minute FROM Schedule_Interval_Owners o
+        WHERE NOT EXISTS (SELECT 1 FROM Schedule_Intervals r WHERE r.Id = o.Id)
+    """)
+
+
+def crew_hours_ledger(cursor):
+    """ Per-employee flight hours kept by triggers, so reports don't sum all flight history. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Crew_Hours_Ledger (
+            Employee_IDFK VARCHAR(50),
+            Flight_IDFK VARCHAR(10),
+            Minutes INTEGER,
+            Long_Haul INTEGER,
+            PRIMARY KEY (Employee_IDFK, Flight_IDFK)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_crew_hours_ledger_flight ON Crew_Hours_Ledger (Flight_IDFK)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Crew_Hours (
+            Employee_IDFK VARCHAR(50) PRIMARY KEY,
+            Short_Minutes INTEGER NOT NULL DEFAULT 0,
+            Long_Minutes INTEGER NOT NULL DEFAULT 0,
+            Flights INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_crew_hours_add AFTER INSERT ON Crew_Hours_Ledger
+        BEGIN
+            INSERT INTO Crew_Hours (Employee_IDFK, Short_Minutes, Long_Minutes, Flights)
+            VALUES (NEW.Employee_IDFK, CASE WHEN NEW.Long_Haul THEN 0 ELSE NEW.Minutes END,
+                    CASE WHEN NEW.Long_Haul THEN NEW.Minutes ELSE 0 END, 1)
+            ON CONFLICT(Employee_IDFK) DO UPDATE SET Short_Minutes = Short_Minutes + excluded.Short_Minutes,
+                                                     Long_Minutes = Long_Minutes + excluded.Long_Minutes,
+                                                     Flights = Flights + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_crew_hours_remove AFTER DELETE ON Crew_Hours_Ledger
+        BEGIN
+            UPDATE Crew_Hours
+            SET Short_Minutes = Short_Minutes - CASE WHEN OLD.Long_Haul THEN 0 ELSE OLD.Minutes END,
+                Long_Minutes = Long_Minutes - CASE WHEN OLD.Long_Haul THEN OLD.Minutes ELSE 0 END,
+                Flights = Flights - 1
+            WHERE Employee_IDFK = OLD.Employee_IDFK;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_crew_hours_flight_completed AFTER UPDATE OF Status ON Flights
+        WHEN NEW.Status = 'Completed' AND OLD.Status != 'Completed'
+        BEGIN
+            INSERT OR IGNORE INTO Crew_Hours_Ledger
+            SELECT fa.Employee_IDFK, NEW.Flight_ID, r.Duration, r.Duration > 360
+            FROM Flight_assigned fa
+            JOIN Routes r ON r.Origin_Airport = NEW.Origin_AirportFK AND r.Destination_Airport = NEW.Destination_AirportFK
+            WHERE fa.Flight_IDFK = NEW.Flight_ID;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_crew_hours_flight_reopened AFTER UPDATE OF Status ON Flights
+        WHEN OLD.Status = 'Completed' AND NEW.Status != 'Completed'
+        BEGIN
+            DELETE FROM Crew_Hours_Ledger WHERE Flight_IDFK = NEW.Flight_ID;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_crew_hours_crew_assigned AFTER INSERT ON Flight_assigned
+        BEGIN
+            INSERT OR IGNORE INTO Crew_Hours_Ledger
+            SELECT NEW.Employee_IDFK, f.Flight_ID, r.Duration, r.Duration > 360
+            FROM Flights f
+            JOIN Routes r ON r.Origin_Airport = f.Origin_AirportFK AND r.Destination_Airport = f.Destination_AirportFK
+            WHERE f.Flight_ID = NEW.Flight_IDFK AND f.Status = 'Completed'
+            LIMIT 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_crew_hours_crew_unassigned AFTER DELETE ON Flight_assigned
+        BEGIN
+            DELETE FROM Crew_Hours_Ledger WHERE Employee_IDFK = OLD.Employee_IDFK AND Flight_IDFK = OLD.Flight_IDFK;
+        END
+    """)
+    # Backfill from the completed flights (the triggers fill in the totals)
+    cursor.execute("""
+        INSERT OR IGNORE INTO Crew_Hours_Ledger
+        SELECT DISTINCT fa.Employee_IDFK, f.Flight_ID, r.Duration, r.Duration > 360
+        FROM Flight_assigned fa
+        JOIN Flights f ON f.Flight_ID = fa.Flight_IDFK AND f.Status = 'Completed'
+        JOIN Routes r ON r.Origin_Airport = f.Origin_AirportFK AND r.Destination_Airport = f.Destination_AirportFK
+    """)
+
+
+def refund_outbox(cursor):
+    """ Refunds and notifications of canceled flights, drained by outbox.py. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Refund_Outbox (
+            Outbox_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Flight_IDFK VARCHAR(10),
+            Customer_email VARCHAR(100),
+            Customer_type VARCHAR(20),
+            Order_IDs TEXT,
+            Refund_Amount FLOAT,
+            Created_At DATETIME,
+            Claimed_Until DATETIME,
+            Processed_At DATETIME,
+            Attempts INTEGER NOT NULL DEFAULT 0,
+            Last_Error TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_refund_outbox_pending ON Refund_Outbox (Outbox_ID) "
+                   "WHERE Processed_At IS NULL")
+
+
+def _rollup_triggers(orders, tickets, archived, prefix):
+    """ The dashboard rollup triggers of one orders/tickets table pair (as in flytau.sql). """
+    counted = "('Completed', 'Active')"
+
+    def order_rows(row, sign):
+        return f"""
+            INSERT INTO Daily_Order_Stats (Day, Archived, Orders, Cancellations, Revenue)
+            VALUES (date({row}.Execute_DateTime), {archived}, {sign}1, {sign}({row}.Status = 'Customer Cancellation'),
+                    {sign}COALESCE({row}.Total_Price, 0))
+            ON CONFLICT(Day, Archived) DO UPDATE SET Orders = Orders + excluded.Orders,
+                                                    Cancellations = Cancellations + excluded.Cancellations,
+                                                    Revenue = Revenue + excluded.Revenue;
+            INSERT INTO Customer_Revenue (Customer_email, Archived, Revenue)
+            SELECT {row}.Customer_email, {archived}, {sign}COALESCE({row}.Total_Price, 0) WHERE {row}.Status IN {counted}
+            ON CONFLICT(Customer_email, Archived) DO UPDATE SET Revenue = Revenue + excluded.Revenue;
+            INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+            SELECT date({row}.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, {archived}, {sign}COUNT(*)
+            FROM {tickets} t JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+            WHERE t.Order_IDFK = {row}.Order_ID AND {row}.Status IN {counted}
+            GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
+            ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;"""
+
+    def ticket_rows(row, sign):
+        return f"""
+            INSERT INTO Daily_Route_Tickets (Day, Origin, Destination, Archived, Tickets)
+            SELECT date(o.Execute_DateTime), f.Origin_AirportFK, f.Destination_AirportFK, {archived}, {sign}1
+            FROM {orders} o JOIN Flights f ON f.Flight_ID = {row}.Flight_IDFK AND f.Class_TypeFK = {row}.Class_Type
+            WHERE o.Order_ID = {row}.Order_IDFK AND o.Status IN {counted}
+            ON CONFLICT(Day, Origin, Destination, Archived) DO UPDATE SET Tickets = Tickets + excluded.Tickets;"""
+
+    name = f"trg_rollups_{prefix}"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {name}order_insert AFTER INSERT ON {orders} "
+        f"BEGIN {order_rows('NEW', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}order_update "
+        f"AFTER UPDATE OF Execute_DateTime, Total_Price, Status, Customer_email ON {orders} "
+        f"BEGIN {order_rows('OLD', '-')} {order_rows('NEW', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}order_delete AFTER DELETE ON {orders} "
+        f"BEGIN {order_rows('OLD', '-')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}ticket_insert AFTER INSERT ON {tickets} "
+        f"BEGIN {ticket_rows('NEW', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}ticket_update AFTER UPDATE OF Order_IDFK, Flight_IDFK, Class_Type "
+        f"ON {tickets} BEGIN {ticket_rows('OLD', '-')} {ticket_rows('NEW', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}ticket_delete AFTER DELETE ON {tickets} "
+        f"BEGIN {ticket_rows('OLD', '-')} END",
+    ]
+
+
+def dashboard_rollups(cursor):
+    """ Daily rollups kept by triggers, so the manager dashboard doesn't scan all orders. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Daily_Order_Stats (
+            Day DATE,
+            Archived INTEGER,
+            Orders INTEGER NOT NULL DEFAULT 0,
+            Cancellations INTEGER NOT NULL DEFAULT 0,
+            Revenue FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (Day, Archived)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Customer_Revenue (
+            Customer_email VARCHAR(100),
+            Archived INTEGER,
+            Revenue FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (Customer_email, Archived)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Daily_Route_Tickets (
+            Day DATE,
+            Origin VARCHAR(50),
+            Destination VARCHAR(50),
+            Archived INTEGER,
+            Tickets INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Day, Origin, Destination, Archived)
+        )
+    """)
+    for statement in (_rollup_triggers("Orders", "Tickets", 0, "") +
+                      _rollup_triggers("Orders_Archive", "Tickets_Archive", 1, "archive_")):
+        cursor.execute(statement)
+    # Backfill (also repairs rollups of a database that ran without the triggers)
+    DashboardRollups.rebuild(cursor)
+
+
+def data_version(cursor):
+    """ A counter bumped by triggers on every order, ticket, flight and crew write, read by the report cache. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Data_Version (
+            Id INTEGER PRIMARY KEY CHECK (Id = 1),
+            Version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO Data_Version VALUES (1, 0)")
+    bump = "BEGIN UPDATE Data_Version SET Version = Version + 1 WHERE Id = 1; END"
+    triggers = {
+        "trg_data_version_order_insert": "AFTER INSERT ON Orders",
+        "trg_data_version_order_update": "AFTER UPDATE ON Orders",
+        "trg_data_version_order_delete": "AFTER DELETE ON Orders",
+        "trg_data_version_ticket_insert": "AFTER INSERT ON Tickets",
+        "trg_data_version_ticket_update": "AFTER UPDATE ON Tickets",
+        "trg_data_version_ticket_delete": "AFTER DELETE ON Tickets",
+        "trg_data_version_flight_insert": "AFTER INSERT ON Flights",
+        "trg_data_version_flight_update": "AFTER UPDATE ON Flights",
+        "trg_data_version_assigned_insert": "AFTER INSERT ON Flight_assigned",
+        "trg_data_version_assigned_delete": "AFTER DELETE ON Flight_assigned",
+        "trg_data_version_crew_insert": "AFTER INSERT ON FlightCrew",
+        "trg_data_version_crew_update": "AFTER UPDATE ON FlightCrew",
+    }
+    for name, event in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} {bump}")
+
+
+def _leaderboard_triggers():
+    """ The triggers that keep Leaderboards up to date (as in flytau.sql), by name. """
+    def scores(board, sign, item, score, month, scope, where=" WHERE true"):
+        # 'scope' is one scope number, or a query that lists the scopes of the row.
+        # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+        scope, scopes = (scope, "") if isinstance(scope, int) else ("s.Scope", f", ({scope}) s")
+        return f"""
+            INSERT INTO Leaderboards (Board, Period, Scope, Item, Score)
+            SELECT '{board}', p.Period, {scope}, {item}, {sign}{score}
+            FROM (SELECT '' AS Period UNION ALL SELECT {month}) p{scopes}{where}
+            ON CONFLICT(Board, Period, Scope, Item) DO UPDATE SET Score = Score + excluded.Score;"""
+
+    def prune(board, items, months):
+        # Scores that went back to 0 (canceled orders, flights no longer completed) leave the board
+        return f"""
+            DELETE FROM Leaderboards
+            WHERE Board = '{board}' AND Period IN ('', {months}) AND Scope IN (0, 1) AND Item IN ({items})
+              AND Score BETWEEN -0.005 AND 0.005;"""
+
+    def customer(row, sign, scope):
+        return scores("customers", sign, f"{row}.Customer_email", f"COALESCE({row}.Total_Price, 0)",
+                      f"strftime('%Y-%m', {row}.Execute_DateTime)", scope,
+                      f" WHERE {row}.Status IN ('Completed', 'Active')")
+
+    def customer_prune(*rows):
+        return prune("customers", ", ".join(f"{r}.Customer_email" for r in rows),
+                     ", ".join(f"strftime('%Y-%m', {r}.Execute_DateTime)" for r in rows))
+
+    def route(row, sign):
+        # Live rows count in both scopes, archived rows only with the archive
+        return scores("routes", sign, f"{row}.Origin || ' → ' || {row}.Destination", f"{row}.Tickets",
+                      f"strftime('%Y-%m', {row}.Day)", "SELECT 0 AS Scope UNION ALL SELECT 1",
+                      f" WHERE s.Scope >= {row}.Archived")
+
+    def route_prune(*rows):
+        return prune("routes", ", ".join(f"{r}.Origin || ' → ' || {r}.Destination" for r in rows),
+                     ", ".join(f"strftime('%Y-%m', {r}.Day)" for r in rows))
+
+    def employee_month(row):
+        return f"(SELECT strftime('%Y-%m', MIN(Departure_Time)) FROM Flights WHERE Flight_ID = {row}.Flight_IDFK)"
+
+    def employee(row, sign):
+        return scores("employees", sign, f"{row}.Employee_IDFK", f"{row}.Minutes", employee_month(row), 0)
+
+    triggers = {}
+    for orders, scope, prefix in (("Orders", "SELECT 0 AS Scope UNION ALL SELECT 1", ""),
+                                  ("Orders_Archive", 1, "archive_")):
+        name = f"trg_leaderboards_{prefix}order"
+        triggers.update({
+            f"{name}_insert": f"AFTER INSERT ON {orders} BEGIN {customer('NEW', '', scope)} END",
+            f"{name}_update": f"AFTER UPDATE OF Execute_DateTime, Total_Price, Status, Customer_email ON {orders} "
+                              f"BEGIN {customer('OLD', '-', scope)} {customer('NEW', '', scope)} "
+                              f"{customer_prune('OLD', 'NEW')} END",
+            f"{name}_delete": f"AFTER DELETE ON {orders} BEGIN {customer('OLD', '-', scope)} {customer_prune('OLD')} END",
+        })
+    triggers.update({
+        "trg_leaderboards_route_insert": f"AFTER INSERT ON Daily_Route_Tickets BEGIN {route('NEW', '')} END",
+        "trg_leaderboards_route_update": f"AFTER UPDATE ON Daily_Route_Tickets "
+                                         f"BEGIN {route('OLD', '-')} {route('NEW', '')} {route_prune('OLD', 'NEW')} END",
+        "trg_leaderboards_route_delete": f"AFTER DELETE ON Daily_Route_Tickets "
+                                         f"BEGIN {route('OLD', '-')} {route_prune('OLD')} END",
+        "trg_leaderboards_crew_add": f"AFTER INSERT ON Crew_Hours_Ledger BEGIN {employee('NEW', '')} END",
+        "trg_leaderboards_crew_remove": f"AFTER DELETE ON Crew_Hours_Ledger BEGIN {employee('OLD', '-')} "
+                                        f"{prune('employees', 'OLD.Employee_IDFK', employee_month('OLD'))} END",
+    })
+    return triggers
+
+
+def leaderboards(cursor):
+    """ Top customers, routes and employees kept by triggers, so the dashboard reads them off an index. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Leaderboards (
+            Board VARCHAR(20),
+            Period VARCHAR(7),
+            Scope INTEGER,
+            Item VARCHAR(120),
+            Score FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (Board, Period, Scope, Item)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_leaderboards_rank ON Leaderboards (Board, Period, Scope, Score)")
+    # Recreated every time, so a database gets the current version of the triggers
+    for name, trigger in _leaderboard_triggers().items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} {trigger}")
+    # Backfill (also repairs leaderboards of a database that ran without the triggers)
+    Leaderboards.rebuild(cursor)
+
+
+def tickets_archive_flight_index(cursor):
+    """ Lets the fleet report find the archived tickets of a period's flights without scanning the archive. """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tickets_archive_flight_class ON Tickets_Archive (Flight_IDFK, Class_Type)")
+
+
+# Applied in order. New schema changes are added at the end.
+MIGRATIONS = [
+    ticket_class_and_price,
+    order_archive,
+    flight_status_index,
+    schedule_version,
+    aircraft_state,
+    schedule_intervals,
+    crew_hours_ledger,
+    refund_outbox,
+    dashboard_rollups,
+    data_version,
+    leaderboards,
+    tickets_archive_flight_index,
+]
+
+
+def migrate():
+    for step in MIGRATIONS:
+        with DBService.transaction() as cursor:
+            step(cursor)
+        print(f"ok  {step.__name__}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        DBService.DB_PATH = sys.argv[1]
+    migrate()
@@ -0,0 +1,111 @@
+"""
+Pays the refunds and sends the notices of canceled flights.
+
+Flight.cancel_flight writes one Refund_Outbox row per affected customer in the same transaction that
+cancels the flight and its orders, so a cancellation never loses (or doubles) a refund, even if the
+app stops right after it. This worker drains the outbox in batches, away from the manager's request:
+- a batch of pending rows is claimed for a few minutes (Claimed_Until), so two workers don't take
+  the same rows; rows of a worker that died are claimed again when the claim runs out,
+- each row is handed to the handler (refund + notification),
+- the results of the batch are saved in one transaction: Processed_At on success, Attempts and
+  Last_Error on failure (the row is tried again when its claim runs out). After MAX_ATTEMPTS
+  failures a row is left for a person to look at.
+
+The default handler only logs; a payment provider or mail service plugs in as another handler.
+
+Usage:
+    python outbox.py                  # drain once (e.g. as a scheduled task)
+    python outbox.py --batch-size 50
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from utilise import DBService, logger, run_periodically
+
+
+class OutboxWorker:
+    """ Drains Refund_Outbox in batches. """
+    BATCH_SIZE = 100
+    CLAIM_MINUTES = 5
+    MAX_ATTEMPTS = 5
+
+    @staticmethod
+    def log_handler(record):
+        """ Default handler: records the refund and the notice in the server log. """
+        logger.info("Refund %.2f to %s (%s) for orders %s: flight %s was canceled.",
+                    record['Refund_Amount'], record['Customer_email'], record['Customer_type'],
+                    record['Order_IDs'], record['Flight_IDFK'])
+
+    @staticmethod
+    def claim_batch(batch_size, now=None):
+        """ Claims up to 'batch_size' pending rows, oldest first, and returns them. """
+        now = now or datetime.now()
+        with DBService.transaction() as cursor:
+            rows = cursor.execute(
+                """
+                SELECT * FROM Refund_Outbox
+                WHERE Processed_At IS NULL AND Attempts < ?
+                  AND (Claimed_Until IS NULL OR Claimed_Until < ?)
+                ORDER BY Outbox_ID
+                LIMIT ?
+                """,
+                (OutboxWorker.MAX_ATTEMPTS, now.strftime('%Y-%m-%d %H:%M:%S'), batch_size)
+            ).fetchall()
+            claimed_until = (now + timedelta(minutes=OutboxWorker.CLAIM_MINUTES)).strftime('%Y-%m-%d %H:%M:%S')
+            cursor.executemany("UPDATE Refund_Outbox SET Claimed_Until = ? WHERE Outbox_ID = ?",
+                               [(claimed_until, r['Outbox_ID']) for r in rows])
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def drain_batch(batch_size=None, handler=None):
+        """ Processes one batch. Returns (processed, failed). """
+        handler = handler or OutboxWorker.log_handler
+        records = OutboxWorker.claim_batch(batch_size or OutboxWorker.BATCH_SIZE)
+
+        done, failed = [], []
+        for record in records:
+            try:
+                handler(record)
+                done.append(record['Outbox_ID'])
+            except Exception as e:
+                failed.append((str(e), record['Outbox_ID']))
+
+        if records:
+            processed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            with DBService.transaction() as cursor:
+                cursor.executemany("UPDATE Refund_Outbox SET Processed_At = ?, Claimed_Until = NULL "
+                                   "WHERE Outbox_ID = ?", [(processed_at, oid) for oid in done])
+                # Failed rows keep their claim, so they are tried again only after it runs out
+                cursor.executemany("UPDATE Refund_Outbox SET Attempts = Attempts + 1, Last_Error = ? "
+                                   "WHERE Outbox_ID = ?", failed)
+        return len(done), len(failed)
+
+    @staticmethod
+    def run(batch_size=None, handler=None):
+        """ Drains batches until no pending row is left. Returns (processed, failed). """
+        batch_size = batch_size or OutboxWorker.BATCH_SIZE
+        processed = failed = 0
+        while True:
+            done, errors = OutboxWorker.drain_batch(batch_size, handler)
+            processed, failed = processed + done, failed + errors
+            # A short batch means nothing claimable is left
+            if done + errors < batch_size:
+                return processed, failed
+
+    @staticmethod
+    def start_in_background(interval_minutes):
+        """ Drains the outbox every 'interval_minutes' in a daemon thread of the web app. """
+        return run_periodically("refund-outbox", OutboxWorker.run, interval_minutes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pay refunds and send notices of canceled flights")
+    parser.add_argument("--batch-size", type=int, default=OutboxWorker.BATCH_SIZE, help="rows per batch")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.db:
+        DBService.DB_PATH = args.db
+    processed, failed = OutboxWorker.run(args.batch_size)
+    print(f"Outbox: {processed} processed, {failed} failed.")
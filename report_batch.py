@@ -0,0 +1,141 @@
+"""
+Builds a whole pack of reports (e.g. the month-end pack) in one run.
+
+The pack is described by a JSON list of report specs:
+    [
+        {"name": "revenue-q3", "report": "revenue", "start": "2026-07-01", "end": "2026-09-30"},
+        {"name": "revenue-q3-all", "report": "revenue", "start": "2026-07-01", "end": "2026-09-30",
+         "include_archive": true, "format": "svg"},
+        {"name": "crew", "report": "crew_hours"},
+        {"name": "dashboard-q3", "report": "dashboard", "start": "2026-07-01", "end": "2026-09-30"}
+    ]
+'report' is a chart of visualization.py (revenue, crew_hours) or 'dashboard' (the figures of the
+reports page). 'start'/'end' pick the days the orders were made (crew hours are always totals);
+'include_archive' defaults to true for charts and false for the dashboard, as on the reports page.
+
+Each chart's data is queried once for the whole pack; the specs only filter it. The charts are drawn
+in a pool of worker processes (Matplotlib draws one figure at a time per process), so the run takes
+about 1/N of the time on N cores. The dashboard figures come from the daily rollups and are quick.
+The charts and a summary.json (files, timings and dashboard figures) are written to the output folder.
+
+Usage:
+    python report_batch.py month_end.json --out month_end/
+    python report_batch.py month_end.json --out month_end/ --workers 4
+    python report_batch.py month_end.json --out month_end/ --snapshot analytics/   # charts from the snapshot
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import visualization
+from utilise import DBService, Manager
+
+
+def _draw(report, df, fmt, path):
+    """ Runs in a worker process: draws one chart into 'path'. Returns the seconds it took. """
+    started = time.perf_counter()
+    fig = visualization.CHARTS[report][1](df)
+    FigureCanvasAgg(fig)
+    fig.savefig(path, format=fmt)
+    return time.perf_counter() - started
+
+
+class ReportBatch:
+    """ Renders a list of report specs with shared queries and a process pool. """
+    REPORTS = set(visualization.CHARTS) | {"dashboard"}
+
+    @staticmethod
+    def check_specs(specs):
+        """ Fills in defaults and returns the specs. Raises ValueError for a spec that can't be built. """
+        checked, names = [], set()
+        for i, spec in enumerate(specs, start=1):
+            spec = dict(spec)
+            if spec.get("report") not in ReportBatch.REPORTS:
+                raise ValueError(f"Spec {i}: 'report' must be one of {', '.join(sorted(ReportBatch.REPORTS))}.")
+            spec.setdefault("name", f"{spec['report']}-{spec.get('start') or 'all'}-{spec.get('end') or 'all'}")
+            spec.setdefault("include_archive", spec["report"] != "dashboard")
+            spec.setdefault("format", "png")
+            if spec["format"] not in visualization.FORMATS:
+                raise ValueError(f"Spec {i}: 'format' must be one of {', '.join(sorted(visualization.FORMATS))}.")
+            if spec["name"] in names:
+                raise ValueError(f"Spec {i}: the name '{spec['name']}' is used twice.")
+            names.add(spec["name"])
+            checked.append(spec)
+        return checked
+
+    @staticmethod
+    def chart_data(spec, shared):
+        if spec["report"] == "revenue":
+            return visualization.revenue_for_period(shared["revenue"], spec.get("start"), spec.get("end"),
+                                                    spec["include_archive"])
+        return shared[spec["report"]]
+
+    @staticmethod
+    def run(specs, out_dir, workers=None):
+        """ Builds every spec into out_dir and writes out_dir/summary.json. Returns the summary. """
+        specs = ReportBatch.check_specs(specs)
+        os.makedirs(out_dir, exist_ok=True)
+        started = time.perf_counter()
+
+        # Each chart's query runs once, whatever the number of specs using it
+        shared = {report: load() for report, (load, _) in visualization.CHARTS.items()
+                  if any(spec["report"] == report for spec in specs)}
+
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = {}
+            for spec in specs:
+                if spec["report"] == "dashboard":
+                    continue
+                path = os.path.join(out_dir, f"{spec['name']}.{spec['format']}")
+                jobs[spec["name"]] = (path, pool.submit(_draw, spec["report"], ReportBatch.chart_data(spec, shared),
+                                                        spec["format"], path))
+
+            # The dashboard figures are built here while the workers draw
+            for spec in specs:
+                if spec["report"] == "dashboard":
+                    results[spec["name"]] = {"figures": Manager.build_manager_dashboard(
+                        spec.get("start"), spec.get("end"), spec["include_archive"])}
+
+            for name, (path, job) in jobs.items():
+                try:
+                    results[name] = {"file": os.path.basename(path), "seconds": round(job.result(), 3)}
+                except Exception as e:
+                    results[name] = {"error": str(e)}
+
+        summary = {
+            "reports": [dict(spec, **results[spec["name"]]) for spec in specs],
+            "seconds": round(time.perf_counter() - started, 3),
+            "data_version": Manager.get_report_version(),
+        }
+        with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a pack of report charts and dashboard figures")
+    parser.add_argument("specs", help="JSON file with the list of report specs (see the top of report_batch.py)")
+    parser.add_argument("--out", required=True, help="output folder")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU core)")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    parser.add_argument("--snapshot", help="read the chart data from the analytics snapshot in this folder")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+    visualization.SNAPSHOT_DIR = args.snapshot
+
+    with open(args.specs, encoding="utf-8") as f:
+        specs = json.load(f)
+    try:
+        result = ReportBatch.run(specs, args.out, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    failed = [r["name"] for r in result["reports"] if "error" in r]
+    print(f"{len(result['reports']) - len(failed)} reports written to {args.out} in {result['seconds']:.1f}s.")
+    for name in failed:
+        print(f"Failed: {name}")
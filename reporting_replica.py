@@ -0,0 +1,114 @@
+"""
+Keeps the read-only copy of the database that the reports read.
+
+Long report queries on flytau.db would hold read locks that bookings have to wait for. With
+DBService.REPORT_DB_PATH set, the manager dashboard and the report charts read a copy instead
+(see DBService.report_cur), and this job refreshes that copy every few minutes:
+- the database is copied with SQLite's backup API into a temporary file, STEP_PAGES pages at a time,
+  so writers get the database between steps. A write during the copy makes SQLite start it over;
+  after MAX_RESTARTS of those, the copy is taken in one step (one read of the whole file),
+- the copy records when it was taken (Replica_Info), so the reports page can show how old it is,
+- the temporary file replaces the replica in one rename. Reports that are still reading the old
+  copy finish on it.
+
+Usage:
+    python reporting_replica.py --replica /path/to/flytau_reports.db      # refresh once (e.g. as a scheduled task)
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from utilise import DBService, run_periodically
+
+
+class _TooBusy(Exception):
+    """ The stepped copy kept starting over. """
+
+
+class ReportingReplica:
+    """ Refreshes the reporting replica from the main database. """
+    STEP_PAGES = 256
+    STEP_PAUSE = 0.01  # Seconds between steps
+    MAX_RESTARTS = 3
+
+    @staticmethod
+    def _copy(source, target):
+        """ Copies source into target. Returns True if it had to fall back to a one-step copy. """
+        state = {"remaining": None, "restarts": 0}
+
+        def progress(status, remaining, total):
+            # More pages left than after the previous step: a write made SQLite start over
+            if state["remaining"] is not None and remaining > state["remaining"]:
+                state["restarts"] += 1
+                if state["restarts"] > ReportingReplica.MAX_RESTARTS:
+                    raise _TooBusy()
+            state["remaining"] = remaining
+
+        try:
+            source.backup(target, pages=ReportingReplica.STEP_PAGES, progress=progress,
+                          sleep=ReportingReplica.STEP_PAUSE)
+            return False
+        except _TooBusy:
+            source.backup(target)
+            return True
+
+    @staticmethod
+    def refresh(replica_path=None):
+        """ Replaces the replica with a fresh copy. Returns (data version, seconds, one-step copy). """
+        replica_path = replica_path or DBService.REPORT_DB_PATH
+        tmp = f"{replica_path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        started = time.perf_counter()
+
+        source = DBService.get_db()
+        try:
+            target = sqlite3.connect(tmp)
+            try:
+                one_step = ReportingReplica._copy(source, target)
+                refreshed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                row = target.execute("SELECT Version FROM Data_Version WHERE Id = 1").fetchone()
+                version = row[0] if row else 0
+                target.execute("DROP TABLE IF EXISTS Replica_Info")
+                target.execute("CREATE TABLE Replica_Info (Refreshed_At DATETIME, Data_Version INTEGER)")
+                target.execute("INSERT INTO Replica_Info VALUES (?, ?)", (refreshed_at, version))
+                target.commit()
+            finally:
+                target.close()
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            source.close()
+
+        os.replace(tmp, replica_path)
+        return version, time.perf_counter() - started, one_step
+
+    @staticmethod
+    def refreshed_at():
+        """ When the copy the reports read was taken, or None if they read the main database. """
+        replica = DBService.REPORT_DB_PATH
+        if not (replica and os.path.exists(replica)):
+            return None
+        row = DBService.run_report("SELECT Refreshed_At FROM Replica_Info", fetchone=True)
+        return datetime.strptime(row['Refreshed_At'], '%Y-%m-%d %H:%M:%S') if row else None
+
+    @staticmethod
+    def start_in_background(interval_minutes):
+        """ Refreshes the replica every 'interval_minutes' in a daemon thread of the web app. """
+        return run_periodically("reporting-replica", ReportingReplica.refresh, interval_minutes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the read-only copy of the database that reports read")
+    parser.add_argument("--replica", required=True, help="replica file")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+    version, seconds, one_step = ReportingReplica.refresh(args.replica)
+    print(f"Replica {args.replica} refreshed at data version {version} in {seconds:.2f}s"
+          + (" (copied in one step: the database was busy)." if one_step else "."))
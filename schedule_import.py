@@ -0,0 +1,256 @@
+"""
+Creates a whole season of flights from a timetable.
+
+The timetable is CSV text with a header line:
+    origin,destination,weekdays,departure,airplane_id,price_economy,price_business
+    TLV,FCO,Mon Wed Fri,08:00,D500-12,250,
+    FCO,TLV,Mon Wed Fri,13:00,D500-12,250,
+Weekdays are day names (Mon Tue ...), digits (1 = Monday ... 7 = Sunday) or 'daily'.
+An empty business price means an economy-only flight.
+
+Every line is expanded into one flight per matching day of the season. All the flights are checked
+together: routes and aircraft in Python, and aircraft rotations in one SQL query, where the new legs
+and the aircraft's existing legs are ordered by departure (window functions). Each leg must start
+where the previous one landed, and after it landed. Crew is planned with CrewPlanner. Then
+everything is saved in one transaction. If anything conflicts, nothing is saved and the conflicts
+are reported. Flights the planner can't fully crew are created without crew and listed, so that
+crew_planner.py can fill them in later.
+
+Usage:
+    python schedule_import.py summer.csv --from 2026-07-01 --to 2026-09-30 --dry-run
+    python schedule_import.py summer.csv --from 2026-07-01 --to 2026-09-30
+"""
+import argparse
+import csv
+import io
+import time
+from datetime import date, datetime, timedelta
+
+from crew_planner import CrewPlanner
+from utilise import DBService, Flight, crew_index
+
+
+class ScheduleImporter:
+    """ Expands a timetable into flights, checks them in bulk and saves them in one transaction. """
+    COLUMNS = ["origin", "destination", "weekdays", "departure", "airplane_id", "price_economy", "price_business"]
+    DAY_NAMES = {"mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6, "sun": 7}
+    MAX_SEASON_DAYS = 366
+
+    @staticmethod
+    def parse_weekdays(text):
+        """ 'Mon Wed', 'mon,wed', '13' or 'daily' -> {1, 3} / {1..7}. Raises ValueError. """
+        text = text.strip().lower()
+        if text == "daily":
+            return set(range(1, 8))
+        if text.isdigit():
+            days = {int(c) for c in text}
+        else:
+            days = {ScheduleImporter.DAY_NAMES[word[:3]] for word in text.replace(",", " ").replace("/", " ").split()}
+        if not days or not days <= set(range(1, 8)):
+            raise ValueError
+        return days
+
+    @staticmethod
+    def expand(timetable_text, start, end):
+        """
+        Turns the timetable into a list of flights (dicts) between start and end (both included).
+        Returns (flights, problems); a problem is a line that can't be used at all, or a season that isn't one.
+        """
+        try:
+            start, end = date.fromisoformat(str(start or "")), date.fromisoformat(str(end or ""))
+        except ValueError:
+            return [], ["The season needs a first and a last day (YYYY-MM-DD)."]
+        if end < start:
+            return [], ["The season ends before it starts."]
+        if (end - start).days >= ScheduleImporter.MAX_SEASON_DAYS:
+            return [], [f"A season can be at most {ScheduleImporter.MAX_SEASON_DAYS} days long."]
+
+        routes = {(r['Origin_Airport'], r['Destination_Airport']): r['Duration']
+                  for r in DBService.run("SELECT Origin_Airport, Destination_Airport, Duration FROM Routes",
+                                         fetchall=True)}
+        sizes = {r['Airplane_ID']: r['Size']
+                 for r in DBService.run("SELECT DISTINCT Airplane_ID, Size FROM Airplanes", fetchall=True)}
+
+        flights, problems = [], []
+        reader = csv.DictReader(io.StringIO(timetable_text.strip()))
+        if reader.fieldnames is None or [c.strip().lower() for c in reader.fieldnames] != ScheduleImporter.COLUMNS:
+            return [], [f"The header must be: {','.join(ScheduleImporter.COLUMNS)}"]
+
+        for line_no, row in enumerate(reader, start=2):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            origin, destination = row["origin"].upper(), row["destination"].upper()
+            airplane_id = row["airplane_id"]
+            try:
+                days = ScheduleImporter.parse_weekdays(row["weekdays"])
+                dep_time = datetime.strptime(row["departure"], "%H:%M").time()
+                price_economy = float(row["price_economy"])
+                price_business = float(row["price_business"]) if row["price_business"] else 0
+            except (KeyError, ValueError):
+                problems.append(f"Line {line_no}: can't read weekdays, departure time or prices.")
+                continue
+
+            duration = routes.get((origin, destination))
+            if duration is None:
+                problems.append(f"Line {line_no}: there is no route {origin} → {destination}.")
+                continue
+            if airplane_id not in sizes:
+                problems.append(f"Line {line_no}: unknown airplane {airplane_id}.")
+                continue
+            if Flight.determine_flight_type(duration) == 'long' and sizes[airplane_id] != 'large':
+                problems.append(f"Line {line_no}: {origin} → {destination} is a long flight and needs a large airplane.")
+                continue
+
+            day = start
+            while day <= end:
+                if day.isoweekday() in days:
+                    departure = datetime.combine(day, dep_time)
+                    flight = CrewPlanner.flight(origin, destination, departure,
+                                                departure + timedelta(minutes=duration), sizes[airplane_id])
+                    flight.update(line=line_no, airplane_id=airplane_id,
+                                  price_economy=price_economy, price_business=price_business)
+                    flights.append(flight)
+                day += timedelta(days=1)
+
+        return flights, problems
+
+    @staticmethod
+    def find_rotation_conflicts(cursor, flights):
+        """
+        Checks all new legs against each other and against the aircraft's existing legs in one query.
+        Returns a list of conflict messages.
+        """
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS Import_Legs (
+                Line INTEGER, Flight_ID VARCHAR(10), Airplane_ID VARCHAR(20), Origin VARCHAR(50),
+                Destination VARCHAR(50), Departure_Time DATETIME, Arrival_Time DATETIME
+            )
+        """)
+        cursor.execute("DELETE FROM temp.Import_Legs")
+        cursor.executemany(
+            "INSERT INTO temp.Import_Legs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(f['line'], f['flight_id'], f['airplane_id'], f['origin'], f['destination'],
+              f['departure'].strftime('%Y-%m-%d %H:%M'), f['arrival'].strftime('%Y-%m-%d %H:%M')) for f in flights]
+        )
+        rows = cursor.execute("""
+            WITH legs AS (
+                SELECT 0 AS Line, Flight_IDFK AS Flight_ID, Airplane_IDFK AS Airplane_ID, Origin_Airport AS Origin,
+                       Destination_Airport AS Destination, Departure_Time, Arrival_Time
+                FROM Aircraft_Legs
+                WHERE Airplane_IDFK IN (SELECT DISTINCT Airplane_ID FROM temp.Import_Legs)
+                UNION ALL
+                SELECT Line, Flight_ID, Airplane_ID, Origin, Destination, Departure_Time, Arrival_Time
+                FROM temp.Import_Legs
+            ),
+            ordered AS (
+                SELECT *, LAG(Line) OVER w AS Prev_Line, LAG(Flight_ID) OVER w AS Prev_Flight,
+                       LAG(Destination) OVER w AS Prev_Destination, LAG(Arrival_Time) OVER w AS Prev_Arrival
+                FROM legs
+                WINDOW w AS (PARTITION BY Airplane_ID ORDER BY Departure_Time, Line)
+            )
+            SELECT * FROM ordered
+            WHERE Prev_Flight IS NOT NULL AND (Line > 0 OR Prev_Line > 0)
+              AND (Prev_Arrival > Departure_Time OR Prev_Destination != Origin)
+            ORDER BY Airplane_ID, Departure_Time
+        """).fetchall()
+        cursor.execute("DELETE FROM temp.Import_Legs")
+
+        conflicts = []
+        for r in rows:
+            where = f"Line {r['Line']}" if r['Line'] else f"Existing flight {r['Flight_ID']}"
+            before = f"line {r['Prev_Line']}" if r['Prev_Line'] else f"existing flight {r['Prev_Flight']}"
+            leg = f"{r['Origin']} → {r['Destination']} on {r['Departure_Time']} ({r['Airplane_ID']})"
+            if r['Prev_Arrival'] > r['Departure_Time']:
+                conflicts.append(f"{where}: {leg} departs before {before} lands at {r['Prev_Arrival']}.")
+            else:
+                conflicts.append(f"{where}: {leg}, but after {before} the airplane is in {r['Prev_Destination']}.")
+        return conflicts
+
+    @staticmethod
+    def import_schedule(timetable_text, start, end, assign_crew=True, dry_run=False):
+        """
+        Expands, checks and (unless dry_run or there are conflicts) saves the season.
+        Returns a report: {"flights": [...], "conflicts": [...], "without_crew": [...], "created": bool}.
+        """
+        flights, conflicts = ScheduleImporter.expand(timetable_text, start, end)
+        report = {"flights": flights, "conflicts": conflicts, "without_crew": [], "created": False}
+        if conflicts or not flights:
+            return report
+
+        taken = {r['Flight_ID'] for r in DBService.run("SELECT DISTINCT Flight_ID FROM Flights", fetchall=True)}
+        for f in flights:
+            f['flight_id'] = Flight.generate_flight_id(lambda fid: fid in taken)
+            taken.add(f['flight_id'])
+
+        planner = CrewPlanner()
+        if assign_crew:
+            for f, result in zip(flights, planner.plan(flights)):
+                f['pilots'], f['attendants'] = result['pilots'], result['attendants']
+        for f in flights:
+            f.setdefault('pilots', [])
+            f.setdefault('attendants', [])
+            if not f['pilots']:
+                report["without_crew"].append(f)
+
+        with DBService.transaction() as cursor:
+            version_before = Flight.get_schedule_version(cursor)
+            if version_before != planner.base_version:
+                report["conflicts"].append("The schedule changed while the import was being planned. Please try again.")
+                return report
+            report["conflicts"] = ScheduleImporter.find_rotation_conflicts(cursor, flights)
+            if report["conflicts"] or dry_run:
+                return report
+
+            rows = []
+            for f in flights:
+                dep, arr = f['departure'].strftime('%Y-%m-%d %H:%M'), f['arrival'].strftime('%Y-%m-%d %H:%M')
+                rows.append((f['flight_id'], 'Economy', f['airplane_id'], f['origin'], f['destination'],
+                             dep, arr, f['price_economy'], None))
+                if f['price_business'] > 0:
+                    rows.append((f['flight_id'], 'Business', f['airplane_id'], f['origin'], f['destination'],
+                                 dep, arr, None, f['price_business']))
+            cursor.executemany(
+                """
+                INSERT INTO Flights
+                (Flight_ID, Class_TypeFK, Airplane_IDFK, Origin_AirportFK, Destination_AirportFK,
+                 Departure_Time, Arrival_Time, Economy_price, Business_price, Status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'Active')
+                """, rows)
+            cursor.executemany(
+                "INSERT INTO Flight_assigned (Employee_IDFK, Flight_IDFK) VALUES (?, ?)",
+                [(eid, f['flight_id']) for f in flights for eid in f['pilots'] + f['attendants']]
+            )
+            version_after = Flight.get_schedule_version(cursor)
+
+        def add_all():
+            for f in flights:
+                crew_index.add_flight(f['flight_id'], f['departure'], f['arrival'], f['origin'], f['destination'],
+                                      f['pilots'] + f['attendants'])
+
+        crew_index.apply(version_before, version_after, add_all)
+        report["created"] = True
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a season of flights from a timetable (CSV)")
+    parser.add_argument("timetable", help="CSV file, see the top of schedule_import.py")
+    parser.add_argument("--from", dest="start", required=True, help="first day of the season, e.g. 2026-07-01")
+    parser.add_argument("--to", dest="end", required=True, help="last day of the season")
+    parser.add_argument("--no-crew", action="store_true", help="don't plan crew (fill it in later)")
+    parser.add_argument("--dry-run", action="store_true", help="only check, save nothing")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+
+    started = time.perf_counter()
+    with open(args.timetable, encoding="utf-8") as f:
+        result = ScheduleImporter.import_schedule(f.read(), args.start, args.end, not args.no_crew, args.dry_run)
+
+    for conflict in result["conflicts"]:
+        print(conflict)
+    for f in result["without_crew"]:
+        print(f"No full crew: line {f['line']} {f['origin']} → {f['destination']} on {f['departure']:%Y-%m-%d %H:%M}")
+    status = "Created" if result["created"] else "Checked (nothing saved)"
+    print(f"{status}: {len(result['flights'])} flights, {len(result['conflicts'])} conflicts, "
+          f"{len(result['without_crew'])} without crew, in {time.perf_counter() - started:.2f}s.")
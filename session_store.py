@@ -0,0 +1,173 @@
+"""
+Server-side sessions kept in a small SQLite table.
+
+Every request reads its session row by ID, but a row is only written when:
+- the session content changed (login, logout, guest details, phone fields...), or
+- its expiry needs to move forward by more than SESSION_REFRESH_SECONDS (a one-column UPDATE).
+Expired sessions are deleted in batches through the index on Expires_At.
+The table lives in its own database file (WAL mode), so all worker processes share it
+and session writes never wait for booking transactions.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+# ==================================================
+# STORAGE
+# ==================================================
+class SessionStore:
+    """ Reads and writes session rows. Every thread (and process) gets its own connection. """
+    GC_BATCH_SIZE = 500
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _conn(self):
+        # A forked worker must not reuse its parent's connection
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS Sessions (
+                    Session_ID TEXT PRIMARY KEY,
+                    Data TEXT NOT NULL,
+                    Expires_At REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON Sessions (Expires_At)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid, now):
+        """ Returns (data, expires_at) of a live session, or None. """
+        return self._conn().execute(
+            "SELECT Data, Expires_At FROM Sessions WHERE Session_ID = ? AND Expires_At > ?", (sid, now)
+        ).fetchone()
+
+    def save(self, sid, data, expires_at):
+        self._conn().execute(
+            """
+            INSERT INTO Sessions (Session_ID, Data, Expires_At) VALUES (?, ?, ?)
+            ON CONFLICT(Session_ID) DO UPDATE SET Data = excluded.Data, Expires_At = excluded.Expires_At
+            """, (sid, data, expires_at))
+
+    def touch(self, sid, expires_at):
+        self._conn().execute("UPDATE Sessions SET Expires_At = ? WHERE Session_ID = ?", (expires_at, sid))
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM Sessions WHERE Session_ID = ?", (sid,))
+
+    def collect_garbage(self, now, batch_size=GC_BATCH_SIZE):
+        """ Deletes expired sessions, one short batch at a time. Returns how many were deleted. """
+        total = 0
+        while True:
+            deleted = self._conn().execute(
+                """
+                DELETE FROM Sessions WHERE Session_ID IN (
+                    SELECT Session_ID FROM Sessions WHERE Expires_At <= ? LIMIT ?
+                )
+                """, (now, batch_size)).rowcount
+            total += deleted
+            if deleted < batch_size:
+                return total
+
+
+# ==================================================
+# FLASK SESSION INTERFACE
+# ==================================================
+class SQLiteSession(CallbackDict, SessionMixin):
+    """ The session dictionary of one request, plus what we need to know whether it changed. """
+
+    def __init__(self, initial=None, sid=None, new=True, raw=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.raw = raw  # The content as it was loaded, serialized
+        self.expires_at = expires_at
+        self.modified = False
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """
+    Session backend for Flask. Set it with:
+        app.session_interface = SQLiteSessionInterface(app.config["SESSION_DB_PATH"])
+    Config used: PERMANENT_SESSION_LIFETIME, SESSION_PERMANENT, SESSION_REFRESH_SECONDS, SESSION_GC_SECONDS
+    and the usual SESSION_COOKIE_* settings.
+    """
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, db_path):
+        self.store = SessionStore(db_path)
+        self._last_gc = 0.0
+        self._gc_lock = threading.Lock()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        row = self.store.load(sid, time.time()) if sid else None
+        if row:
+            return SQLiteSession(self.serializer.loads(row[0]), sid=sid, new=False, raw=row[0], expires_at=row[1])
+        return SQLiteSession(sid=secrets.token_urlsafe(32))
+
+    def save_session(self, app, session, response):
+        now = time.time()
+        self._maybe_collect_garbage(app, now)
+        response.vary.add("Cookie")
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            # Cleared (e.g. logout): forget the row and the cookie. A new empty session is never stored.
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        expires_at = now + lifetime
+        data = self.serializer.dumps(dict(session))
+
+        if data != session.raw:
+            self.store.save(session.sid, data, expires_at)
+        elif expires_at - session.expires_at >= app.config.get("SESSION_REFRESH_SECONDS", 60):
+            self.store.touch(session.sid, expires_at)
+        else:
+            # Same content and a fresh enough expiry: nothing to write, no cookie to send
+            return
+
+        cookie_expires = None
+        if app.config.get("SESSION_PERMANENT", True):
+            cookie_expires = datetime.fromtimestamp(expires_at, tz=timezone.utc)
+        response.set_cookie(
+            name, session.sid, expires=cookie_expires, httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path, secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+    def _maybe_collect_garbage(self, app, now):
+        """ Every SESSION_GC_SECONDS, one request per process also deletes the expired sessions. """
+        if now - self._last_gc < app.config.get("SESSION_GC_SECONDS", 300):
+            return
+        if not self._gc_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_gc = now
+            self.store.collect_garbage(now)
+        finally:
+            self._gc_lock.release()
@@ -0,0 +1,81 @@
+"""
+Keeps the stored flight and order statuses up to date.
+
+A flight that has landed is 'Completed', and so are its Active orders. Instead of working
+this out from the arrival time on every request, the sweeper writes the status once:
+it picks landed flights through the (Status, Arrival_Time) index and completes them in
+small batches, each in its own short transaction. Queries can then simply filter on Status.
+
+Usage:
+    python sweeper.py                  # run once (e.g. as a scheduled task every few minutes)
+    python sweeper.py --batch-size 100
+"""
+import argparse
+import time
+from datetime import datetime
+
+from utilise import DBService, run_periodically
+
+
+class StatusSweeper:
+    """ Moves landed flights and their active orders to 'Completed'. """
+    BATCH_SIZE = 200
+    PAUSE_BETWEEN_BATCHES = 0.05  # Seconds. Lets waiting bookings take the write lock between batches.
+
+    @staticmethod
+    def sweep_batch(batch_size=BATCH_SIZE, now=None):
+        """
+        Completes up to 'batch_size' landed flights in one transaction.
+        Returns (flights_completed, orders_completed).
+        """
+        now_str = (now or datetime.now()).strftime('%Y-%m-%d %H:%M')
+
+        with DBService.transaction() as cursor:
+            flight_ids = [r['Flight_ID'] for r in cursor.execute(
+                """
+                SELECT DISTINCT Flight_ID FROM Flights
+                WHERE Status IN ('Active', 'Fully Booked') AND Arrival_Time <= ?
+                LIMIT ?
+                """, (now_str, batch_size)).fetchall()]
+            if not flight_ids:
+                return 0, 0
+
+            placeholders = ", ".join("?" * len(flight_ids))
+            cursor.execute(f"""
+                UPDATE Flights SET Status = 'Completed'
+                WHERE Flight_ID IN ({placeholders}) AND Status IN ('Active', 'Fully Booked')
+            """, flight_ids)
+            orders = cursor.execute(f"""
+                UPDATE Orders SET Status = 'Completed'
+                WHERE Flight_IDFK IN ({placeholders}) AND Status = 'Active'
+            """, flight_ids).rowcount
+
+        return len(flight_ids), orders
+
+    @staticmethod
+    def run(batch_size=BATCH_SIZE):
+        """ Sweeps batch after batch until no landed flight is left. Returns (flights, orders) completed. """
+        flights_total, orders_total = 0, 0
+        while True:
+            flights, orders = StatusSweeper.sweep_batch(batch_size)
+            flights_total += flights
+            orders_total += orders
+            if flights < batch_size:
+                return flights_total, orders_total
+            time.sleep(StatusSweeper.PAUSE_BETWEEN_BATCHES)
+
+    @staticmethod
+    def start_in_background(interval_minutes, batch_size=BATCH_SIZE):
+        """ Runs the sweeper every 'interval_minutes' in a daemon thread of the web app. """
+        return run_periodically("status-sweeper", lambda: StatusSweeper.run(batch_size), interval_minutes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mark landed flights and their orders as Completed")
+    parser.add_argument("--batch-size", type=int, default=StatusSweeper.BATCH_SIZE)
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    args = parser.parse_args()
+    if args.db:
+        DBService.DB_PATH = args.db
+    flights, orders = StatusSweeper.run(args.batch_size)
+    print(f"Completed {flights} flights and {orders} orders.")
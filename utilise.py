@@ -1,8 +1,16 @@
+import logging
+import os
 import sqlite3
+import bisect
 import random
 import string
+import threading
+import time
 from contextlib import contextmanager
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+
+# Log of the app and its background jobs (main.py sets it up; Python prints warnings and errors without it)
+logger = logging.getLogger("flytau")
 
 
 # ==================================================
@@ -13,11 +21,13 @@ class DBService:
         This class handles the connection to our SQLite database.
         It saves us from writing the connection code every time we want to run a query.
     """
+    DB_PATH = "/home/amitaloni890/FlyTAU/flytau.db"
+    REPORT_DB_PATH = None  # Read-only copy that reports read (see reporting_replica.py). None = reports read DB_PATH
+    CHUNK_ROWS = 5000  # Rows held in memory at a time by report queries that stream their results
 
     @staticmethod
     def get_db():
-        db_path = "/home/amitaloni890/FlyTAU/flytau.db"
-        mydb = sqlite3.connect(db_path, check_same_thread=False)
+        mydb = sqlite3.connect(DBService.DB_PATH, check_same_thread=False)
         mydb.row_factory = sqlite3.Row
         mydb.isolation_level = None
         return mydb
@@ -33,6 +43,64 @@ class DBService:
             cursor.close()
             db.close()
 
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+        Runs several statements as one unit: either all of them are saved or none of them.
+        BEGIN IMMEDIATE takes the write lock right away, so two requests can't interleave their writes.
+        """
+        with DBService.db_cur() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    @staticmethod
+    @contextmanager
+    def report_cur():
+        """
+        A cursor for reports. With a reporting replica it reads that copy, opened read-only, so long
+        report queries never lock the main database; until the first copy exists it reads DB_PATH.
+        """
+        replica = DBService.REPORT_DB_PATH
+        if not (replica and os.path.exists(replica)):
+            with DBService.db_cur() as cursor:
+                yield cursor
+            return
+        db = sqlite3.connect(f"file:{replica}?mode=ro", uri=True, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.isolation_level = None
+        cursor = db.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            db.close()
+
+    @staticmethod
+    def fetch_chunks(cursor, chunk_rows=None):
+        """ Yields the rows of an executed query in lists of at most chunk_rows (default CHUNK_ROWS). """
+        while True:
+            rows = cursor.fetchmany(chunk_rows or DBService.CHUNK_ROWS)
+            if not rows:
+                return
+            yield rows
+
+    @staticmethod
+    def run_report(query, params=None, fetchone=False, fetchall=False):
+        """ Same as run, for report queries (see report_cur). """
+        with DBService.report_cur() as cursor:
+            cursor.execute(query, params or [])
+            if fetchone:
+                return cursor.fetchone()
+            if fetchall:
+                return cursor.fetchall()
+            return None
+
     @staticmethod
     def run(query, params=None, fetchone=False, fetchall=False):
         """
@@ -49,6 +117,27 @@ class DBService:
             return None
 
 
+# ==================================================
+# BACKGROUND JOBS
+# ==================================================
+def run_periodically(name, job, interval_minutes):
+    """
+    Calls job() every 'interval_minutes' in a daemon thread named 'name' and returns the thread.
+    A failed run is logged with its traceback and the job runs again on the next round.
+    """
+    def loop():
+        while True:
+            try:
+                job()
+            except Exception:
+                logger.exception("Background job %s failed", name)
+            time.sleep(interval_minutes * 60)
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
 # ==================================================
 # SESSION & AUTHENTICATION SERVICE
 # ==================================================
@@ -184,6 +273,7 @@ class RegisteredUser(Customer):
             DBService.run("DELETE FROM Phone_Numbers WHERE Email = ?", (email,))
             # Update orders to link them to a 'Registered' account
             DBService.run("UPDATE Orders SET Customer_type = 'Registered' WHERE Customer_email = ?", (email,))
+            DBService.run("UPDATE Orders_Archive SET Customer_type = 'Registered' WHERE Customer_email = ?", (email,))
             # Delete the guest entry
             DBService.run("DELETE FROM Guests WHERE Email = ?", (email,))
         return was_guest
@@ -238,87 +328,117 @@ class Manager(Employee):
     def add_flight_crew(employee_id, first_name, last_name, city, street, house_number, phone_number, start_date, role,
                         qualifications):
         """ Inserts a new flight crew member record into the FlightCrew table. """
-        DBService.run(
-            """
-            INSERT INTO FlightCrew
-            (Employee_ID, First_Name, Last_Name, City, Street, House_Number, Phone_Number, Start_Date, Role, Qualifications)
-            VALUES (?,?,?,?,?,?,?,?,?,?)
-            """,
-            (employee_id, first_name, last_name, city, street, house_number, phone_number, start_date, role,
-             qualifications),
-        )
+        with DBService.transaction() as cursor:
+            version_before = Flight.get_schedule_version(cursor)
+            cursor.execute(
+                """
+                INSERT INTO FlightCrew
+                (Employee_ID, First_Name, Last_Name, City, Street, House_Number, Phone_Number, Start_Date, Role, Qualifications)
+                VALUES (?,?,?,?,?,?,?,?,?,?)
+                """,
+                (employee_id, first_name, last_name, city, street, house_number, phone_number, start_date, role,
+                 qualifications),
+            )
+            version_after = Flight.get_schedule_version(cursor)
+
+        crew_index.apply(version_before, version_after, crew_index.add_crew_member,
+                         employee_id, first_name, last_name, role, qualifications)
         return True
 
     @staticmethod
-    def build_manager_dashboard(start_date=None, end_date=None):
+    def get_data_version(cursor=None):
+        """
+        Returns the data version: a counter that database triggers bump on every order, ticket,
+        flight and crew write. Cached reports use it to know they are up to date.
+        """
+        query = "SELECT Version FROM Data_Version WHERE Id = 1"
+        row = cursor.execute(query).fetchone() if cursor else DBService.run(query, fetchone=True)
+        return row['Version'] if row else 0
+
+    @staticmethod
+    def get_report_version():
+        """ The data version of the database reports read (the reporting replica, if there is one). """
+        row = DBService.run_report("SELECT Version FROM Data_Version WHERE Id = 1", fetchone=True)
+        return row['Version'] if row else 0
+
+    # The top N of one leaderboard, read off idx_leaderboards_rank (see leaderboards.py)
+    LEADERBOARD_TOP = """
+        SELECT Item, Score FROM Leaderboards
+        WHERE Board = ? AND Period = ? AND Scope = ?
+        ORDER BY Score DESC
+        LIMIT ?
+    """
+
+    @staticmethod
+    def get_leaderboard(board, n=3, period="", include_archive=False):
+        """
+        Returns the top 'n' rows (Item, Score) of a leaderboard: 'customers' (email, revenue),
+        'routes' ('ORIGIN → DESTINATION', tickets) or 'employees' (employee id, minutes flown),
+        for all time (period '') or one month ('YYYY-MM').
+        With include_archive, archived orders are counted as well (crew hours don't depend on it).
+        """
+        scope = 1 if include_archive and board != "employees" else 0
+        return DBService.run_report(Manager.LEADERBOARD_TOP, (board, period or "", scope, n), fetchall=True)
+
+    @staticmethod
+    def build_manager_dashboard(start_date=None, end_date=None, include_archive=False):
         """
         Collects business statistics for the manager's dashboard.
+        With include_archive, archived orders and tickets are counted as well.
+        The queries run on the reporting replica when there is one (see DBService.report_cur).
         """
-        assets = {"lists": {}, "totals": {}, "filters": {"start": start_date, "end": end_date}}
+        assets = {"lists": {}, "totals": {},
+                  "filters": {"start": start_date, "end": end_date, "include_archive": include_archive}}
+
+        # Orders, revenue and tickets come from the daily rollups (see dashboard_rollups.py)
+        archived = "" if include_archive else "AND Archived = 0"
 
         # Define dynamic date filter
         params = []
 
         if start_date and end_date:
-            # Applies selected range if filter is used
-            date_filter = "AND Execute_DateTime BETWEEN ? AND ?"
+            # Applies selected range if filter is used (whole days)
+            date_filter = "AND Day BETWEEN date(?) AND date(?)"
             params = [start_date, end_date]
         else:
             # Default: All time (no additional date constraints)
             date_filter = ""
 
-        # 1. Top 3 Employees (Flight hours - bypasses filter)
+        # 1-3. Top 3 employees (flight hours), customers (revenue) and routes (tickets), all time (bypass filter).
+        # Read off the leaderboards that triggers keep (see leaderboards.py)
+        scope = 1 if include_archive else 0
         assets["lists"]["top_employees"] = [
             {"name": f"{r['First_Name']} {r['Last_Name']}", "value": r['total_hours']}
-            for r in DBService.run("""
-                        SELECT fc.First_Name, fc.Last_Name, ROUND(SUM(r.Duration/60.0), 1) as total_hours
-                        FROM FlightCrew fc
-                        JOIN Flight_assigned fa ON fc.Employee_ID = fa.Employee_IDFK
-                        JOIN Flights f ON fa.Flight_IDFK = f.Flight_ID
-                        JOIN Routes r ON f.Origin_AirportFK = r.Origin_Airport
-                        AND f.Destination_AirportFK = r.Destination_Airport
-                        WHERE f.Status = 'Completed'
-                        GROUP BY fc.Employee_ID
-                        ORDER BY total_hours DESC
-                        LIMIT 3
-                    """, fetchall=True)
+            for r in DBService.run_report(f"""
+                        SELECT fc.First_Name, fc.Last_Name, ROUND(top.Score / 60.0, 1) as total_hours
+                        FROM ({Manager.LEADERBOARD_TOP}) top
+                        JOIN FlightCrew fc ON fc.Employee_ID = top.Item
+                        ORDER BY top.Score DESC
+                    """, ("employees", "", 0, 3), fetchall=True)
         ]
 
-        # 2. Top 3 Customers (Revenue - bypasses filter)
         assets["lists"]["top_customers"] = [
             {"name": f"{r['fname']} {r['lname']}", "value": r['total_spent']}
-            for r in DBService.run("""
+            for r in DBService.run_report(f"""
                         SELECT COALESCE(ru.First_Name, g.First_Name) as fname,
                         COALESCE(ru.Last_Name, g.Last_Name) as lname,
-                        ROUND(SUM(o.Total_Price), 2) as total_spent
-                        FROM Orders o
-                        LEFT JOIN RegisteredUser ru ON o.Customer_email = ru.Email
-                        LEFT JOIN Guests g ON o.Customer_email = g.Email
-                        WHERE o.Status IN ('Completed', 'Active')
-                        GROUP BY o.Customer_email
-                        ORDER BY total_spent DESC
-                        LIMIT 3
-                    """, fetchall=True)
+                        ROUND(top.Score, 2) as total_spent
+                        FROM ({Manager.LEADERBOARD_TOP}) top
+                        LEFT JOIN RegisteredUser ru ON top.Item = ru.Email
+                        LEFT JOIN Guests g ON top.Item = g.Email
+                        ORDER BY top.Score DESC
+                    """, ("customers", "", scope, 3), fetchall=True)
         ]
 
-        # 3. Top 3 Routes (Popularity - bypasses filter)
         assets["lists"]["top_routes"] = [
-            {"name": f"{r['Origin_AirportFK']} → {r['Destination_AirportFK']}"}
-            for r in DBService.run("""
-                        SELECT f.Origin_AirportFK, f.Destination_AirportFK, COUNT(t.Order_IDFK) as ticket_count
-                        FROM Tickets t
-                        JOIN Flights f ON t.Flight_IDFK = f.Flight_ID
-                        JOIN Orders o ON t.Order_IDFK = o.Order_ID
-                        WHERE o.Status IN ('Completed', 'Active')
-                        GROUP BY f.Origin_AirportFK, f.Destination_AirportFK
-                        ORDER BY ticket_count DESC
-                        LIMIT 3
-                    """, fetchall=True)
+            {"name": r['Item']}
+            for r in DBService.run_report(Manager.LEADERBOARD_TOP, ("routes", "", scope, 3), fetchall=True)
         ]
 
         # 4. Total Revenue (Filtered period OR All Time)
-        res_revenue = DBService.run(f"SELECT ROUND(SUM(Total_Price), 2) as total FROM Orders WHERE 1=1 {date_filter}",
-                                    params, fetchone=True)
+        res_revenue = DBService.run_report(
+            f"SELECT ROUND(SUM(Revenue), 2) as total FROM Daily_Order_Stats WHERE 1=1 {archived} {date_filter}",
+            params, fetchone=True)
         assets["totals"]["revenue"] = res_revenue['total'] if res_revenue and res_revenue['total'] else 0
 
         # 5. Peak Months (Bypasses filter - fixed to trailing 1 year for relevance)
@@ -328,10 +448,10 @@ class Manager(Employee):
             '09': 'September', '10': 'October', '11': 'November', '12': 'December'
         }
 
-        raw_months = DBService.run("""
-            SELECT strftime('%m', Execute_DateTime) as month_num, COUNT(*) as order_count
-            FROM Orders
-            WHERE Execute_DateTime >= date('now', '-1 year')
+        raw_months = DBService.run_report(f"""
+            SELECT strftime('%m', Day) as month_num, SUM(Orders) as order_count
+            FROM Daily_Order_Stats
+            WHERE Day >= date('now', '-1 year') {archived}
             GROUP BY month_num
             ORDER BY order_count DESC
             LIMIT 3
@@ -343,9 +463,9 @@ class Manager(Employee):
         ]
 
         # 6. Cancellation Rate (Filtered period OR All Time)
-        res_cancel = DBService.run(f"""
-                    SELECT ROUND((COUNT(CASE WHEN Status = 'Customer Cancellation' THEN 1 END) * 100.0 / NULLIF(COUNT(*), 0)), 2) as rate
-                    FROM Orders WHERE 1=1 {date_filter}
+        res_cancel = DBService.run_report(f"""
+                    SELECT ROUND(SUM(Cancellations) * 100.0 / NULLIF(SUM(Orders), 0), 2) as rate
+                    FROM Daily_Order_Stats WHERE 1=1 {archived} {date_filter}
                 """, params, fetchone=True)
         assets["totals"]["cancel_rate"] = res_cancel['rate'] if res_cancel and res_cancel['rate'] else 0
 
@@ -466,25 +586,6 @@ class Flight:
                 total += self.price_business or 0
         return total
 
-    @staticmethod
-    def get_display_status(db_status, arrival_time):
-        if not arrival_time:
-            return db_status
-        now = datetime.now()
-        if isinstance(arrival_time, str):
-            arrival_time = arrival_time.split('.')[0]
-            for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
-                try:
-                    arrival_time = datetime.strptime(arrival_time, fmt)
-                    break
-                except ValueError:
-                    continue
-        if db_status == 'Canceled':
-            return 'Canceled'
-        if db_status == 'Active' and arrival_time <= now:
-            return 'Completed'
-        return db_status
-
     @staticmethod
     def search(filters=None, for_manager=False):
         query = """
@@ -546,7 +647,8 @@ class Flight:
             dep_time = safe_strptime(row['Departure_Time'])
             arr_time = safe_strptime(row['Arrival_Time'])
 
-            display_status = Flight.get_display_status(row['status'], arr_time)
+            # Landed flights are stored as 'Completed' by the status sweeper (sweeper.py)
+            display_status = row['status']
 
             if for_manager and display_status not in ['Canceled', 'Completed']:
                 if row['eco_status'] == 'Fully Booked' and row['bus_status'] == 'Active':
@@ -624,7 +726,7 @@ class Flight:
             status=data['Status']
         )
 
-        f_obj.display_status = Flight.get_display_status(data['Status'], arr_time)
+        f_obj.display_status = data['Status']
         f_obj.eco_status = eco_status
         f_obj.bus_status = bus_status
 
@@ -665,93 +767,52 @@ class Flight:
     @staticmethod
     def get_available_airplanes(origin, db, flight_type, departure_time_str):
         """
-        Query to find airplanes that are either idle or currently
-        at the origin airport and free during the requested timeframe.
+        Query to find airplanes that are either idle or whose last scheduled flight
+        lands at the origin airport before the requested departure.
+        Reads the maintained Aircraft_State table (one row per airplane), not the flight history.
         """
-        req_dep_time = datetime.fromisoformat(departure_time_str)
+        req_dep_time = datetime.fromisoformat(departure_time_str).strftime('%Y-%m-%d %H:%M')
         query = """
-            SELECT DISTINCT Airplane_ID, Size, Manufacturer
-            FROM Airplanes
-            WHERE (
-                Airplane_ID NOT IN (SELECT DISTINCT Airplane_IDFK FROM Flights)
-                OR
-                Airplane_ID IN (
-                    SELECT f1.Airplane_IDFK
-                    FROM Flights f1
-                    WHERE f1.Destination_AirportFK = ?
-                      AND f1.Arrival_Time <= ?
-                      AND f1.Arrival_Time = (
-                          SELECT MAX(f2.Arrival_Time)
-                          FROM Flights f2
-                          WHERE f2.Airplane_IDFK = f1.Airplane_IDFK
-                      )
-                )
-            )
-            AND Airplane_ID NOT IN (
-                SELECT Airplane_IDFK FROM Flights
-                WHERE Status = 'Active'
-                AND (Departure_Time <= ? AND Arrival_Time >= ?)
-            )
+            SELECT DISTINCT a.Airplane_ID, a.Size, a.Manufacturer
+            FROM Aircraft_State s
+            JOIN Airplanes a ON a.Airplane_ID = s.Airplane_ID
+            WHERE (s.Last_Arrival IS NULL OR (s.Location = ? AND s.Last_Arrival <= ?))
         """
         if flight_type == 'long':
-            query += " AND Size='large'"
+            query += " AND a.Size='large'"
 
-        rows = db.run(query, (origin, req_dep_time, req_dep_time, req_dep_time), fetchall=True)
+        rows = db.run(query, (origin, req_dep_time), fetchall=True)
         return rows
 
     @staticmethod
-    def get_available_crew(db, origin, flight_type, departure_time_str):
+    def get_airplane_legs(airplane_id, from_time=None):
+        """ Returns the airplane's scheduled (non-canceled) legs, sorted by departure. """
+        return DBService.run(
+            """
+            SELECT Flight_IDFK, Origin_Airport, Destination_Airport, Departure_Time, Arrival_Time
+            FROM Aircraft_Legs
+            WHERE Airplane_IDFK = ? AND Departure_Time >= ?
+            ORDER BY Departure_Time
+            """,
+            (airplane_id, from_time or ''), fetchall=True
+        )
+
+    @staticmethod
+    def get_available_crew(db, origin, flight_type, departure_time_str, arrival_time_str=None, destination=None):
         """
-        Query to find available pilots and attendants based on their
-        location, flight history, and required qualifications.
-        We use a helper function 'get_crew_by_role' to avoid writing the same
-        long SQL query twice (once for pilots and once for attendants).
+        Finds available pilots and attendants based on their location,
+        flight schedule, and required qualifications.
+        The answer comes from the in-memory crew index (see CrewAvailabilityIndex), not from SQL.
+        With an arrival time, the whole flight must fit into the crew member's schedule.
         """
-        req_dep_time = datetime.fromisoformat(departure_time_str)
-        qualification_filter = "AND Qualifications=1" if flight_type == 'long' else ""
-
-        def get_crew_by_role(role):
-            query = f"""
-                    SELECT Employee_ID, First_Name, Last_Name
-                    FROM FlightCrew
-                    WHERE Role = ?
-                    {qualification_filter}
-                    AND (
-                        Employee_ID NOT IN (SELECT Employee_IDFK FROM Flight_assigned)
-                        OR
-                        Employee_ID IN (
-                            SELECT fa.Employee_IDFK
-                            FROM Flight_assigned fa
-                            JOIN Flights f ON fa.Flight_IDFK = f.Flight_ID
-                            WHERE f.Destination_AirportFK = ?
-                              AND f.Arrival_Time <= ?
-                              AND f.Arrival_Time = (
-                                  SELECT MAX(f_inner.Arrival_Time)
-                                  FROM Flights f_inner
-                                  JOIN Flight_assigned fa_inner ON f_inner.Flight_ID = fa_inner.Flight_IDFK
-                                  WHERE fa_inner.Employee_IDFK = fa.Employee_IDFK
-                              )
-                        )
-                    )
-                    AND Employee_ID NOT IN (
-                        SELECT fa2.Employee_IDFK
-                        FROM Flight_assigned fa2
-                        JOIN Flights f2 ON fa2.Flight_IDFK = f2.Flight_ID
-                        WHERE f2.Status IN ('Active', 'Fully Booked')
-                        AND (f2.Departure_Time <= ? AND f2.Arrival_Time >= ?)
-                    )
-                """
-            return db.run(query, (role, origin, req_dep_time, req_dep_time, req_dep_time), fetchall=True)
-
-        pilots = get_crew_by_role('Pilot')
-        attendants = get_crew_by_role('Attendant')
-
-        p_list = [{"employee_id": r['Employee_ID'], "first_name": r['First_Name'], "last_name": r['Last_Name']} for r in
-                  pilots]
-        a_list = [{"employee_id": r['Employee_ID'], "first_name": r['First_Name'], "last_name": r['Last_Name']} for r in
-                  attendants]
+        req_dep_time = datetime.fromisoformat(str(departure_time_str).replace(' ', 'T'))
+        req_arr_time = datetime.fromisoformat(str(arrival_time_str).replace(' ', 'T')) if arrival_time_str else req_dep_time
+        long_haul = flight_type == 'long'
 
-        return p_list, a_list
+        crew_index.ensure_fresh()
+        pilots = crew_index.available(origin, 'Pilot', long_haul, req_dep_time, req_arr_time, destination)
+        attendants = crew_index.available(origin, 'Attendant', long_haul, req_dep_time, req_arr_time, destination)
+        return pilots, attendants
 
     @staticmethod
     def determine_flight_type(duration_mins):
@@ -764,62 +825,162 @@ class Flight:
         Checks if the crew meets safety standards based on aircraft size.
         Returns (is_valid, error_message).
         """
-        if airplane_size == 'large':
-            if num_pilots != 3:
-                return False, "Large aircraft requires exactly 3 pilots."
-            if num_attendants != 6:
-                return False, "Large aircraft requires exactly 6 attendants."
-        else:
-            if num_pilots != 2:
-                return False, "Small aircraft requires exactly 2 pilots."
-            if num_attendants != 3:
-                return False, "Small aircraft requires exactly 3 attendants."
+        pilots, attendants = Flight.required_crew(airplane_size)
+        size_name = "Large" if airplane_size == 'large' else "Small"
+        if num_pilots != pilots:
+            return False, f"{size_name} aircraft requires exactly {pilots} pilots."
+        if num_attendants != attendants:
+            return False, f"{size_name} aircraft requires exactly {attendants} attendants."
 
         return True, None
 
+    @staticmethod
+    def required_crew(airplane_size):
+        """ Returns (pilots, attendants) a flight needs: 3 and 6 on a large aircraft, 2 and 3 on a small one. """
+        return (3, 6) if airplane_size == 'large' else (2, 3)
+
     @staticmethod
     def create_flight(origin, destination, departure_time, arrival_time, airplane_id, pilot_ids, attendant_ids, db,
                       price_regular, price_business):
         """
         Creates a new flight entry and assigns the chosen crew members.
+        Returns (flight_id, None), or (None, error_message) if the airplane or crew is busy at that time.
         """
-        # Generate a random Flight ID (e.g., AB123)
-        letters = ''.join(random.choices(string.ascii_uppercase, k=2))
-        numbers = ''.join(random.choices(string.digits, k=3))
-
-        flight_id = f"{letters}{numbers}"
-        # Ensure ID uniqueness: regenerate if already exists in DB
-        while db.run("SELECT 1 FROM Flights WHERE Flight_ID = ?", (flight_id,), fetchone=True):
-            letters = ''.join(random.choices(string.ascii_uppercase, k=2))
-            numbers = ''.join(random.choices(string.digits, k=3))
-            flight_id = f"{letters}{numbers}"
-
         clean_dep = str(departure_time).replace('T', ' ')[:16]
         clean_arr = str(arrival_time).replace('T', ' ')[:16]
+        crew_ids = list(pilot_ids) + list(attendant_ids)
 
-        db.run(
-            """
-            INSERT INTO Flights
-            (Flight_ID, Class_TypeFK, Airplane_IDFK, Origin_AirportFK, Destination_AirportFK,
-             Departure_Time, Arrival_Time, Economy_price, Status)
-            VALUES (?, 'Economy', ?, ?, ?, ?, ?, ?, 'Active')
-            """,
-            (flight_id, airplane_id, origin, destination, clean_dep, clean_arr, price_regular)
-        )
+        with db.transaction() as cursor:
+            version_before = Flight.get_schedule_version(cursor)
+            # Last check, under the write lock: someone may have booked the airplane or crew meanwhile
+            conflicts = Flight.find_schedule_conflicts(cursor, airplane_id, crew_ids, clean_dep, clean_arr)
+            if conflicts:
+                return None, "Schedule conflict: " + "; ".join(conflicts)
+
+            flight_id = Flight.generate_flight_id(
+                lambda fid: cursor.execute("SELECT 1 FROM Flights WHERE Flight_ID = ?", (fid,)).fetchone())
 
-        if price_business and float(price_business) > 0:
-            db.run(
+            cursor.execute(
                 """
                 INSERT INTO Flights
                 (Flight_ID, Class_TypeFK, Airplane_IDFK, Origin_AirportFK, Destination_AirportFK,
-                 Departure_Time, Arrival_Time, Business_price, Status)
-                VALUES (?, 'Business', ?, ?, ?, ?, ?, ?, 'Active')
+                 Departure_Time, Arrival_Time, Economy_price, Status)
+                VALUES (?, 'Economy', ?, ?, ?, ?, ?, ?, 'Active')
                 """,
-                (flight_id, airplane_id, origin, destination, clean_dep, clean_arr, price_business)
+                (flight_id, airplane_id, origin, destination, clean_dep, clean_arr, price_regular)
             )
 
-        for eid in pilot_ids + attendant_ids:
-            db.run("INSERT INTO Flight_assigned (Employee_IDFK, Flight_IDFK) VALUES (?, ?)", (eid, flight_id))
+            if price_business and float(price_business) > 0:
+                cursor.execute(
+                    """
+                    INSERT INTO Flights
+                    (Flight_ID, Class_TypeFK, Airplane_IDFK, Origin_AirportFK, Destination_AirportFK,
+                     Departure_Time, Arrival_Time, Business_price, Status)
+                    VALUES (?, 'Business', ?, ?, ?, ?, ?, ?, 'Active')
+                    """,
+                    (flight_id, airplane_id, origin, destination, clean_dep, clean_arr, price_business)
+                )
+
+            cursor.executemany("INSERT INTO Flight_assigned (Employee_IDFK, Flight_IDFK) VALUES (?, ?)",
+                               [(eid, flight_id) for eid in crew_ids])
+            version_after = Flight.get_schedule_version(cursor)
+
+        crew_index.apply(version_before, version_after, crew_index.add_flight,
+                         flight_id, clean_dep, clean_arr, origin, destination, crew_ids)
+        return flight_id, None
+
+    @staticmethod
+    def find_schedule_conflicts(cursor, airplane_id, crew_ids, departure, arrival):
+        """
+        Checks the whole block time (departure to arrival) of a new flight against everything the airplane
+        and the crew are already doing. Uses the Schedule_Intervals R*Tree, so the cost grows with the
+        number of flights in the air at that time, not with the size of the schedule.
+        Returns a list of messages (empty if there is no overlap).
+        """
+        crew_ids = list(crew_ids)
+        placeholders = ", ".join("?" * len(crew_ids)) or "NULL"
+        rows = cursor.execute(
+            f"""
+            SELECT o.Resource_Type, o.Resource_ID, o.Flight_ID
+            FROM Schedule_Intervals r
+            JOIN Schedule_Interval_Owners o ON o.Id = r.Id
+            WHERE r.Start_Minute < CAST(strftime('%s', ?) AS INTEGER) / 60
+              AND r.End_Minute > CAST(strftime('%s', ?) AS INTEGER) / 60
+              AND ((o.Resource_Type = 'Airplane' AND o.Resource_ID = ?)
+                   OR (o.Resource_Type = 'Crew' AND o.Resource_ID IN ({placeholders})))
+            ORDER BY o.Resource_Type, o.Resource_ID
+            """,
+            [arrival, departure, airplane_id] + crew_ids
+        ).fetchall()
+        return [f"{'airplane' if r['Resource_Type'] == 'Airplane' else 'crew member'} {r['Resource_ID']} "
+                f"is on flight {r['Flight_ID']} at that time" for r in rows]
+
+    @staticmethod
+    def generate_flight_id(is_taken):
+        """ Returns a random Flight ID (e.g., AB123), regenerated until is_taken(flight_id) is false. """
+        while True:
+            letters = ''.join(random.choices(string.ascii_uppercase, k=2))
+            numbers = ''.join(random.choices(string.digits, k=3))
+            flight_id = f"{letters}{numbers}"
+            if not is_taken(flight_id):
+                return flight_id
+
+    @staticmethod
+    def cancel_flight(flight_id, now=None):
+        """
+        Cancels a flight in one transaction:
+        - the flight is marked Canceled, which frees its airplane and crew time (triggers, crew index),
+        - its active orders become 'System Cancellation' with price 0, which frees their seats,
+        - one Refund_Outbox row per affected customer records the refund to pay and the message to send
+          (outbox.py does that in the background).
+        Only active flights departing in 72 hours or more can be canceled.
+        Returns (number of orders canceled, error_message).
+        """
+        now = now or datetime.now()
+        with DBService.transaction() as cursor:
+            flight = cursor.execute(
+                "SELECT MIN(Status) AS Status, MIN(Departure_Time) AS Departure_Time FROM Flights WHERE Flight_ID = ?",
+                (flight_id,)
+            ).fetchone()
+            if flight is None or flight['Status'] is None:
+                return 0, "Flight not found."
+            if flight['Status'] not in ('Active', 'Fully Booked'):
+                return 0, f"The flight is already {flight['Status']}."
+            departure = datetime.fromisoformat(str(flight['Departure_Time']).replace(' ', 'T')[:16])
+            if departure < now + timedelta(hours=72):
+                return 0, "Flights can only be canceled up to 72 hours before departure."
+
+            version_before = Flight.get_schedule_version(cursor)
+            cursor.execute(
+                """
+                INSERT INTO Refund_Outbox (Flight_IDFK, Customer_email, Customer_type, Order_IDs, Refund_Amount, Created_At)
+                SELECT Flight_IDFK, Customer_email, Customer_type, GROUP_CONCAT(Order_ID), SUM(Total_Price), ?
+                FROM Orders
+                WHERE Flight_IDFK = ? AND Status = 'Active'
+                GROUP BY Flight_IDFK, Customer_email, Customer_type
+                """,
+                (now.strftime('%Y-%m-%d %H:%M:%S'), flight_id)
+            )
+            canceled = cursor.execute(
+                "UPDATE Orders SET Total_Price = 0, Status = 'System Cancellation' "
+                "WHERE Flight_IDFK = ? AND Status = 'Active'",
+                (flight_id,)
+            ).rowcount
+            cursor.execute("UPDATE Flights SET Status = 'Canceled' WHERE Flight_ID = ?", (flight_id,))
+            version_after = Flight.get_schedule_version(cursor)
+
+        crew_index.apply(version_before, version_after, crew_index.remove_flight, flight_id)
+        return canceled, None
+
+    @staticmethod
+    def get_schedule_version(cursor=None):
+        """
+        Returns the schedule version: a counter that database triggers bump whenever flights,
+        crew assignments or crew members change. In-memory indexes use it to know they are up to date.
+        """
+        query = "SELECT Version FROM Schedule_Version WHERE Id = 1"
+        row = cursor.execute(query).fetchone() if cursor else DBService.run(query, fetchone=True)
+        return row['Version'] if row else 0
 
     def get_seat_map(self):
         # Get the plane layout from the database
@@ -864,6 +1025,20 @@ class Flight:
 
         return seat_map, availability
 
+    def get_seats_left(self, class_type):
+        """ Returns how many seats of a cabin class are still free on this flight. """
+        row = DBService.run(
+            """
+            SELECT a.Number_of_rows * a.Number_of_columns -
+                   (SELECT COUNT(*) FROM Tickets t
+                    JOIN Orders o ON t.Order_IDFK = o.Order_ID
+                    WHERE t.Flight_IDFK = ? AND t.Class_Type = ? AND o.Status = 'Active') AS seats_left
+            FROM Airplanes a
+            WHERE a.Airplane_ID = ? AND a.Class_Type = ?
+            """,
+            (self.flight_id, class_type, self.airplane_id, class_type), fetchone=True)
+        return row['seats_left'] if row else 0
+
     @staticmethod
     def get_popular_destinations():
         """ Finds the top destinations with the cheapest active flights for the homepage. """
@@ -898,11 +1073,232 @@ class Flight:
                     break
         return dest_data
 
+# ==================================================
+# CREW AVAILABILITY INDEX
+# ==================================================
+class CrewAvailabilityIndex:
+    """
+    Keeps every crew member's schedule in memory: a list of their (non-canceled) flights sorted by
+    departure. It answers "which pilots/attendants are at airport X at time T, free until A and
+    qualified for long haul" without running SQL.
+
+    A crew member can take a new flight from X (departing T, landing at A in Y) when:
+    - their last flight before T landed at X (or they have no earlier flight),
+    - none of their flights overlaps the time between T and A,
+    - their next flight, if any, leaves from Y after A.
+
+    Most requests are for the future, after everybody's last flight, so crew members are also grouped
+    by (role, airport of their last landing). Only crew with flights after T need their schedule checked.
+
+    The index is kept up to date by create_flight, cancel_flight and add_flight_crew. Other processes
+    (or manual changes in the database) bump the schedule version, and then the index reloads itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None  # Schedule version the index reflects. None = must reload
+        self.crew = {}  # employee_id -> {"first_name", "last_name", "role", "qualified"}
+        self.timelines = {}  # employee_id -> sorted list of (departure, arrival, origin, destination, flight_id)
+        self.flight_crew = {}  # flight_id -> list of employee ids
+        self._by_last_location = {}  # (role, airport) -> set of employee ids whose last flight lands there
+        self._unassigned = {}  # role -> set of employee ids with no flights
+        self._last_arrivals = []  # sorted list of (last arrival, employee_id)
+
+    # ---------- loading ----------
+    def reload(self):
+        with self._lock:
+            version = Flight.get_schedule_version()
+            self.crew, self.timelines, self.flight_crew = {}, {}, {}
+            self._by_last_location, self._unassigned, self._last_arrivals = {}, {}, []
+
+            for r in DBService.run("SELECT Employee_ID, First_Name, Last_Name, Role, Qualifications FROM FlightCrew",
+                                   fetchall=True):
+                self.crew[r['Employee_ID']] = {"first_name": r['First_Name'], "last_name": r['Last_Name'],
+                                               "role": r['Role'], "qualified": bool(r['Qualifications'])}
+                self.timelines[r['Employee_ID']] = []
+
+            rows = DBService.run("""
+                SELECT fa.Employee_IDFK, f.Flight_ID, MIN(f.Departure_Time) AS Departure_Time,
+                       MIN(f.Arrival_Time) AS Arrival_Time, MIN(f.Origin_AirportFK) AS Origin,
+                       MIN(f.Destination_AirportFK) AS Destination
+                FROM Flight_assigned fa
+                JOIN Flights f ON fa.Flight_IDFK = f.Flight_ID
+                WHERE f.Status != 'Canceled'
+                GROUP BY fa.Employee_IDFK, f.Flight_ID
+            """, fetchall=True)
+            for r in rows:
+                if r['Employee_IDFK'] not in self.timelines:
+                    continue
+                self.timelines[r['Employee_IDFK']].append(
+                    (CrewAvailabilityIndex._to_dt(r['Departure_Time']), CrewAvailabilityIndex._to_dt(r['Arrival_Time']),
+                     r['Origin'], r['Destination'], r['Flight_ID']))
+                self.flight_crew.setdefault(r['Flight_ID'], []).append(r['Employee_IDFK'])
+
+            for eid, legs in self.timelines.items():
+                legs.sort()
+                self._index(eid)
+            self._version = version
+
+    def version(self):
+        """ The schedule version the index reflects (None = it reloads on next use). """
+        return self._version
+
+    def ensure_fresh(self):
+        """ Reloads the index if the schedule changed since it was built. """
+        if self._version is None or self._version != Flight.get_schedule_version():
+            self.reload()
+
+    def apply(self, version_before, version_after, change, *args):
+        """
+        Applies a change we just saved to the database. If someone else changed the schedule
+        in the meantime (the index isn't at version_before), the index is reloaded on next use instead.
+        """
+        with self._lock:
+            if self._version is not None and self._version == version_before:
+                change(*args)
+                self._version = version_after
+            else:
+                self._version = None
+
+    def snapshot(self):
+        """ Returns an up-to-date private copy of the index, for planning changes without saving them. """
+        self.ensure_fresh()
+        with self._lock:
+            copy = CrewAvailabilityIndex()
+            copy.crew = dict(self.crew)
+            copy.timelines = {eid: list(legs) for eid, legs in self.timelines.items()}
+            copy.flight_crew = {fid: list(crew) for fid, crew in self.flight_crew.items()}
+            copy._by_last_location = {key: set(ids) for key, ids in self._by_last_location.items()}
+            copy._unassigned = {role: set(ids) for role, ids in self._unassigned.items()}
+            copy._last_arrivals = list(self._last_arrivals)
+            copy._version = self._version
+            return copy
+
+    @staticmethod
+    def _to_dt(value):
+        return datetime.fromisoformat(str(value).split('.')[0].replace('T', ' '))
+
+    # ---------- grouping helpers ----------
+    def _index(self, eid):
+        """ Puts a crew member in the right group by their last flight. """
+        role, legs = self.crew[eid]['role'], self.timelines[eid]
+        if not legs:
+            self._unassigned.setdefault(role, set()).add(eid)
+            return
+        last = legs[-1]
+        self._by_last_location.setdefault((role, last[3]), set()).add(eid)
+        bisect.insort(self._last_arrivals, (last[1], eid))
+
+    def _unindex(self, eid):
+        role, legs = self.crew[eid]['role'], self.timelines[eid]
+        if not legs:
+            self._unassigned.get(role, set()).discard(eid)
+            return
+        last = legs[-1]
+        self._by_last_location.get((role, last[3]), set()).discard(eid)
+        pos = bisect.bisect_left(self._last_arrivals, (last[1], eid))
+        if pos < len(self._last_arrivals) and self._last_arrivals[pos] == (last[1], eid):
+            del self._last_arrivals[pos]
+
+    # ---------- updates ----------
+    def add_flight(self, flight_id, departure, arrival, origin, destination, crew_ids):
+        dep, arr = CrewAvailabilityIndex._to_dt(departure), CrewAvailabilityIndex._to_dt(arrival)
+        for eid in crew_ids:
+            if eid not in self.crew:
+                continue
+            self._unindex(eid)
+            bisect.insort(self.timelines[eid], (dep, arr, origin, destination, flight_id))
+            self._index(eid)
+            self.flight_crew.setdefault(flight_id, []).append(eid)
+
+    def remove_flight(self, flight_id):
+        for eid in self.flight_crew.pop(flight_id, []):
+            self._unindex(eid)
+            self.timelines[eid] = [leg for leg in self.timelines[eid] if leg[4] != flight_id]
+            self._index(eid)
+
+    def add_crew_member(self, employee_id, first_name, last_name, role, qualifications):
+        self.crew[employee_id] = {"first_name": first_name, "last_name": last_name,
+                                  "role": role, "qualified": bool(int(qualifications or 0))}
+        self.timelines[employee_id] = []
+        self._index(employee_id)
+
+    # ---------- queries ----------
+    def fits(self, eid, origin, departure, arrival, destination=None):
+        """ Checks one crew member's schedule for a flight from 'origin' between departure and arrival. """
+        legs = self.timelines[eid]
+        i = bisect.bisect_left(legs, (departure,))
+        if i > 0:
+            prev = legs[i - 1]
+            if prev[1] > departure or prev[3] != origin:
+                return False
+        if i < len(legs):
+            nxt = legs[i]
+            if nxt[0] < arrival or (destination and nxt[2] != destination):
+                return False
+        return True
+
+    def available(self, origin, role, long_haul, departure, arrival=None, destination=None):
+        """
+        Returns the crew members of 'role' who can take a flight from 'origin' at 'departure'
+        (until 'arrival'), as a list of {"employee_id", "first_name", "last_name"} sorted by ID.
+        Call ensure_fresh() first to pick up changes made by other processes.
+        """
+        arrival = arrival or departure
+        if self._version is None:
+            self.reload()
+        with self._lock:
+            found = set()
+            # Crew whose last flight landed at the origin before we leave: free for sure
+            for eid in self._by_last_location.get((role, origin), ()):
+                if self.timelines[eid][-1][1] <= departure:
+                    found.add(eid)
+            # Crew that never flew can start anywhere
+            found.update(self._unassigned.get(role, ()))
+            # Crew with flights after our departure: check where our flight fits in their schedule
+            start = bisect.bisect_right(self._last_arrivals, (departure, chr(0x10FFFF)))
+            for _, eid in self._last_arrivals[start:]:
+                if self.crew[eid]['role'] == role and self.fits(eid, origin, departure, arrival, destination):
+                    found.add(eid)
+
+            return [{"employee_id": eid, "first_name": self.crew[eid]['first_name'],
+                     "last_name": self.crew[eid]['last_name']}
+                    for eid in sorted(found) if self.crew[eid]['qualified'] or not long_haul]
+
+
+crew_index = CrewAvailabilityIndex()
+
+
 # ==================================================
 # ORDER
 # ==================================================
 class Order:
     """ Handles retrieval and updates of flight booking records. """
+    SEAT_BATCH_SIZE = 500
+
+    # Orders of flights that landed long ago are moved to the archive tables (see archive.py).
+    # History views and reports read them back through these views when asked to.
+    ORDERS_WITH_ARCHIVE = """(
+        SELECT Order_ID, Flight_IDFK, Customer_type, Customer_email, Execute_DateTime, Total_Price, Status FROM Orders
+        UNION ALL
+        SELECT Order_ID, Flight_IDFK, Customer_type, Customer_email, Execute_DateTime, Total_Price, Status FROM Orders_Archive
+    )"""
+    TICKETS_WITH_ARCHIVE = """(
+        SELECT Order_IDFK, Flight_IDFK, Row_Num, Col_Num, Class_Type, Price FROM Tickets
+        UNION ALL
+        SELECT Order_IDFK, Flight_IDFK, Row_Num, Col_Num, Class_Type, Price FROM Tickets_Archive
+    )"""
+
+    @staticmethod
+    def orders_table(include_archive=False):
+        """ Returns what to put after FROM to read orders, with or without the archived ones. """
+        return Order.ORDERS_WITH_ARCHIVE if include_archive else "Orders"
+
+    @staticmethod
+    def tickets_table(include_archive=False):
+        """ Returns what to put after FROM to read tickets, with or without the archived ones. """
+        return Order.TICKETS_WITH_ARCHIVE if include_archive else "Tickets"
+
     def __init__(self, order_id, flight_id, customer_email, status, execute_datetime):
         self.order_id = order_id
         self.flight_id = flight_id
@@ -910,70 +1306,56 @@ class Order:
         self.status = status
         self.execute_datetime = execute_datetime
 
-    @staticmethod
-    def get_display_status(db_status, arrival_time):
-        now = datetime.now()
-        if isinstance(arrival_time, str):
-            arrival_time = arrival_time.split('.')[0]
-            try:
-                arrival_time = datetime.strptime(arrival_time, '%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                arrival_time = datetime.strptime(arrival_time, '%Y-%m-%d %H:%M')
-        if db_status in ['Customer Cancellation', 'Canceled', 'Completed']:
-            return db_status
-        if db_status == 'Active' and arrival_time <= now:
-            return 'Completed'
-        return db_status
-
     @staticmethod
     def get_seats_by_order(order_id):
         """
         Fetches all seats for a specific order and groups them by class type.
         Returns a dictionary: {'Business': ['1A', '1B'], 'Economy': ['10C']}
         """
-        query = """
-                    SELECT t.Row_Num, t.Col_Num, a.Class_Type, a.Number_of_rows
-                    FROM Tickets t
-                    JOIN Flights f ON t.Flight_IDFK = f.Flight_ID
-                    JOIN Airplanes a ON f.Airplane_IDFK = a.Airplane_ID
-                    WHERE t.Order_IDFK = ?
-                """
-        rows = DBService.run(query, (order_id,), fetchall=True)
+        return Order.get_seats_by_orders([order_id])[int(order_id)]
 
-        if not rows:
-            return {'Business': [], 'Economy': []}
+    @staticmethod
+    def get_seats_by_orders(order_ids, include_archive=False):
+        """
+        Fetches the seats of many orders at once and groups them by class type.
+        Returns a dictionary keyed by order ID (as an int): {4: {'Business': ['1B'], 'Economy': []}, ...}
+        """
+        order_ids = list(dict.fromkeys(int(oid) for oid in order_ids))
+        grouped = {oid: {'Business': [], 'Economy': []} for oid in order_ids}
 
-        business_rows_limit = 0
-        for r in rows:
-            if r['Class_Type'] == 'Business':
-                business_rows_limit = r['Number_of_rows']
-                break
+        # SQLite limits the number of '?' in one statement, so very long lists are sent in chunks
+        for start in range(0, len(order_ids), Order.SEAT_BATCH_SIZE):
+            chunk = order_ids[start:start + Order.SEAT_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = DBService.run(f"""
+                        SELECT Order_IDFK, Row_Num, Col_Num, Class_Type
+                        FROM {Order.tickets_table(include_archive)}
+                        WHERE Order_IDFK IN ({placeholders})
+                        ORDER BY Order_IDFK, Row_Num, Col_Num
+                    """, chunk, fetchall=True)
 
-        grouped_seats = {'Business': [], 'Economy': []}
-        seen_tickets = set()
-        for r in rows:
-            ticket_key = (r['Row_Num'], r['Col_Num'])
-            if ticket_key in seen_tickets:
-                continue
-            seen_tickets.add(ticket_key)
+            for r in rows:
+                grouped[r['Order_IDFK']][r['Class_Type']].append(f"{r['Row_Num']}{r['Col_Num']}")
 
-            seat_str = f"{r['Row_Num']}{r['Col_Num']}"
-            if r['Row_Num'] <= business_rows_limit:
-                grouped_seats['Business'].append(seat_str)
-            else:
-                grouped_seats['Economy'].append(seat_str)
+        return grouped
 
-        return grouped_seats
+    @staticmethod
+    def attach_seats(orders, include_archive=False):
+        """ Adds the grouped seats to every order dictionary in the list, using one batched lookup. """
+        seats = Order.get_seats_by_orders([o['order_id'] for o in orders], include_archive)
+        for o in orders:
+            o['seats'] = seats[int(o['order_id'])]
+        return orders
 
     @staticmethod
-    def get_guest_orders(order_id, email):
+    def get_guest_orders(order_id, email, include_archive=False):
         """ Retrieves guest orders and converts dates to objects for unified handling. """
-        query = """
+        query = f"""
                SELECT DISTINCT o.Order_ID, o.Flight_IDFK, o.Total_Price, o.Status,
                       o.Execute_DateTime,
                       f.Departure_Time,
                       datetime(f.Departure_Time, '+' || r.Duration || ' minutes') as Arrival_Time
-               FROM Orders o
+               FROM {Order.orders_table(include_archive)} o
                JOIN Flights f ON o.Flight_IDFK = f.Flight_ID
                JOIN Routes r ON f.Origin_AirportFK = r.Origin_Airport
                              AND f.Destination_AirportFK = r.Destination_Airport
@@ -1001,7 +1383,7 @@ class Order:
                 "flight_id": r['Flight_IDFK'],
                 "total_price": r['Total_Price'],
                 "status": r['Status'],
-                "display_status": Order.get_display_status(r['Status'], arr),
+                "display_status": r['Status'],
                 "order_date": exe,
                 "departure_time": dep,
                 "arrival_time": arr
@@ -1009,13 +1391,13 @@ class Order:
         return results
 
     @staticmethod
-    def get_user_orders(email):
+    def get_user_orders(email, include_archive=False):
         """ Retrieves all orders associated with a registered user. """
-        query = """
+        query = f"""
                SELECT DISTINCT o.Order_ID, o.Flight_IDFK, o.Total_Price, o.Status,
                       o.Execute_DateTime, f.Departure_Time,
                       datetime(f.Departure_Time, '+' || r.Duration || ' minutes') as Arrival_Time
-               FROM Orders o
+               FROM {Order.orders_table(include_archive)} o
                JOIN Flights f ON o.Flight_IDFK = f.Flight_ID
                JOIN Routes r ON f.Origin_AirportFK = r.Origin_Airport
                              AND f.Destination_AirportFK = r.Destination_Airport
@@ -1043,7 +1425,7 @@ class Order:
                 "flight_id": r['Flight_IDFK'],
                 "total_price": r['Total_Price'],
                 "status": r['Status'],
-                "display_status": Order.get_display_status(r['Status'], arr),
+                "display_status": r['Status'],
                 "order_date": exe,
                 "departure_time": dep,
                 "arrival_time": arr,
@@ -1067,12 +1449,69 @@ class Order:
         params.append(order_id)
         DBService.run(query, tuple(params))
 
+    @staticmethod
+    def cancel_by_customer(order_id, email, now=None):
+        """
+        Cancels one order for its owner, following the 36-hour policy:
+        the order keeps a 5% cancellation fee, its seats go back on sale and
+        the cabin classes it freed are no longer 'Fully Booked'.
+        Everything runs in one transaction.
+        Returns (order, new_price, error_message). 'order' is None if the order doesn't belong to the customer.
+        """
+        now = now or datetime.now()
+        with DBService.transaction() as cursor:
+            row = cursor.execute(
+                """
+                SELECT o.Order_ID, o.Flight_IDFK, o.Total_Price, o.Status, f.Departure_Time,
+                       f.Origin_AirportFK, f.Destination_AirportFK
+                FROM Orders o
+                JOIN Flights f ON f.Flight_ID = o.Flight_IDFK
+                WHERE o.Order_ID = ? AND o.Customer_email = ?
+                LIMIT 1
+                """, (order_id, email)).fetchone()
+            if not row:
+                return None, None, "Order not found."
+
+            order = {
+                "order_id": row['Order_ID'],
+                "flight_id": row['Flight_IDFK'],
+                "origin": row['Origin_AirportFK'],
+                "destination": row['Destination_AirportFK'],
+                "departure_time": datetime.fromisoformat(str(row['Departure_Time'])),
+                "seats": {'Business': [], 'Economy': []}
+            }
+            for t in cursor.execute("SELECT Row_Num, Col_Num, Class_Type FROM Tickets WHERE Order_IDFK = ? ORDER BY Row_Num, Col_Num",
+                                    (order_id,)).fetchall():
+                order['seats'][t['Class_Type']].append(f"{t['Row_Num']}{t['Col_Num']}")
+
+            if row['Status'] != 'Active':
+                return order, None, "This order is not active."
+            if order['departure_time'] <= now + timedelta(hours=36):
+                return order, None, "Orders can only be canceled up to 36 hours before departure."
+
+            new_price = round(float(row['Total_Price'] or 0) * 0.05, 2)
+            # Seats of non-active orders are free on the seat map, so this also releases the tickets
+            cursor.execute("UPDATE Orders SET Status = 'Customer Cancellation', Total_Price = ? WHERE Order_ID = ?",
+                           (new_price, order_id))
+            cursor.execute(
+                """
+                UPDATE Flights SET Status = 'Active'
+                WHERE Flight_ID = ? AND Status = 'Fully Booked'
+                  AND Class_TypeFK IN (SELECT DISTINCT Class_Type FROM Tickets WHERE Order_IDFK = ?)
+                """, (row['Flight_IDFK'], order_id))
+
+        return order, new_price, None
+
     @staticmethod
     def create_full_order(flight_id, customer_email, customer_type, total_price, selected_seats):
         """
         Processes the entire order: creates the record, issues tickets, and updates flight status.
         """
-        res = DBService.run("SELECT MAX(Order_ID) as max_id FROM Orders", fetchone=True)
+        flight = Flight.get_by_id(flight_id)
+        # Archived orders keep their IDs, so new IDs continue after both tables
+        res = DBService.run(
+            "SELECT MAX(max_id) as max_id FROM (SELECT MAX(Order_ID) as max_id FROM Orders "
+            "UNION ALL SELECT MAX(Order_ID) FROM Orders_Archive)", fetchone=True)
         order_id = (res['max_id'] or 0) + 1
         now_cleaned = datetime.now().replace(microsecond=0)
 
@@ -1087,17 +1526,17 @@ class Order:
 
         for seat in selected_seats:
             class_type, row, column = seat.split('-')
+            # The class and the price paid are kept on the ticket, so reports don't need the row ranges
+            price = flight.price_business if class_type == 'Business' else flight.price_regular
             DBService.run(
-                "INSERT INTO Tickets (Order_IDFK, Flight_IDFK, Row_Num, Col_Num) VALUES (?, ?, ?, ?)",
-                (order_id, flight_id, int(row), column)
+                "INSERT INTO Tickets (Order_IDFK, Flight_IDFK, Row_Num, Col_Num, Class_Type, Price) VALUES (?, ?, ?, ?, ?, ?)",
+                (order_id, flight_id, int(row), column, class_type, price)
             )
 
         # Check if the flight became "Fully Booked"
         class_type_booked = selected_seats[0].split('-')[0]
-        flight = Flight.get_by_id(flight_id)
-        _, availability = flight.get_seat_map()  #We only need to check if there are free seats left.
 
-        if not availability.get(class_type_booked):
+        if flight.get_seats_left(class_type_booked) <= 0:
             DBService.run(
                 "UPDATE Flights SET Status = 'Fully Booked' WHERE Flight_ID = ? AND Class_TypeFK = ?",
                 (flight_id, class_type_booked)
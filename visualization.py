@@ -1,9 +1,40 @@
-import sqlite3
+"""
+The business reports as charts: revenue by manufacturer, cabin class and airplane size, and the
+flight hours of every crew member.
+
+The charts are drawn with Matplotlib's headless Agg backend, so the web app can serve them
+(/reports/charts/<name>.<png|svg>). Rendered bytes are cached per chart and format together with the
+data version they were drawn at (see Manager.get_report_version); while the data is unchanged, a view
+costs one small query and skips pandas and Matplotlib.
+
+The queries run on the reporting replica when there is one (see reporting_replica.py). With
+SNAPSHOT_DIR set (see analytics_snapshot.py), the data is read from the columnar snapshot there
+instead, and the charts follow the snapshot's generation.
+
+Usage:
+    python visualization.py                  # writes revenue.png and crew_hours.png
+    python visualization.py --format svg --out reports/
+    python visualization.py --snapshot analytics/        # from the columnar snapshot
+    python visualization.py --benchmark 100 1000 5000     # crew chart render time by crew size
+"""
+import argparse
+import io
+import os
+import threading
+import time
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
 from matplotlib.patches import Patch
 
+from analytics_snapshot import AnalyticsSnapshot
+from utilise import DBService, Manager
+
+SNAPSHOT_DIR = None  # Folder of an analytics snapshot to read instead of the database
+
 
 def reverse_heb(s):
     """
@@ -16,108 +47,167 @@ def reverse_heb(s):
     return s[::-1]
 
 
-# --- Database Connection ---
-db_path = "/home/amitaloni890/FlyTAU/flytau.db"
-con = sqlite3.connect(db_path)
-
-# --- Query 1: Revenue breakdown ---
-query_revenue = """
+# --- Query 1: Revenue breakdown (all history, including archived orders) ---
+# One row per group and order day, so callers can pick a period without another query
+QUERY_REVENUE = """
 SELECT
     a.Size AS Airplane_Size,
     a.Manufacturer AS Airplane_Manufacturer,
-    a.Class_Type AS Cabin_Class,
-    ROUND(SUM(o.Total_Price), 2) AS Total_Revenue
-FROM Orders o
-JOIN Flights f ON o.Flight_IDFK = f.Flight_ID
-JOIN Airplanes a ON f.Airplane_IDFK = a.Airplane_ID AND f.Class_TypeFK = a.Class_Type
-WHERE EXISTS (
-    SELECT 1 FROM Tickets t
-    WHERE t.Order_IDFK = o.Order_ID
-    AND t.Flight_IDFK = f.Flight_ID
-    AND (
-        (a.Class_Type = 'Business' AND t.Row_Num <= a.Number_of_rows)
-        OR
-        (a.Class_Type = 'Economy' AND t.Row_Num >
-            COALESCE((SELECT a2.Number_of_rows FROM Airplanes a2
-                      WHERE a2.Airplane_ID = a.Airplane_ID AND a2.Class_Type = 'Business'), 0))
-    )
-)
-GROUP BY a.Size, a.Manufacturer, a.Class_Type
+    t.Class_Type AS Cabin_Class,
+    t.Day,
+    t.Archived,
+    ROUND(SUM(t.Revenue_Share), 2) AS Total_Revenue
+FROM (
+    -- Each ticket carries its share of the order total (weighted by the price paid for the seat)
+    SELECT t.Flight_IDFK, t.Class_Type, date(o.Execute_DateTime) AS Day, o.Archived,
+           o.Total_Price * COALESCE(t.Price / NULLIF(SUM(t.Price) OVER w, 0), 1.0 / COUNT(*) OVER w) AS Revenue_Share
+    FROM (SELECT Order_IDFK, Flight_IDFK, Class_Type, Price FROM Tickets
+          UNION ALL
+          SELECT Order_IDFK, Flight_IDFK, Class_Type, Price FROM Tickets_Archive) t
+    JOIN (SELECT Order_ID, Total_Price, Execute_DateTime, 0 AS Archived FROM Orders
+          UNION ALL
+          SELECT Order_ID, Total_Price, Execute_DateTime, 1 AS Archived FROM Orders_Archive) o ON t.Order_IDFK = o.Order_ID
+    WINDOW w AS (PARTITION BY t.Order_IDFK)
+) t
+JOIN Flights f ON f.Flight_ID = t.Flight_IDFK AND f.Class_TypeFK = t.Class_Type
+JOIN Airplanes a ON a.Airplane_ID = f.Airplane_IDFK AND a.Class_Type = t.Class_Type
+GROUP BY a.Size, a.Manufacturer, t.Class_Type, t.Day, t.Archived
 ORDER BY Total_Revenue DESC;
 """
 
 # --- Query 2: Crew Flight Hours ---
-query_crew = """
+# Per-employee totals are kept in Crew_Hours (see crew_hours.py), so there is no need to sum all flights
+QUERY_CREW = """
 SELECT
     fc.Employee_ID,
     fc.First_Name,
     fc.Last_Name,
     fc.Role,
-    SUM(CASE WHEN r.Duration/60.0 <= 6 AND f.Status = 'Completed' THEN ROUND(r.Duration/60.0,1) ELSE 0 END) AS Short_Flight_Hours,
-    SUM(CASE WHEN r.Duration/60.0 > 6 AND f.Status = 'Completed' THEN ROUND(r.Duration/60.0,1) ELSE 0 END) AS Long_Flight_Hours
+    ROUND(COALESCE(h.Short_Minutes, 0) / 60.0, 1) AS Short_Flight_Hours,
+    ROUND(COALESCE(h.Long_Minutes, 0) / 60.0, 1) AS Long_Flight_Hours
 FROM FlightCrew fc
-LEFT JOIN Flight_assigned fa ON fc.Employee_ID = fa.Employee_IDFK
-LEFT JOIN (
-    SELECT DISTINCT Flight_ID, Origin_AirportFK, Destination_AirportFK, Status
-    FROM Flights
-) f ON fa.Flight_IDFK = f.Flight_ID
-LEFT JOIN Routes r ON f.Origin_AirportFK = r.Origin_Airport
-                 AND f.Destination_AirportFK = r.Destination_Airport
-GROUP BY fc.Employee_ID, fc.First_Name, fc.Last_Name, fc.Role;
+LEFT JOIN Crew_Hours h ON h.Employee_IDFK = fc.Employee_ID;
 """
 
-df_rev = pd.read_sql(query_revenue, con)
-df_crew = pd.read_sql(query_crew, con)
-con.close()
+
+def _snapshot():
+    """ The published snapshot to read from, or None to query the database. """
+    return AnalyticsSnapshot.open(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+
+
+REVENUE_KEYS = ['Airplane_Size', 'Airplane_Manufacturer', 'Cabin_Class', 'Day', 'Archived']
+
+
+def _sum_chunks(chunks, keys, value):
+    """
+    Adds up the 'value' column of a stream of frames by 'keys', one chunk at a time, so memory holds
+    one chunk and the totals so far. Groups keep the order they first appeared in.
+    """
+    total = None
+    for chunk in chunks:
+        part = chunk.groupby(keys, sort=False, dropna=False, as_index=False)[value].sum()
+        total = part if total is None else (pd.concat([total, part], ignore_index=True)
+                                            .groupby(keys, sort=False, dropna=False, as_index=False)[value].sum())
+    return total
+
+
+def load_revenue():
+    snapshot = _snapshot()
+    if snapshot:
+        return snapshot.revenue_frame()
+    with DBService.report_cur() as cursor:
+        chunks = pd.read_sql(QUERY_REVENUE, cursor.connection, chunksize=DBService.CHUNK_ROWS)
+        total = _sum_chunks(chunks, REVENUE_KEYS, 'Total_Revenue')
+    if total is None:
+        return pd.DataFrame(columns=REVENUE_KEYS + ['Total_Revenue'])
+    total['Total_Revenue'] = total['Total_Revenue'].round(2)
+    return total
+
+
+def revenue_for_period(df_rev, start_date=None, end_date=None, include_archive=True):
+    """ The revenue rows of orders made between start_date and end_date (whole days, both optional). """
+    keep = np.ones(len(df_rev), dtype=bool)
+    if start_date:
+        keep &= (df_rev['Day'] >= str(start_date)).to_numpy()
+    if end_date:
+        keep &= (df_rev['Day'] <= str(end_date)).to_numpy()
+    if not include_archive:
+        keep &= (df_rev['Archived'] == 0).to_numpy()
+    return df_rev[keep]
+
+
+def load_crew():
+    snapshot = _snapshot()
+    if snapshot:
+        return snapshot.crew_frame()
+    # One row per crew member, already summed in Crew_Hours: the result is as small as the chart, so it is read whole
+    with DBService.report_cur() as cursor:
+        return pd.read_sql(QUERY_CREW, cursor.connection)
+
+
+def _no_data(fig, ax):
+    ax.text(0.5, 0.5, reverse_heb('אין נתונים להצגה'), ha='center', va='center', fontsize=16,
+            transform=ax.transAxes)
+    ax.set_axis_off()
+    return fig
+
 
 # --- Visualization 1: Revenue Report ---
-if not df_rev.empty:
-    manufacturers = sorted(df_rev['Airplane_Manufacturer'].unique())
+REVENUE_COLUMNS = pd.MultiIndex.from_product([['Business', 'Economy'], ['large', 'small']])
+
+
+def revenue_series(df_rev):
+    """
+    Shapes the revenue rows in one pivot.
+    Returns the sorted manufacturers and, aligned with them, arrays of business revenue
+    and economy revenue of large and small airplanes.
+    """
+    table = (df_rev.pivot_table(index='Airplane_Manufacturer', columns=['Cabin_Class', 'Airplane_Size'],
+                                values='Total_Revenue', aggfunc='sum', fill_value=0)
+             .reindex(columns=REVENUE_COLUMNS, fill_value=0)
+             .sort_index())
+    business = table['Business'].sum(axis=1).to_numpy(dtype=float)
+    return (table.index.to_numpy(), business,
+            table[('Economy', 'large')].to_numpy(dtype=float), table[('Economy', 'small')].to_numpy(dtype=float))
+
+
+def _money_labels(values, show):
+    return [f'${v:,.0f}' if s else '' for v, s in zip(values, show)]
+
+
+def revenue_chart(df_rev):
+    """ Business revenue per manufacturer (left bar) next to economy revenue of large and small airplanes. """
+    fig = Figure(figsize=(12, 7))
+    ax1 = fig.subplots()
+    if df_rev.empty:
+        return _no_data(fig, ax1)
+
+    manufacturers, business, econ_large, econ_small = revenue_series(df_rev)
+    econ_total = econ_large + econ_small
     x = np.arange(len(manufacturers))
     width = 0.35
-    fig1, ax1 = plt.subplots(figsize=(12, 7))
 
     color_small_econ = '#DCD0FF'  # Lavender for small planes
     color_white = '#FFFFFF'
     hatch_biz = '///'
 
-    for i, m in enumerate(manufacturers):
-        m_data = df_rev[df_rev['Airplane_Manufacturer'] == m]
-
-        # 1. Business Bar (Left column)
-        biz_total = m_data[m_data['Cabin_Class'] == 'Business']['Total_Revenue'].sum()
-        ax1.bar(x[i] - width / 2, biz_total, width, color=color_white, hatch=hatch_biz,
-                edgecolor='black', linewidth=1.2)
-        if biz_total > 0:
-            ax1.text(x[i] - width / 2, biz_total + 100, f'${biz_total:,.0f}',
-                     ha='center', va='bottom', fontsize=9, fontweight='bold')
-
-        # 2. Economy Stacked Bar (Right column - Large & Small)
-        econ_large = m_data[(m_data['Cabin_Class'] == 'Economy') & (m_data['Airplane_Size'] == 'large')][
-            'Total_Revenue'].sum()
-        econ_small = m_data[(m_data['Cabin_Class'] == 'Economy') & (m_data['Airplane_Size'] == 'small')][
-            'Total_Revenue'].sum()
-
-        ax1.bar(x[i] + width / 2, econ_large, width, color=color_white, edgecolor='black', linewidth=1.2)
-        ax1.bar(x[i] + width / 2, econ_small, width, bottom=econ_large, color=color_small_econ, edgecolor='black',
-                linewidth=1.2)
-
-        # Labels INSIDE Economy segments
-        # Label for Bottom part - White
-        if econ_large > 100:
-            ax1.text(x[i] + width / 2, econ_large / 2, f'${econ_large:,.0f}',
-                     ha='center', va='center', fontsize=8, fontweight='bold')
-
-        # Label for Top part - Purple
-        if econ_small > 100:
-            ax1.text(x[i] + width / 2, econ_large + (econ_small / 2), f'${econ_small:,.0f}',
-                     ha='center', va='center', fontsize=8, fontweight='bold')
-
-        # Total on top of the whole Economy stack
-        total_econ = econ_large + econ_small
-        if total_econ > 0:
-            ax1.text(x[i] + width / 2, total_econ + 100, f'${total_econ:,.0f}',
-                     ha='center', va='bottom', fontsize=9, fontweight='bold', color='purple')
+    # 1. Business Bars (Left column)
+    biz_bars = ax1.bar(x - width / 2, business, width, color=color_white, hatch=hatch_biz,
+                       edgecolor='black', linewidth=1.2)
+    ax1.bar_label(biz_bars, labels=_money_labels(business, business > 0), padding=3, fontsize=9, fontweight='bold')
+
+    # 2. Economy Stacked Bars (Right column - Large & Small)
+    large_bars = ax1.bar(x + width / 2, econ_large, width, color=color_white, edgecolor='black', linewidth=1.2)
+    small_bars = ax1.bar(x + width / 2, econ_small, width, bottom=econ_large, color=color_small_econ,
+                         edgecolor='black', linewidth=1.2)
+
+    # Labels INSIDE Economy segments, and the total on top of the whole Economy stack
+    ax1.bar_label(large_bars, labels=_money_labels(econ_large, econ_large > 100), label_type='center',
+                  fontsize=8, fontweight='bold')
+    ax1.bar_label(small_bars, labels=_money_labels(econ_small, econ_small > 100), label_type='center',
+                  fontsize=8, fontweight='bold')
+    ax1.bar_label(small_bars, labels=_money_labels(econ_total, econ_total > 0), padding=3,
+                  fontsize=9, fontweight='bold', color='purple')
 
     ax1.set_ylabel(reverse_heb('סך הכנסות'), fontsize=12, fontweight='bold')
     ax1.set_title(reverse_heb('דו"ח הכנסות לפי יצרנית, מחלקה וגודל מטוס'), fontsize=16, fontweight='bold')
@@ -130,53 +220,76 @@ if not df_rev.empty:
         Patch(facecolor=color_small_econ, edgecolor='black', label=reverse_heb('אקונומי - מטוס קטן'))
     ]
     ax1.legend(handles=legend_elements, loc='upper left')
-    plt.grid(axis='y', linestyle='--', alpha=0.3)
-    fig1.tight_layout()
+    ax1.grid(axis='y', linestyle='--', alpha=0.3)
+    fig.tight_layout()
+    return fig
+
 
 # --- Visualization 2: Crew Flight Hours ---
-if not df_crew.empty:
-    df_crew['Full_Name'] = df_crew['First_Name'] + " " + df_crew['Last_Name']
-    names_rev = [reverse_heb(name) for name in df_crew['Full_Name']]
+PARENTHESES_SWAP = str.maketrans('()', ')(')  # Same as reverse_heb, for a whole column at once
+ROLE_COLORS = {'Pilot': 'blue', 'Attendant': 'green'}
+VALUE_LABEL_LIMIT = 60  # Hours are written on the bars only while they are wide enough to read them
+NAME_LABEL_LIMIT = 150  # With more crew, every k-th name is shown
+
+
+def crew_series(df_crew):
+    """
+    Shapes the crew rows with column operations only.
+    Returns aligned arrays: display names (reversed for Matplotlib), short and long hours, name colors.
+    """
+    names = (df_crew['First_Name'].fillna('') + " " + df_crew['Last_Name'].fillna(''))
+    names = names.str.translate(PARENTHESES_SWAP).str[::-1].to_numpy()
+    colors = df_crew['Role'].map(ROLE_COLORS).fillna('black').to_numpy()
+    return (names, df_crew['Short_Flight_Hours'].to_numpy(dtype=float),
+            df_crew['Long_Flight_Hours'].to_numpy(dtype=float), colors)
+
+
+def _bars(ax, x, bottom, height, color, width=0.8):
+    """ Draws all bars of a series as one collection (much cheaper than one patch per bar). """
+    left, right, top = x - width / 2, x + width / 2, bottom + height
+    verts = np.stack([np.column_stack([left, bottom]), np.column_stack([left, top]),
+                      np.column_stack([right, top]), np.column_stack([right, bottom])], axis=1)
+    ax.add_collection(PolyCollection(verts, facecolors=color, edgecolors='black', linewidths=1))
+
+
+def _hour_labels(ax, x, y, values, show, **text_kw):
+    for xi, yi, v in zip(x[show], y[show], values[show]):
+        ax.text(xi, yi, f'{v:.1f}', ha='center', **text_kw)
+
+
+def crew_chart(df_crew):
+    """ Short- and long-haul flight hours of every crew member; names are blue for pilots, green for attendants. """
+    fig = Figure(figsize=(16, 11))
+    ax2 = fig.subplots()
+    if df_crew.empty:
+        return _no_data(fig, ax2)
 
-    fig2, ax2 = plt.subplots(figsize=(16, 11))
-    indices = np.arange(len(df_crew))
+    names, short, long, colors = crew_series(df_crew)
+    total = short + long
+    indices = np.arange(len(names))
 
     color_short = '#3262E6'  # Blue
     color_long = '#E63946'  # Red
 
-    ax2.bar(indices, df_crew['Short_Flight_Hours'], label=reverse_heb('טיסות קצרות'), color=color_short,
-            edgecolor='black')
-    ax2.bar(indices, df_crew['Long_Flight_Hours'], bottom=df_crew['Short_Flight_Hours'],
-            label=reverse_heb('טיסות ארוכות'), color=color_long, edgecolor='black')
+    _bars(ax2, indices, np.zeros_like(short), short, color_short)
+    _bars(ax2, indices, short, long, color_long)
+    ax2.set_xlim(-0.6, len(names) - 0.4)
+    ax2.set_ylim(0, max(total.max(), 1) * 1.05)
 
-    # Data labels inside bars
-    for i in range(len(df_crew)):
-        short = df_crew.iloc[i]['Short_Flight_Hours']
-        long = df_crew.iloc[i]['Long_Flight_Hours']
-        total = short + long
-
-        if short > 0.1:
-            ax2.text(i, short / 2, f'{short:.1f}', ha='center', va='center', color='white', fontsize=8,
+    # Data labels inside bars, and the total on top
+    if len(names) <= VALUE_LABEL_LIMIT:
+        _hour_labels(ax2, indices, short / 2, short, short > 0.1, va='center', color='white', fontsize=8,
                      fontweight='bold')
-        if long > 0.1:
-            ax2.text(i, short + (long / 2), f'{long:.1f}', ha='center', va='center', color='white', fontsize=8,
+        _hour_labels(ax2, indices, short + long / 2, long, long > 0.1, va='center', color='white', fontsize=8,
                      fontweight='bold')
+        _hour_labels(ax2, indices, total + 0.1, total, total > 0, va='bottom', fontsize=9, fontweight='bold')
 
-        if total > 0:
-            ax2.text(i, total + 0.1, f'{total:.1f}', ha='center', va='bottom', fontsize=9, fontweight='bold')
-
-    ax2.set_xticks(indices)
-    ax2.set_xticklabels(names_rev, rotation=45, ha='right', va='top', rotation_mode='anchor', fontsize=11,
+    step = -(-len(names) // NAME_LABEL_LIMIT)
+    ax2.set_xticks(indices[::step])
+    ax2.set_xticklabels(names[::step], rotation=45, ha='right', va='top', rotation_mode='anchor', fontsize=11,
                         fontweight='bold')
-
-    for i, label in enumerate(ax2.get_xticklabels()):
-        role = df_crew.iloc[i]['Role']
-        if role == 'Pilot':
-            label.set_color('blue')
-        elif role == 'Attendant':
-            label.set_color('green')
-        else:
-            label.set_color('black')
+    for label, color in zip(ax2.get_xticklabels(), colors[::step]):
+        label.set_color(color)
 
     ax2.set_ylabel(reverse_heb('סה"כ שעות טיסה'), fontsize=12, fontweight='bold')
     ax2.set_title(reverse_heb('שעות טיסה מצטברות לכלל אנשי צוות'), fontsize=16, fontweight='bold')
@@ -189,8 +302,96 @@ if not df_crew.empty:
     ]
     ax2.legend(handles=custom_legend, loc='upper right', frameon=True, shadow=True)
 
-    plt.grid(axis='y', linestyle='--', alpha=0.5)
-    fig2.tight_layout(pad=3.0)
-    plt.subplots_adjust(bottom=0.25)
+    ax2.grid(axis='y', linestyle='--', alpha=0.5)
+    fig.tight_layout(pad=3.0)
+    fig.subplots_adjust(bottom=0.25)
+    return fig
+
+
+# --- Rendering and cache ---
+CHARTS = {
+    "revenue": (load_revenue, revenue_chart),
+    "crew_hours": (load_crew, crew_chart),
+}
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+_rendered = {}  # (name, format) -> (data version, bytes)
+_render_lock = threading.Lock()  # One chart is drawn at a time
+
+
+def render(name, fmt="png"):
+    """ Draws a chart (see CHARTS) and returns the PNG or SVG bytes. """
+    load, draw = CHARTS[name]
+    fig = draw(load())
+    FigureCanvasAgg(fig)
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt)
+    return buf.getvalue()
+
+
+def data_version():
+    """ The version of the data the charts are drawn from: the snapshot generation or the data version. """
+    snapshot = _snapshot()
+    return f"s{snapshot.manifest['generation']}" if snapshot else Manager.get_report_version()
+
+
+def get_chart(name, fmt="png"):
+    """ Returns (bytes, data version) of a chart, drawing it only when the data changed since the last time. """
+    version = data_version()
+    cached = _rendered.get((name, fmt))
+    if cached and cached[0] == version:
+        return cached[1], version
+    with _render_lock:
+        cached = _rendered.get((name, fmt))
+        if cached and cached[0] == version:
+            return cached[1], version
+        data = render(name, fmt)
+        _rendered[(name, fmt)] = (version, data)
+    return data, version
+
+
+def benchmark(crew_sizes, fmt="png"):
+    """ Times the crew chart (data shaping, drawing, encoding) on made-up crews of the given sizes. """
+    rng = np.random.default_rng(0)
+    letters = np.array(list('אבגדהוזחטיכלמנסעפצקרשת'))
+    print(f"{'crew':>7} {'shape ms':>9} {'draw ms':>9} {'encode ms':>10}")
+    for n in crew_sizes:
+        df = pd.DataFrame({
+            'First_Name': [''.join(w) for w in rng.choice(letters, (n, 5))],
+            'Last_Name': [''.join(w) for w in rng.choice(letters, (n, 6))],
+            'Role': rng.choice(['Pilot', 'Attendant'], n),
+            'Short_Flight_Hours': rng.integers(0, 400, n) / 2,
+            'Long_Flight_Hours': rng.integers(0, 400, n) / 2,
+        })
+        started = time.perf_counter()
+        crew_series(df)
+        shaped = time.perf_counter()
+        fig = crew_chart(df)
+        drawn = time.perf_counter()
+        FigureCanvasAgg(fig)
+        fig.savefig(io.BytesIO(), format=fmt)
+        encoded = time.perf_counter()
+        print(f"{n:>7} {(shaped - started) * 1000:>9.1f} {(drawn - shaped) * 1000:>9.1f} "
+              f"{(encoded - drawn) * 1000:>10.1f}")
+
 
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draw the business report charts")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="png")
+    parser.add_argument("--out", default=".", help="folder for the chart files")
+    parser.add_argument("--db", help="database file (default: DBService.DB_PATH)")
+    parser.add_argument("--snapshot", help="read the data from the analytics snapshot in this folder")
+    parser.add_argument("--benchmark", type=int, nargs="+", metavar="CREW_SIZE",
+                        help="time the crew chart on made-up crews of these sizes instead")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark, args.format)
+        raise SystemExit
+    if args.db:
+        DBService.DB_PATH = args.db
+    SNAPSHOT_DIR = args.snapshot
+    for chart in CHARTS:
+        path = os.path.join(args.out, f"{chart}.{args.format}")
+        with open(path, "wb") as f:
+            f.write(render(chart, args.format))
+        print(path)